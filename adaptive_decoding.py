@@ -0,0 +1,56 @@
+import math
+from types import SimpleNamespace
+
+import numpy as np
+
+
+def greedy_params(generation_params):
+    """The configured generation params with beam search turned off"""
+    return dict(generation_params, num_beams=1, early_stopping=False)
+
+
+def answer_tokens(sequence, scores, pad_token_id):
+    """(generated token ids, their log-probs) of one row, without the start token and padding"""
+    # sequence[0] is the decoder start token; scores line up with sequence[1:]
+    pairs = [(int(token), float(score)) for token, score in zip(sequence[1:], scores) if token != pad_token_id]
+    return [token for token, _ in pairs], [score for _, score in pairs]
+
+
+def escalation_reason(tokens, logprobs, eos_token_id, max_new_tokens, policy):
+    """Why a greedy answer should be re-decoded with beam search, or None to keep it.
+
+    "empty": nothing before EOS; "length": ran into max_new_tokens without
+    EOS; "confidence": geometric-mean token probability under
+    policy["min_confidence"]; "repetition": share of repeated tokens above
+    policy["max_repetition"].
+    """
+    content = [token for token in tokens if token != eos_token_id]
+    if not content:
+        return "empty"
+    if eos_token_id not in tokens and len(tokens) >= max_new_tokens:
+        return "length"
+    if math.exp(sum(logprobs) / len(logprobs)) < policy["min_confidence"]:
+        return "confidence"
+    if len(content) >= policy["min_repetition_tokens"]:
+        if 1 - len(set(content)) / len(content) > policy["max_repetition"]:
+            return "repetition"
+    return None
+
+
+def merge_outputs(greedy, beam, rows, pad_token_id):
+    """greedy's sequences and transition scores, with beam's in place of the given rows"""
+    greedy_sequences, beam_sequences = np.asarray(greedy.sequences), np.asarray(beam.sequences)
+    greedy_scores, beam_scores = np.asarray(greedy.transition_scores), np.asarray(beam.transition_scores)
+    length = max(greedy_sequences.shape[1], beam_sequences.shape[1])
+
+    sequences = np.full((len(greedy_sequences), length), pad_token_id, dtype=greedy_sequences.dtype)
+    transition_scores = np.zeros((len(greedy_sequences), length - 1), dtype=np.float32)
+    sequences[:, :greedy_sequences.shape[1]] = greedy_sequences
+    transition_scores[:, :greedy_scores.shape[1]] = greedy_scores
+    for beam_row, row in enumerate(rows):
+        sequences[row] = pad_token_id
+        transition_scores[row] = 0.0
+        sequences[row, :beam_sequences.shape[1]] = beam_sequences[beam_row]
+        transition_scores[row, :beam_scores.shape[1]] = beam_scores[beam_row]
+    # Both decodes encoded the same prompts
+    return SimpleNamespace(sequences=sequences, transition_scores=transition_scores, input_lengths=greedy.input_lengths)
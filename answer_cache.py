@@ -0,0 +1,98 @@
+import csv
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question):
+    """Fold case, unicode forms, punctuation and whitespace so paraphrases share a key"""
+    text = unicodedata.normalize("NFKC", question).lower()
+    text = _PUNCTUATION.sub("", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def load_csv_questions(path, column="input_text", prefix="question:"):
+    """Questions from a QA CSV such as data/qa_pairs/manual/kimathi_qa_text2text.csv"""
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            question = row[column].strip()
+            if question.lower().startswith(prefix):
+                question = question[len(prefix):].strip()
+            if question:
+                questions.append(question)
+    return questions
+
+
+class AnswerCache:
+    """Thread-safe LRU cache of generated answers with an optional TTL.
+
+    Entries are keyed on the normalized question plus the generation params,
+    so changing the decoding config never serves answers produced under the
+    old one.
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(question, params):
+        return normalize_question(question), json.dumps(params, sort_keys=True)
+
+    def get(self, question, params):
+        key = self.key(question, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl_seconds is None or time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, question, params, value):
+        key = self.key(question, params)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def warm(self, questions, answer_batch, params, batch_size=8):
+        """Fill the cache by answering uncached questions in batches with answer_batch"""
+        seen = set()
+        pending = []
+        with self._lock:
+            for question in questions:
+                key = self.key(question, params)
+                if key not in self._entries and key not in seen:
+                    seen.add(key)
+                    pending.append(question)
+
+        for i in range(0, len(pending), batch_size):
+            batch = pending[i:i + batch_size]
+            for question, value in zip(batch, answer_batch(batch)):
+                self.put(question, params, value)
+        return len(pending)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -1,102 +1,118 @@
 import gradio as gr
-import tensorflow as tf
-from transformers import TFAutoModelForSeq2SeqLM, AutoTokenizer
-from collections import Counter
-import re
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+import logging
 import time
+from app_config import config
+from answer_cache import load_csv_questions
+from inference import AnswerService, chat_with_model, count_truncated
+import metrics
 
-# === Load model and tokenizer ===
-model_name = "google/flan-t5-small"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = TFAutoModelForSeq2SeqLM.from_pretrained("model")
-
-# === config ===
-config = {
-    "max_input_length": 64,
-    "generation_params": {
-        "max_new_tokens": 60,
-        "num_beams": 4,
-        "no_repeat_ngram_size": 2,
-        "do_sample": False,
-        "early_stopping": True,
-        "repetition_penalty": 2.0
-    }
-}
-
-# === Core functions ===
-def chat_with_model(question, tokenizer, model, config):
-    prompt = f"Question: {question}\nAnswer:"
-    inputs = tokenizer(
-        prompt,
-        return_tensors="tf",
-        truncation=True,
-        max_length=config["max_input_length"],
-        padding="max_length"
-    )
-    outputs = model.generate(
-        input_ids=inputs["input_ids"],
-        attention_mask=inputs["attention_mask"],
-        max_new_tokens=config["generation_params"]["max_new_tokens"],
-        num_beams=config["generation_params"]["num_beams"],
-        no_repeat_ngram_size=config["generation_params"]["no_repeat_ngram_size"],
-        do_sample=config["generation_params"]["do_sample"],
-        early_stopping=config["generation_params"]["early_stopping"]
-    )
-    return tokenizer.decode(outputs[0], skip_special_tokens=True)
-
-def verify_answer(question, answer):
-    facts = {
-        "zodiac sign": ["don't know", "unknown"],
-        "sentenced kimathi": ["o'connor", "kennedy"],
-        "final verdict": ["death", "hanging"],
-        "carrying a revolver": ["firearm", "weapon", "revolver", "gun"],
-        "communist": ["don't know", "unknown"]
-    }
-    answer_lower = answer.lower()
-    for keyword, valid_answers in facts.items():
-        if keyword in question.lower():
-            return any(a in answer_lower for a in valid_answers)
-    return "don't know" in answer_lower or len(answer.split()) < 5
-
-def is_confident(response, model, tokenizer, threshold=0.5):
-    inputs = tokenizer(response, return_tensors="tf", truncation=True)
-    outputs = model.generate(**inputs, return_dict_in_generate=True, output_scores=True)
-    probs = tf.nn.softmax(outputs.scores[0], axis=-1)
-    top_prob = tf.reduce_max(probs).numpy()
-    return top_prob >= threshold
-
-# === Gradio interface function ===
+if config["metrics"]["request_log"]:
+    # One JSON line per request with its stage timings and outcomes
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    metrics.request_log.addHandler(handler)
+    metrics.request_log.setLevel(logging.INFO)
+
+# === Load model, knowledge base and indexes ===
+# The model is read from model_dir on first use; warm-up runs in the background
+service = AnswerService(config)
+runtime = service.runtime
+retriever = service.retriever
+if config["warmup_on_start"]:
+    runtime.start_warmup()
+
+examples = [
+    "Why was Kimathi carrying a revolver?",
+    "Who sentenced Kimathi?",
+    "What was the final verdict?",
+    "Did Kimathi own a cat?",
+    "What is Kimathi's zodiac sign?",
+    "Was Kimathi a communist?"
+]
+
+if service.answer_cache is not None and config["cache"]["prewarm"]:
+    warmed = service.prewarm(examples + load_csv_questions(config["cache"]["prewarm_csv"]))
+    print(f"Answer cache pre-warmed with {warmed} questions")
+
+# === Gradio interface functions ===
 def gradio_response(question):
-    response = chat_with_model(question, tokenizer, model, config)
-    confident = is_confident(response, model, tokenizer)
-    verified = verify_answer(question, response)
+    with metrics.request("gradio"):
+        return service.respond(question)
+
+def gradio_stream_response(question):
+    """Like gradio_response, but yields the answer while it is being decoded"""
+    # Gradio may resume a generator on a different thread, so the trace is passed explicitly
+    trace = metrics.RequestTrace("stream")
+    try:
+        found = service.lookup(question, trace)
+        if found is not None:
+            yield f" {found[1]}"
+            return
 
-    if not verified or not confident:
-        return (
-            f"🤔 I'm not completely sure about this one, but here's my best shot:\n\n"
-            f"{response}\n\n"
-            f"Verification: {verified}, Confidence: {confident}"
-        )
-    return f" {response}"
+        answer_cache = service.answer_cache
+        if answer_cache is not None:
+            with metrics.stage("cache_lookup", trace):
+                cached = answer_cache.get(question, service.stream_cache_params)
+            if cached is not None:
+                metrics.event("cache_hit", trace)
+                yield service.format_response(question, *cached, trace=trace)
+                return
+            metrics.event("cache_miss", trace)
 
+        with metrics.stage("prompt", trace):
+            prompt = service.make_prompt(question)
 
+        response, logprobs = "", []
+        with metrics.stage("stream_decode", trace):
+            state = runtime.streamer.start(prompt)
+            count_truncated([state["input_length"]], config, [trace])
+            for response, logprobs in runtime.streamer.stream_text(prompt, state):
+                if "first_token_ms" not in trace.fields:
+                    trace.fields["first_token_ms"] = round((time.perf_counter() - trace.start) * 1000, 3)
+                yield response
+        if answer_cache is not None:
+            answer_cache.put(question, service.stream_cache_params, (response, logprobs))
+        yield service.format_response(question, response, logprobs, trace)
+    finally:
+        trace.finish()
 
 # === Launch Gradio app ===
 interface = gr.Interface(
-    fn=gradio_response,
+    fn=gradio_stream_response if config["streaming"]["enabled"] else gradio_response,
     inputs=gr.Textbox(lines=2, placeholder="Ask about Kimathi's 1956 trial..."),
     outputs="text",
     title="Dedan Kimathi Trial Chatbot",
     description="Ask questions about Dedan Kimathi’s 1956 trial. The model will only answer if it’s confident and grounded in historical fact.",
     allow_flagging="never",
-    examples=[
-        "Why was Kimathi carrying a revolver?",
-        "Who sentenced Kimathi?",
-        "What was the final verdict?",
-        "Did Kimathi own a cat?",
-        "What is Kimathi's zodiac sign?",
-        "Was Kimathi a communist?"
-    ]
+    examples=examples
 )
 
-interface.launch()
+if service.batcher is not None:
+    # Let up to a full batch of requests reach the batcher at once
+    interface.queue(default_concurrency_limit=config["batching"]["max_batch_size"])
+
+def metrics_endpoint():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def readiness():
+    """Readiness probe: 200 once the model has warmed up, 503 until then"""
+    status = runtime.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+def build_app():
+    """The FastAPI app serving /ready and /metrics, with the Gradio UI mounted at /.
+
+    The probe routes are registered before Gradio's, so they are reachable as
+    soon as the server accepts connections and are not shadowed by the UI.
+    """
+    app = FastAPI()
+    app.add_api_route("/ready", readiness, methods=["GET"])
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"])
+    return gr.mount_gradio_app(app, interface, path="/")
+
+# Importing the module (e.g. from benchmark.py) sets everything up without serving
+if __name__ == "__main__":
+    uvicorn.run(build_app(), host="127.0.0.1", port=7860)
@@ -0,0 +1,81 @@
+# Serving configuration for app.py, kept apart so tools can read it without starting the UI
+config = {
+    "model_dir": "model/flan-kimathi-model-v7",
+    "warmup_on_start": True,
+    # "tensorflow" (fp32) or "tflite" (int8 dynamic-range, greedy; `python quantized_backend.py export`)
+    "backend": "tensorflow",
+    "tflite_dir": "model/tflite",
+    # Written by `python model_runtime.py` (beam graph, plus the greedy one in greedy/); only used when use_xla is on
+    "prebuilt_generate_dir": "model/compiled_generate",
+    "max_input_length": 64,
+    "generation_params": {
+        "max_new_tokens": 60,
+        "num_beams": 4,
+        "no_repeat_ngram_size": 2,
+        "do_sample": False,
+        "early_stopping": True,
+        "repetition_penalty": 2.0
+    },
+    # Decode greedily and re-run beam search only for answers that score badly (adaptive_decoding.py)
+    "adaptive_decoding": {
+        "enabled": True,
+        "min_confidence": 0.6,
+        "max_repetition": 0.5,
+        "min_repetition_tokens": 8
+    },
+    "use_xla": False,
+    "xla_length_buckets": [16, 32, 64],
+    "xla_batch_buckets": [1, 2, 4, 8],
+    # Streamed answers are greedy, not beam search, so they can differ from the non-streaming ones
+    "streaming": {
+        "enabled": False
+    },
+    "batching": {
+        "enabled": False,
+        "max_batch_size": 8,
+        "max_wait_ms": 10
+    },
+    "cache": {
+        "enabled": True,
+        "max_size": 1024,
+        "ttl_seconds": None,
+        "prewarm": False,
+        "prewarm_csv": "data/qa_pairs/manual/kimathi_qa_text2text.csv"
+    },
+    "retrieval": {
+        "enabled": False,
+        "index_dir": "data/index/sections",
+        "top_k": 3
+    },
+    "curated": {
+        "enabled": True,
+        "csv": "data/qa_pairs/manual/kimathi_qa_text2text.csv",
+        "index_dir": "data/index/curated",
+        # `python curated_qa.py calibrate`: no near-miss in curated_paraphrases.csv gets past the
+        # number/negation/content-word guard above 0.6; 0.7 keeps a margin and answers 20 of 23 paraphrases
+        "threshold": 0.7
+    },
+    "graph": {
+        # Off until the relationship network is re-extracted: most of its edges are seen once
+        # and join span fragments, so even filtered answers are thin
+        "enabled": False,
+        "graph_dir": "data/knowledge_base/compiled/graph",
+        "top_k": 5,
+        # Nodes named fewer times than this are never listed in an answer
+        "min_mentions": 2
+    },
+    "timeline": {
+        "enabled": True,
+        "index_dir": "data/knowledge_base/compiled/timeline_index",
+        # Answer "when ...?" straight from the index instead of only verifying the model's answer
+        "answer_when": False
+    },
+    "metrics": {
+        "request_log": True
+    },
+    "verification": {
+        "use_knowledge_base": True,
+        "knowledge_base_dir": "data/knowledge_base",
+        "compiled_kb_dir": "data/knowledge_base/compiled"
+    }
+}
@@ -0,0 +1,85 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Collects concurrent requests into small batches for a single worker thread.
+
+    Callers block on submit(item).result() (or just call the batcher). The worker
+    waits for a first item, then keeps collecting for up to max_wait_ms or until
+    max_batch_size items are queued, and hands the whole list to process_batch,
+    which must return one result per item in the same order.
+    """
+
+    def __init__(self, process_batch, max_batch_size=8, max_wait_ms=10):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches_run = 0
+        self.items_run = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        # Held across the closed check and the put, so nothing is queued behind the stop marker
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def close(self):
+        """Stop the worker after it drains the requests already queued"""
+        with self._lock:
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)  # re-queue the stop marker for _run
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            items = [item for item, _ in batch]
+            try:
+                results = self.process_batch(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.items_run += len(items)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    @property
+    def mean_batch_size(self):
+        return self.items_run / self.batches_run if self.batches_run else 0.0
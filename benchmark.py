@@ -0,0 +1,279 @@
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from answer_cache import load_csv_questions
+
+QA_CSV = "data/qa_pairs/manual/kimathi_qa_text2text.csv"
+
+
+def latency_summary(seconds):
+    ms = np.asarray(seconds) * 1000
+    if not len(ms):
+        return {}
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+        "max_ms": float(ms.max()),
+    }
+
+
+def timed(fn, *args, repeat=1):
+    """Run fn(*args) repeat times; return the last result and the per-run seconds"""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        seconds.append(time.perf_counter() - start)
+    return result, seconds
+
+
+def bench_serving(target="chat", concurrency=1, limit=None, warmup=2, use_cache=False, use_lookups=False):
+    """Replay the manual QA questions through app.py and measure latency and throughput.
+
+    target "chat" calls chat_with_model, "gradio" the non-streaming
+    gradio_response (curated lookup, cache, verification and formatting
+    included) and "stream" drains gradio_stream_response, also recording the
+    time to its first yield.
+
+    The replayed questions are the curated ones, so unless use_lookups is set
+    the curated, graph and timeline indexes are switched off; otherwise the
+    curated lookup would answer nearly every question without the model.
+    """
+    import app
+
+    if not use_cache:
+        app.service.answer_cache = None
+    if not use_lookups:
+        app.service.curated_answers = None
+        app.service.relationship_graph = None
+        app.service.timeline_index = None
+    questions = load_csv_questions(QA_CSV)[:limit]
+
+    # Count the decoded answer's tokens, not the banner and footer format_response wraps it in
+    generated = threading.local()
+    format_response = app.service.format_response
+
+    def counting_format_response(question, response, logprobs, trace=None):
+        generated.tokens = len(logprobs)
+        return format_response(question, response, logprobs, trace)
+
+    app.service.format_response = counting_format_response
+
+    def run(question):
+        start = time.perf_counter()
+        first = None
+        # Lookup answers never reach format_response and decode nothing
+        generated.tokens = 0
+        if target == "chat":
+            answer, logprobs = app.chat_with_model(
+                question, app.runtime, app.config, return_scores=True, retriever=app.retriever
+            )
+            tokens = len(logprobs)
+        else:
+            if target == "gradio":
+                answer = app.gradio_response(question)
+            else:
+                for answer in app.gradio_stream_response(question):
+                    first = first or time.perf_counter() - start
+            tokens = generated.tokens
+        return time.perf_counter() - start, first, tokens
+
+    for question in questions[:warmup]:
+        run(question)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(run, questions))
+    wall = time.perf_counter() - start
+
+    latencies = [latency for latency, _, _ in results]
+    tokens = sum(n for _, _, n in results)
+    summary = {
+        "target": target,
+        "concurrency": concurrency,
+        "questions": len(questions),
+        "use_cache": use_cache,
+        "use_lookups": use_lookups,
+        "wall_seconds": wall,
+        "questions_per_second": len(questions) / wall if wall else 0.0,
+        "generated_tokens": tokens,
+        "tokens_per_second": tokens / wall if wall else 0.0,
+        "latency": latency_summary(latencies),
+        "config": {
+            key: app.config[key]
+            for key in (
+                "backend", "use_xla", "generation_params", "adaptive_decoding", "batching", "streaming", "curated"
+            )
+        },
+        "decode_counts": dict(app.runtime.decode_counts),
+        "beam_escalation_rate": app.runtime.escalation_rate,
+    }
+    if target == "stream":
+        summary["time_to_first_yield"] = latency_summary([first for _, first, _ in results if first is not None])
+    return summary
+
+
+def bench_preprocessing(repeat=3, extracted_dir="data/extracted_text", spacy_sections=200):
+    """Time each preprocessing stage on the bundled corpus.
+
+    Cleaning and segmentation run over every extracted book; the spaCy parse
+    and each spaCy extractor run over the first spacy_sections cleaned
+    segments, and the theme model is fitted over all of them.
+    """
+    from data.preprocesssing.text_cleaner import KimathiTextCleaner
+    from data.preprocesssing.preprocessing import TextPreprocessor
+    from data.preprocesssing.segmenter import TokenSegmenter
+    from segment_shards import iter_book_segments
+
+    books = {}
+    for path in sorted(Path(extracted_dir).glob("*.txt")):
+        with open(path, "r", encoding="utf-8") as f:
+            books[path.stem] = f.read()
+    total_chars = sum(len(text) for text in books.values())
+    results = {"corpus_chars": total_chars}
+
+    def stage(name, fn, units, unit_name="chars"):
+        _, seconds = timed(fn, repeat=repeat)
+        best = min(seconds)
+        results[name] = {
+            "best_seconds": best,
+            "mean_seconds": sum(seconds) / len(seconds),
+            f"{unit_name}_per_second": units / best if best else 0.0,
+        }
+
+    cleaner = KimathiTextCleaner()
+    cleaned = {}
+
+    def clean_all():
+        for name, text in books.items():
+            cleaned[name] = cleaner.clean_text(text)
+
+    stage("clean_text", clean_all, total_chars)
+    cleaned_chars = sum(len(text) for text in cleaned.values())
+
+    preprocessor = TextPreprocessor()
+    stage("segment_text", lambda: [preprocessor.segment_text(text) for text in cleaned.values()], cleaned_chars)
+
+    segmenter = TokenSegmenter()
+    stage("token_segment", lambda: [segmenter.segment(text) for text in cleaned.values()], cleaned_chars)
+
+    from data.preprocesssing.spacy_models import load_nlp
+    from data.preprocesssing.entity_extractor import EntityExtractor
+    from data.preprocesssing.relationship_extractor import RelationshipExtractor
+    from data.preprocesssing.timeline_extractor import TimelineExtractor
+    from data.preprocesssing.theme_extractor import ThemeExtractor
+
+    sections = [
+        (text, book[:-len("_cleaned")])
+        for book, _, text in iter_book_segments()
+        if text.strip()
+    ][:spacy_sections]
+    nlp = load_nlp()
+    docs = []
+
+    def parse():
+        docs[:] = nlp.pipe(sections, as_tuples=True)
+    stage("spacy_parse", parse, len(sections), "sections")
+    for name, extractor_class in (
+        ("entity_extractor", EntityExtractor),
+        ("relationship_extractor", RelationshipExtractor),
+        ("timeline_extractor", TimelineExtractor),
+    ):
+        def extract(extractor_class=extractor_class):
+            extractor = extractor_class()
+            for doc, label in docs:
+                extractor.extract_from_doc(doc, label)
+        stage(name, extract, len(docs), "sections")
+
+    all_sections = [(book, key, text) for book, key, text in iter_book_segments() if text.strip()]
+    with tempfile.TemporaryDirectory() as model_dir:
+        def themes():
+            extractor = ThemeExtractor(model_dir)
+            extractor.fit(all_sections)
+            extractor.extract_book_themes()
+        stage("theme_extractor", themes, len(all_sections), "sections")
+    return results
+
+
+def run_metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline):
+    """Print every numeric metric next to its value in a previous results file"""
+    current, baseline = flatten(current["results"]), flatten(baseline["results"])
+    for name in sorted(current):
+        if name in baseline and baseline[name]:
+            change = 100 * (current[name] - baseline[name]) / baseline[name]
+            print(f"{name:60s} {baseline[name]:12.3f} -> {current[name]:12.3f} ({change:+.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the serving and preprocessing hot paths")
+    parser.add_argument("suite", choices=["serving", "preprocessing"])
+    parser.add_argument("--target", choices=["chat", "gradio", "stream"], default="chat")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N questions")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--use-cache", action="store_true", help="leave the answer cache on")
+    parser.add_argument(
+        "--use-lookups", action="store_true", help="leave the curated, graph and timeline answers on"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output-dir", default="benchmarks")
+    parser.add_argument("--compare", help="a previous results file to compare against")
+    args = parser.parse_args()
+
+    if args.suite == "serving":
+        results = bench_serving(
+            args.target, args.concurrency, args.limit, args.warmup, args.use_cache, args.use_lookups
+        )
+    else:
+        results = bench_preprocessing(args.repeat)
+    report = {"suite": args.suite, "meta": run_metadata(), "results": results}
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f"{args.suite}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Saved results to {output_path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
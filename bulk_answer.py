@@ -0,0 +1,210 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import time
+from pathlib import Path
+
+from app_config import config
+from inference import AnswerService, sequence_confidence
+
+QUESTION_FIELDS = ("question", "input_text", "body", "title")
+ID_FIELDS = ("id", "request_id")
+
+
+def _strip_prefix(question, prefix="question:"):
+    question = question.strip()
+    if question.lower().startswith(prefix):
+        question = question[len(prefix):].strip()
+    return question
+
+
+def read_questions(path, question_field=None, id_field=None):
+    """[{"index", "id", "question"[, "reference"]}] from a QA CSV or a JSONL file.
+
+    CSV rows are read like data/qa_pairs/manual/kimathi_qa_text2text.csv
+    (input_text, with target_text kept as the reference answer). JSONL
+    records use question_field/id_field, or the first of QUESTION_FIELDS
+    and ID_FIELDS they have, so requests.jsonl-style files work as is.
+    """
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        if Path(path).suffix == ".csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for index, row in enumerate(rows):
+            question_key = question_field or next((key for key in QUESTION_FIELDS if row.get(key)), None)
+            id_key = id_field or next((key for key in ID_FIELDS if key in row), None)
+            question = _strip_prefix(row.get(question_key) or "") if question_key else ""
+            if not question:
+                continue
+            record = {"index": index, "id": row[id_key] if id_key else index, "question": question}
+            if row.get("target_text"):
+                record["reference"] = row["target_text"].strip()
+            records.append(record)
+    return records
+
+
+def read_jsonl(path):
+    """Records of a JSONL file; a torn last line from a crash is ignored"""
+    records = []
+    if Path(path).exists():
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return records
+
+
+def part_paths(output_path):
+    output_path = Path(output_path)
+    return sorted(output_path.parent.glob(f"{output_path.name}.part*"))
+
+
+def record_key(record):
+    """What identifies an answered record on resume: its row, id and question, in case the input changed"""
+    return record["index"], record["id"], record["question"]
+
+
+def length_batches(records, prompts, batch_size):
+    """Batches of (record, prompt) pairs sorted by prompt length, so each batch pads to similar lengths.
+
+    Characters stand in for tokens: close enough to group similar lengths
+    without tokenizing every prompt a second time.
+    """
+    order = sorted(range(len(records)), key=lambda i: len(prompts[i]))
+    return [
+        [(records[i], prompts[i]) for i in order[start:start + batch_size]]
+        for start in range(0, len(order), batch_size)
+    ]
+
+
+def bulk_config(config):
+    """The serving config without the per-request machinery: no answer cache, micro-batcher or warm-up"""
+    return dict(
+        config,
+        warmup_on_start=False,
+        batching=dict(config["batching"], enabled=False),
+        cache=dict(config["cache"], enabled=False),
+    )
+
+
+def answer_records(service, records, batch_size, part_path, model_only=False):
+    """Answer records into part_path, one JSON line each, flushed after every batch"""
+    with open(part_path, "a", encoding="utf-8") as out:
+        pending = []
+        for record in records:
+            found = None if model_only else service.lookup(record["question"])
+            if found is None:
+                pending.append(record)
+                continue
+            out.write(json.dumps(dict(record, answer=found[1], source=found[0])) + "\n")
+        out.flush()
+
+        if not pending:
+            return
+        prompts = [service.make_prompt(record["question"]) for record in pending]
+        engine = service.runtime.engine
+        if engine is not None:
+            # The compiled generate() only accepts up to its largest batch bucket
+            batch_size = min(batch_size, engine.batch_buckets[-1])
+
+        for batch in length_batches(pending, prompts, batch_size):
+            records_in_batch = [record for record, _ in batch]
+            results = service.answer_batch(
+                [record["question"] for record in records_in_batch], prompts=[prompt for _, prompt in batch]
+            )
+            for record, (answer, logprobs) in zip(records_in_batch, results):
+                confident, verified = service.assess(record["question"], answer, logprobs)
+                out.write(json.dumps(dict(
+                    record,
+                    answer=answer,
+                    source="model",
+                    confidence=round(sequence_confidence(logprobs), 4),
+                    confident=confident,
+                    verified=verified,
+                )) + "\n")
+            out.flush()
+
+
+def _run_worker(worker_id, num_workers, records, output_path, batch_size, model_only):
+    service = AnswerService(bulk_config(config))
+    answer_records(
+        service, records[worker_id::num_workers], batch_size, f"{output_path}.part{worker_id}", model_only
+    )
+
+
+def answered_keys(output_path):
+    """record_key() of every answer in output_path and its part files"""
+    done = {record_key(record) for record in read_jsonl(output_path)}
+    for part in part_paths(output_path):
+        done.update(record_key(record) for record in read_jsonl(part))
+    return done
+
+
+def merge_parts(output_path, records):
+    """Fold the part files into output_path, one answer per input record, in input order.
+
+    Answers to questions no longer in records (the input file was edited
+    since they were written) are dropped.
+    """
+    current = {record_key(record) for record in records}
+    by_index = {}
+    for path in [output_path, *part_paths(output_path)]:
+        by_index.update(
+            (record["index"], record) for record in read_jsonl(path) if record_key(record) in current
+        )
+    with open(output_path, "w", encoding="utf-8") as f:
+        for index in sorted(by_index):
+            f.write(json.dumps(by_index[index]) + "\n")
+    for part in part_paths(output_path):
+        part.unlink()
+    return len(by_index)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a file of questions offline, without the Gradio UI")
+    parser.add_argument("input", help="a JSONL file, or a QA CSV with an input_text column")
+    parser.add_argument("output", help="JSONL answers; rerunning resumes from what it already holds")
+    parser.add_argument(
+        "--question-field", help=f"JSONL field with the question (default: first of {QUESTION_FIELDS})"
+    )
+    parser.add_argument("--id-field", help=f"JSONL field with the record id (default: first of {ID_FIELDS})")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=1, help="processes, each with its own model copy")
+    parser.add_argument(
+        "--model-only", action="store_true",
+        help="skip the curated, graph and timeline answers, e.g. to evaluate the model on the curated CSV"
+    )
+    args = parser.parse_args()
+
+    inputs = read_questions(args.input, args.question_field, args.id_field)
+    done = answered_keys(args.output)
+    records = [record for record in inputs if record_key(record) not in done]
+    print(f"{len(records)} questions to answer ({len(inputs) - len(records)} already done)")
+
+    start = time.perf_counter()
+    if args.workers > 1:
+        # spawn, not fork: TensorFlow does not survive being forked
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(
+                target=_run_worker,
+                args=(i, args.workers, records, args.output, args.batch_size, args.model_only)
+            )
+            for i in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    elif records:
+        _run_worker(0, 1, records, args.output, args.batch_size, args.model_only)
+    seconds = time.perf_counter() - start
+
+    total = merge_parts(args.output, inputs)
+    rate = len(records) / seconds if seconds else 0.0
+    print(f"Answered {len(records)} questions in {seconds:.1f}s ({rate:.2f} questions/s); {total} in {args.output}")
@@ -0,0 +1,228 @@
+import argparse
+import csv
+import hashlib
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from answer_cache import normalize_question
+
+
+NEGATIONS = frozenset({
+    "no", "not", "never", "none", "nobody", "nothing", "neither", "nor", "without", "cannot",
+    "dont", "doesnt", "didnt", "isnt", "wasnt", "werent", "arent", "cant", "couldnt", "wouldnt",
+    "wont", "hasnt", "havent", "hadnt", "shouldnt",
+})
+NUMBER_WORDS = frozenset({
+    "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten", "eleven", "twelve",
+    "first", "second", "third", "fourth", "fifth", "sixth", "seventh", "eighth", "ninth", "tenth",
+})
+# Long words that say nothing about what is being asked
+GUARD_STOPWORDS = frozenset({
+    "which", "where", "whose", "there", "their", "these", "those", "about", "would", "could", "should",
+    "being", "after", "before", "during", "other", "according", "describe", "explain",
+})
+_NUMBER = re.compile(r"\d+")
+
+
+def csv_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def guard_terms(question):
+    """(numbers, negated, content-word stems) of a question: what a paraphrase must not change"""
+    words = normalize_question(question).split()
+    numbers = frozenset(
+        number for word in words for number in (_NUMBER.findall(word) or ([word] if word in NUMBER_WORDS else []))
+    )
+    negated = any(word in NEGATIONS for word in words)
+    # Words of five letters or more, compared by their first five so "officer" matches "officers"
+    stems = frozenset(word[:5] for word in words if len(word) >= 5 and word not in GUARD_STOPWORDS)
+    return numbers, negated, stems
+
+
+def same_question(question, curated_question):
+    """False if question changes a number or a negation, or names something, the curated question does not.
+
+    Character n-grams score "Who commanded Divisions 8 and 9?" or "...
+    Kimathi's appeal?" almost as high as the curated "Divisions 6 and 7"
+    or "...Kimathi's trial?", so a high score alone is not a match.
+    """
+    numbers, negated, stems = guard_terms(question)
+    curated_numbers, curated_negated, curated_stems = guard_terms(curated_question)
+    return numbers == curated_numbers and negated == curated_negated and stems <= curated_stems
+
+
+def char_ngrams(question, min_n=3, max_n=5):
+    """Character n-grams of the normalized question, padded so word edges count"""
+    text = f" {normalize_question(question)} "
+    return [text[i:i + n] for n in range(min_n, max_n + 1) for i in range(len(text) - n + 1)]
+
+
+def load_curated_pairs(path, prefix="question:"):
+    """(question, answer) rows from a QA CSV such as data/qa_pairs/manual/kimathi_qa_text2text.csv"""
+    pairs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            question = row["input_text"].strip()
+            if question.lower().startswith(prefix):
+                question = question[len(prefix):].strip()
+            answer = row["target_text"].strip()
+            if question and answer:
+                pairs.append((question, answer))
+    return pairs
+
+
+def build_curated_index(csv_path="data/qa_pairs/manual/kimathi_qa_text2text.csv",
+                        output_dir="data/index/curated"):
+    """Build a char n-gram TF-IDF index over the curated questions and save it as flat arrays.
+
+    Rows are L2-normalized and stored term-major (CSR: indptr/question_ids/
+    weights), so the cosine similarity of a query to every curated question is
+    a sum over the posting rows of its n-grams.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    pairs = load_curated_pairs(csv_path)
+    term_counts = [Counter(char_ngrams(question)) for question, _ in pairs]
+
+    postings = {}
+    for question_id, counts in enumerate(term_counts):
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((question_id, tf))
+
+    vocab = {term: i for i, term in enumerate(sorted(postings))}
+    idf = np.array([
+        math.log((1 + len(pairs)) / (1 + len(postings[term]))) + 1 for term in vocab
+    ], dtype=np.float32)
+
+    norms = np.zeros(len(pairs), dtype=np.float64)
+    for question_id, counts in enumerate(term_counts):
+        norms[question_id] = math.sqrt(sum((tf * idf[vocab[term]]) ** 2 for term, tf in counts.items()))
+
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    question_ids, weights = [], []
+    for term, term_id in vocab.items():
+        for question_id, tf in postings[term]:
+            question_ids.append(question_id)
+            weights.append(tf * idf[term_id] / norms[question_id])
+        indptr[term_id + 1] = len(question_ids)
+
+    np.save(output_dir / "indptr.npy", indptr)
+    np.save(output_dir / "question_ids.npy", np.array(question_ids, dtype=np.int32))
+    np.save(output_dir / "weights.npy", np.array(weights, dtype=np.float32))
+    np.save(output_dir / "idf.npy", idf)
+    with open(output_dir / "vocab.json", "w", encoding="utf-8") as f:
+        json.dump(vocab, f)
+    with open(output_dir / "pairs.json", "w", encoding="utf-8") as f:
+        json.dump([{"question": q, "answer": a} for q, a in pairs], f, indent=2)
+    # Written last, with the hash of the CSV it was built from, so a stale or half-built index is rebuilt
+    with open(output_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"csv": str(csv_path), "csv_hash": csv_hash(csv_path)}, f, indent=2)
+    return len(pairs), len(vocab)
+
+
+def index_is_current(csv_path, index_dir="data/index/curated"):
+    """True if index_dir holds a complete index of csv_path as it is now"""
+    meta_path = Path(index_dir) / "meta.json"
+    if not meta_path.exists():
+        return False
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f)["csv_hash"] == csv_hash(csv_path)
+
+
+class CuratedAnswers:
+    """Answers a question from the curated set when it closely matches a curated question"""
+
+    def __init__(self, index_dir="data/index/curated", threshold=0.8):
+        index_dir = Path(index_dir)
+        self.threshold = threshold
+        self.indptr = np.load(index_dir / "indptr.npy")
+        self.question_ids = np.load(index_dir / "question_ids.npy")
+        self.weights = np.load(index_dir / "weights.npy")
+        self.idf = np.load(index_dir / "idf.npy")
+        with open(index_dir / "vocab.json", "r", encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        with open(index_dir / "pairs.json", "r", encoding="utf-8") as f:
+            self.pairs = json.load(f)
+
+    def search(self, question):
+        """Return (pair index, cosine similarity) of the closest curated question, or None"""
+        counts = Counter(char_ngrams(question))
+        known = [(self.vocab[term], tf) for term, tf in counts.items() if term in self.vocab]
+        if not known:
+            return None
+        # n-grams outside the vocabulary still count towards the query norm, with the max idf
+        max_idf = float(self.idf.max())
+        norm = math.sqrt(sum(
+            (tf * (self.idf[self.vocab[term]] if term in self.vocab else max_idf)) ** 2
+            for term, tf in counts.items()
+        ))
+
+        scores = np.zeros(len(self.pairs), dtype=np.float32)
+        for term_id, tf in known:
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            scores[self.question_ids[start:end]] += self.weights[start:end] * (tf * self.idf[term_id] / norm)
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+    def match(self, question):
+        """(pair index, similarity) of the closest curated question if it is the same question, else None"""
+        match = self.search(question)
+        if match is None or not same_question(question, self.pairs[match[0]]["question"]):
+            return None
+        return match
+
+    def lookup(self, question):
+        """The curated answer if the best match clears the threshold, else None"""
+        match = self.match(question)
+        if match is None or match[1] < self.threshold:
+            return None
+        return self.pairs[match[0]]["answer"]
+
+
+def load_paraphrases(path):
+    """(question, curated question or None) rows; None marks a near-miss that must not be answered"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [(row["question"], row["curated_question"] or None) for row in csv.DictReader(f)]
+
+
+def calibrate_threshold(answers, paraphrases):
+    """The lowest threshold at which no paraphrase gets a wrong curated answer, and the hits it keeps.
+
+    paraphrases are (question, curated question or None) rows held out from
+    the curated CSV. A wrong answer is a near-miss that matches at all or a
+    paraphrase that matches a different curated question; the threshold is
+    set just above the best-scoring one.
+    """
+    scored = []
+    for question, expected in paraphrases:
+        match = answers.match(question)
+        if match is not None:
+            scored.append((match[1], expected is not None and answers.pairs[match[0]]["question"] == expected))
+    wrong = [score for score, correct in scored if not correct]
+    threshold = float(np.nextafter(np.float32(max(wrong)), np.float32(1))) if wrong else 0.0
+    hits = sum(1 for score, correct in scored if correct and score >= threshold)
+    return threshold, hits, sum(1 for _, expected in paraphrases if expected is not None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the curated-question index, or calibrate its threshold")
+    parser.add_argument("command", nargs="?", choices=["build", "calibrate"], default="build")
+    parser.add_argument("--csv", default="data/qa_pairs/manual/kimathi_qa_text2text.csv")
+    parser.add_argument("--index-dir", default="data/index/curated")
+    parser.add_argument("--paraphrases", default="data/qa_pairs/manual/curated_paraphrases.csv")
+    args = parser.parse_args()
+
+    if args.command == "build" or not index_is_current(args.csv, args.index_dir):
+        num_pairs, num_terms = build_curated_index(args.csv, args.index_dir)
+        print(f"Indexed {num_pairs} curated questions ({num_terms} n-grams) into {args.index_dir}/")
+    if args.command == "calibrate":
+        threshold, hits, positives = calibrate_threshold(CuratedAnswers(args.index_dir), load_paraphrases(args.paraphrases))
+        print(f"threshold {threshold:.3f}: answers {hits} of {positives} paraphrases, no near-misses")
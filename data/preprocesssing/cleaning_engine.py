@@ -0,0 +1,168 @@
+import re
+import time
+import unicodedata
+from collections import Counter
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class CleaningRule:
+    def __init__(self, name, pattern, replacement, flags=0):
+        self.name = name
+        self.regex = re.compile(pattern, flags)
+        self.replacement = replacement
+        # Templates without group references can be returned as-is
+        self.is_literal = replacement is None or '\\' not in replacement
+
+    def replace(self, match_text, string, start):
+        if self.replacement is None:
+            return match_text
+        if self.is_literal:
+            return self.replacement
+        # Re-match this rule alone at the same spot so \1-style references line up
+        return self.regex.match(string, start).expand(self.replacement)
+
+
+class _StreamScanner:
+    """Applies one compiled regex to text arriving in chunks.
+
+    A match is only committed once it ends at least `overlap` characters
+    before the end of the buffered text, so matches up to that length are
+    never split across chunk boundaries.
+    """
+
+    def __init__(self, regex, replace, overlap):
+        self.regex = regex
+        self.replace = replace
+        self.overlap = overlap
+        self.buffer = ''
+
+    def _scan(self, final):
+        text = self.buffer
+        limit = len(text) if final else len(text) - self.overlap
+        out, pos = [], 0
+        for m in self.regex.finditer(text):
+            if not final and m.end() > limit:
+                limit = min(limit, m.start())  # may still grow with more input; keep it buffered
+                break
+            out.append(text[pos:m.start()])
+            out.append(self.replace(m))
+            pos = m.end()
+        cut = max(pos, limit)
+        out.append(text[pos:cut])
+        self.buffer = text[cut:]
+        return ''.join(out)
+
+    def feed(self, text):
+        self.buffer += text
+        if len(self.buffer) <= self.overlap:
+            return ''
+        return self._scan(final=False)
+
+    def finish(self):
+        return self._scan(final=True)
+
+
+class CleaningEngine:
+    """Compiles all cleaning rules into two regex passes over the text.
+
+    Pass one collapses whitespace (after NFKC normalization); pass two is a
+    single alternation of every rule, with the preserved terms tried first so
+    no rule can rewrite inside them. Rules are therefore applied left to right
+    in one scan rather than one full pass each; where two rules could match
+    overlapping text, the earlier one in the alternation wins.
+    """
+
+    def __init__(self, rules, preserve_terms=(), overlap=4096):
+        self.rules = []
+        if preserve_terms:
+            terms = sorted(set(preserve_terms), key=len, reverse=True)
+            self.rules.append(CleaningRule('preserve_terms', '|'.join(map(re.escape, terms)), None))
+        self.rules.extend(rules)
+        self.overlap = overlap
+
+        self.rule_by_group = {}
+        branches = []
+        for i, rule in enumerate(self.rules):
+            group = f'r{i}'
+            self.rule_by_group[group] = rule
+            pattern = rule.regex.pattern
+            if rule.regex.flags & re.IGNORECASE:
+                pattern = f'(?i:{pattern})'
+            branches.append(f'(?P<{group}>{pattern})')
+        self.regex = re.compile('|'.join(branches))
+
+        self.hits = Counter()
+        self.seconds = Counter()
+
+    @classmethod
+    def from_patterns(cls, custom_patterns, **kwargs):
+        """Build the engine from the custom_patterns.json structure"""
+        rules = []
+        for i, (pattern, replacement) in enumerate(custom_patterns.get('ocr_artifacts', [])):
+            rules.append(CleaningRule(f'ocr_artifacts[{i}]', pattern, replacement))
+        rules.append(CleaningRule('footnotes', r'\[.*?\]', ''))
+        rules.append(CleaningRule('page_numbers', r'page \d+', '', re.IGNORECASE))
+        return cls(rules, preserve_terms=custom_patterns.get('preserve_terms', []), **kwargs)
+
+    def _replace(self, m):
+        rule = self.rule_by_group[m.lastgroup]
+        self.hits[rule.name] += 1
+        return rule.replace(m.group(), m.string, m.start())
+
+    def clean(self, text):
+        start = time.perf_counter()
+        text = unicodedata.normalize('NFKC', text)
+        self.seconds['normalize'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        text = _WHITESPACE.sub(' ', text).strip()
+        self.seconds['whitespace'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        text = self.regex.sub(self._replace, text)
+        self.seconds['rules'] += time.perf_counter() - start
+        return text
+
+    def clean_stream(self, chunks):
+        """Clean an iterable of text chunks, yielding cleaned text as it becomes final"""
+        whitespace = _StreamScanner(_WHITESPACE, lambda m: ' ', self.overlap)
+        rules = _StreamScanner(self.regex, self._replace, self.overlap)
+        pending = ''   # trailing chars NFKC might still combine with the next chunk
+        leading = True
+
+        def flush(text, final=False):
+            nonlocal leading
+            if final:
+                text = whitespace.finish().rstrip(' ')
+            else:
+                text = whitespace.feed(text)
+            if leading:
+                text = text.lstrip()
+                leading = not text
+            return rules.feed(text)
+
+        for chunk in chunks:
+            text = pending + chunk
+            split = len(text)
+            while split > 0 and unicodedata.combining(text[split - 1]):
+                split -= 1
+            split = max(split - 1, 0)
+            pending = text[split:]
+            yield flush(unicodedata.normalize('NFKC', text[:split]))
+
+        tail = flush(unicodedata.normalize('NFKC', pending))
+        tail += flush('', final=True)
+        yield tail + rules.finish()
+
+    def clean_file(self, input_path, output_path, chunk_size=1 << 20):
+        with open(input_path, 'r', encoding='utf-8') as src, open(output_path, 'w', encoding='utf-8') as dst:
+            for cleaned in self.clean_stream(iter(lambda: src.read(chunk_size), '')):
+                dst.write(cleaned)
+
+    def report(self):
+        """Per-rule hit counts and per-pass timings accumulated so far"""
+        return {
+            'hits': {rule.name: self.hits[rule.name] for rule in self.rules},
+            'seconds': dict(self.seconds),
+        }
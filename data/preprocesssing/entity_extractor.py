@@ -1,19 +1,22 @@
-import spacy
 import json
 from pathlib import Path
 from collections import defaultdict
-
-nlp = spacy.load("en_core_web_lg") 
+from kb_store import CompiledStoreWriter, ENTITY_COLUMNS
+from data.preprocesssing.spacy_models import load_nlp
 
 class EntityExtractor:
+    # ner tags the mentions, parser supplies ent.sent for the context
+    required_components = ("tok2vec", "ner", "parser")
+
     def __init__(self):
         self.output_dir = Path("data/knowledge_base/entities")
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.entities = defaultdict(list)
 
     def extract_entities(self, text, doc_label="source"):
-        doc = nlp(text)
-        
+        self.extract_from_doc(load_nlp()(text), doc_label)
+
+    def extract_from_doc(self, doc, doc_label="source"):
         for ent in doc.ents:
             self.entities[ent.label_].append({
                 "text": ent.text,
@@ -27,6 +30,13 @@ class EntityExtractor:
             with open(output_file, 'w', encoding='utf-8') as f:
                 json.dump(entries, f, indent=2)
 
+    def save_compiled(self, output_dir="data/knowledge_base/compiled/entities"):
+        """Write entities in the compact binary KB format, one table per entity type"""
+        writer = CompiledStoreWriter()
+        for entity_type, entries in self.entities.items():
+            writer.add_table(entity_type.lower(), entries, ENTITY_COLUMNS)
+        writer.save(output_dir)
+
 if __name__ == "__main__":
     extractor = EntityExtractor()
     
@@ -43,4 +53,5 @@ if __name__ == "__main__":
                 extractor.extract_entities(text, label)
     
     extractor.save_entities()
+    extractor.save_compiled()
     print("Entity extraction complete. Check /knowledge_base/entities/")
\ No newline at end of file
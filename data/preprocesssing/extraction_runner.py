@@ -0,0 +1,79 @@
+import argparse
+from tqdm import tqdm
+from data.preprocesssing.spacy_models import load_nlp
+from segment_shards import iter_book_segments
+from data.preprocesssing.entity_extractor import EntityExtractor
+from data.preprocesssing.relationship_extractor import RelationshipExtractor
+from data.preprocesssing.timeline_extractor import TimelineExtractor
+
+
+class ExtractionRunner:
+    """Parse every cleaned section once and feed the same Doc to all extractors.
+
+    Sections are streamed through nlp.pipe so spaCy can batch them and fan out
+    over n_process worker processes, and only the pipeline components some
+    extractor actually needs are left enabled.
+    """
+
+    def __init__(self, extractors, model="en_core_web_lg", n_process=1, batch_size=16):
+        self.extractors = extractors
+        self.model = model
+        self.n_process = n_process
+        self.batch_size = batch_size
+
+    def disabled_components(self, nlp):
+        required = set()
+        for extractor in self.extractors:
+            required.update(extractor.required_components)
+        return [name for name in nlp.pipe_names if name not in required]
+
+    def iter_sections(self, cleaned_dir="data/cleaned_text"):
+        """Yield (text, book label) for each section, labelled like the whole-book runs"""
+        for book, _, text in iter_book_segments(cleaned_dir):
+            if text.strip():
+                yield text, book[:-len("_cleaned")]
+
+    def parse(self, sections):
+        """Yield (doc, context) for each (text, context) pair, parsed with only the needed components"""
+        nlp = load_nlp(self.model)
+        yield from nlp.pipe(
+            sections,
+            as_tuples=True,
+            disable=self.disabled_components(nlp),
+            n_process=self.n_process,
+            batch_size=self.batch_size
+        )
+
+    def run(self, cleaned_dir="data/cleaned_text"):
+        sections = list(self.iter_sections(cleaned_dir))
+        for doc, label in tqdm(self.parse(sections), total=len(sections), desc="Extracting"):
+            for extractor in self.extractors:
+                extractor.extract_from_doc(doc, label)
+        return len(sections)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run entity, relationship and timeline extraction in one spaCy pass")
+    parser.add_argument("--n-process", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    entities = EntityExtractor()
+    relationships = RelationshipExtractor()
+    timeline = TimelineExtractor()
+    runner = ExtractionRunner(
+        [entities, relationships, timeline],
+        n_process=args.n_process,
+        batch_size=args.batch_size
+    )
+    num_sections = runner.run()
+
+    entities.save_entities()
+    entities.save_compiled()
+    relationships.save_relationships()
+    relationships.save_compiled()
+    relationships.save_graph(entities.entities)
+    timeline.save_timeline()
+    timeline.save_compiled()
+    timeline.save_index()
+    print(f"Extraction complete over {num_sections} sections. Check data/knowledge_base/")
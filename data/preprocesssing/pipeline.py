@@ -0,0 +1,341 @@
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from segment_shards import iter_book_segments
+
+HERE = Path(__file__).resolve().parent
+
+STAGES = ("extract", "clean", "knowledge_base", "themes", "qa")
+
+# Source files whose edits invalidate a stage's outputs
+STAGE_CODE = {
+    "extract": ["preprocessing.py"],
+    "clean": ["preprocessing.py", "text_cleaner.py", "cleaning_engine.py", "segmenter.py", "../../segment_shards.py"],
+    "knowledge_base": [
+        "entity_extractor.py", "relationship_extractor.py", "timeline_extractor.py",
+        "spacy_models.py", "extraction_runner.py", "../../graph_store.py", "../../timeline_index.py",
+    ],
+    "themes": ["theme_extractor.py", "../../theme_model.py"],
+    "qa": ["../qa_generation.py"],
+}
+
+
+def bytes_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_version(stage):
+    digest = hashlib.sha256()
+    for name in STAGE_CODE[stage]:
+        digest.update(name.encode("utf-8"))
+        digest.update(file_hash(HERE / name).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """Records, per stage and unit of work, the hashes of its inputs, code and outputs"""
+
+    def __init__(self, path="data/metadata/pipeline_manifest.json"):
+        self.path = Path(path)
+        self.entries = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def is_fresh(self, stage, unit, inputs, code):
+        """True if unit was built, without errors, from these inputs and code and its outputs are untouched"""
+        entry = self.entries.get(stage, {}).get(unit)
+        if entry is None or entry["inputs"] != inputs or entry["code"] != code or entry.get("errors"):
+            return False
+        return all(
+            os.path.exists(path) and file_hash(path) == digest
+            for path, digest in entry["outputs"].items()
+        )
+
+    def record(self, stage, unit, inputs, code, outputs, errors=None):
+        """errors: {input: message} for inputs that failed; the unit is rebuilt until there are none"""
+        self.entries.setdefault(stage, {})[unit] = {
+            "inputs": inputs,
+            "code": code,
+            "outputs": {str(path): file_hash(path) for path in outputs},
+            "errors": errors or {},
+        }
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+
+
+class SectionCache:
+    """Content-addressed per-section results, so unchanged sections are never recomputed"""
+
+    def __init__(self, stage, code, cache_dir="data/.pipeline_cache"):
+        self.dir = Path(cache_dir) / stage
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.code = code
+
+    def _path(self, text, label):
+        key = bytes_hash(f"{self.code}\0{label}\0{text}".encode("utf-8"))
+        return self.dir / f"{key}.json"
+
+    def get(self, text, label):
+        path = self._path(text, label)
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return None
+
+    def put(self, text, label, result):
+        with open(self._path(text, label), "w", encoding="utf-8") as f:
+            json.dump(result, f)
+
+
+def iter_book_sections(cleaned_dir="data/cleaned_text"):
+    """Yield (book name, [(segment key, text), ...]) for every segmented book"""
+    books = {}
+    for book, key, text in iter_book_segments(cleaned_dir):
+        books.setdefault(book, []).append((key, text))
+    yield from books.items()
+
+
+class Pipeline:
+    """Runs the preprocessing stages in order, skipping work whose inputs have not changed"""
+
+    def __init__(self, force=False, n_process=1, batch_size=16):
+        self.force = force
+        self.n_process = n_process
+        self.batch_size = batch_size
+        self.manifest = BuildManifest()
+
+    def _fresh(self, stage, unit, inputs, code):
+        return not self.force and self.manifest.is_fresh(stage, unit, inputs, code)
+
+    def run_extract(self, input_dir="data/raw_text"):
+        from data.preprocesssing.preprocessing import PDFProcessor
+
+        processor = PDFProcessor(input_dir=input_dir, ocr_workers=os.cpu_count() or 1)
+        code = code_version("extract")
+        for pdf_path in sorted(Path(input_dir).glob("*.pdf")):
+            output_path = Path(processor.output_dir) / f"{pdf_path.stem}.txt"
+            inputs = {str(pdf_path): file_hash(pdf_path)}
+            if self._fresh("extract", pdf_path.name, inputs, code):
+                print(f"extract: {pdf_path.name} up to date")
+                continue
+
+            text = processor.extract_text_from_text_based_pdf(str(pdf_path))
+            if len(text.split()) < 100:
+                text = processor.extract_text_from_scanned_pdf(str(pdf_path))
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(processor.clean_extracted_text(text))
+            self.manifest.record("extract", pdf_path.name, inputs, code, [output_path])
+            self.manifest.save()
+
+    def run_clean(self, input_dir="data/extracted_text"):
+        from data.preprocesssing.preprocessing import TextPreprocessor
+        from data.preprocesssing.segmenter import TokenSegmenter
+
+        preprocessor = TextPreprocessor(segmenter=TokenSegmenter())
+        code = code_version("clean")
+        patterns = Path("data/metadata/custom_patterns.json")
+        for input_path in sorted(Path(input_dir).glob("*.txt")):
+            book_name = input_path.stem
+            inputs = {str(input_path): file_hash(input_path)}
+            if patterns.exists():
+                inputs[str(patterns)] = file_hash(patterns)
+            if self._fresh("clean", book_name, inputs, code):
+                print(f"clean: {book_name} up to date")
+                continue
+
+            num_segments = preprocessor.process_book(input_path, book_name)
+            book_dir = preprocessor.output_dir / f"{book_name}_cleaned"
+            # Drop sections left over from a previous segmentation
+            for stale in book_dir.glob("section_*.txt"):
+                if not preprocessor.write_section_files or int(stale.stem.split("_")[1]) > num_segments:
+                    stale.unlink()
+            outputs = [preprocessor.output_dir / f"{book_name}_cleaned.txt"]
+            shard = preprocessor.output_dir / f"{book_name}_cleaned.shard"
+            if preprocessor.segmenter is not None:
+                outputs += [shard, Path(f"{shard}.json")]
+            outputs += sorted(book_dir.glob("section_*.txt"))
+            self.manifest.record("clean", book_name, inputs, code, outputs)
+            self.manifest.save()
+
+    def _section_inputs(self):
+        return {
+            key: bytes_hash(text.encode("utf-8"))
+            for _, sections in iter_book_sections()
+            for key, text in sections
+        }
+
+    def run_knowledge_base(self):
+        from data.preprocesssing.extraction_runner import ExtractionRunner
+        from data.preprocesssing.entity_extractor import EntityExtractor
+        from data.preprocesssing.relationship_extractor import RelationshipExtractor
+        from data.preprocesssing.timeline_extractor import TimelineExtractor
+
+        code = code_version("knowledge_base")
+        inputs = self._section_inputs()
+        if self._fresh("knowledge_base", "all", inputs, code):
+            print("knowledge_base: up to date")
+            return
+
+        cache = SectionCache("knowledge_base", code)
+        sections = [
+            (text, book[:-len("_cleaned")])
+            for book, book_sections in iter_book_sections()
+            for _, text in book_sections
+            if text.strip()
+        ]
+        missing = [(text, label) for text, label in sections if cache.get(text, label) is None]
+        print(f"knowledge_base: parsing {len(missing)} of {len(sections)} sections")
+
+        def extractors():
+            return EntityExtractor(), RelationshipExtractor(), TimelineExtractor()
+
+        if missing:
+            runner = ExtractionRunner(extractors(), n_process=self.n_process, batch_size=self.batch_size)
+            # Each section gets extractors of its own, so its results can be cached on their own
+            for doc, (text, label) in runner.parse((text, (text, label)) for text, label in missing):
+                entities, relationships, timeline = extractors()
+                for extractor in (entities, relationships, timeline):
+                    extractor.extract_from_doc(doc, label)
+                cache.put(text, label, {
+                    "entities": entities.entities,
+                    "relationships": relationships._edge_records(),
+                    "events": timeline.events,
+                })
+
+        # Reassemble in corpus order so outputs match a from-scratch run
+        entities, relationships, timeline = extractors()
+        for text, label in sections:
+            result = cache.get(text, label)
+            for entity_type, entries in result["entities"].items():
+                entities.entities[entity_type].extend(entries)
+            for edge in result["relationships"]:
+                relationships.add_edge(
+                    edge["source"], edge["target"], edge["relation"], edge["context"], edge.get("count", 1)
+                )
+            timeline.events.extend(result["events"])
+
+        entities.save_entities()
+        entities.save_compiled()
+        relationships.save_relationships()
+        relationships.save_compiled()
+        relationships.save_graph(entities.entities)
+        timeline.save_timeline()
+        timeline.save_compiled()
+        timeline.save_index()
+
+        outputs = sorted(Path("data/knowledge_base").glob("*/*.json"))
+        outputs = [path for path in outputs if path.parent.name != "themes"]
+        compiled = Path("data/knowledge_base/compiled")
+        for name in ("entities", "relationships", "timelines", "graph", "timeline_index"):
+            outputs += sorted((compiled / name).iterdir())
+        self.manifest.record("knowledge_base", "all", inputs, code, outputs)
+        self.manifest.save()
+
+    def run_themes(self):
+        from data.preprocesssing.theme_extractor import ThemeExtractor, iter_sections
+
+        code = code_version("themes")
+        sections = list(iter_sections())
+        inputs = {
+            f"{book}/{section}": bytes_hash(text.encode("utf-8")) for book, section, text in sections
+        }
+        if self._fresh("themes", "all", inputs, code):
+            print("themes: up to date")
+            return
+
+        extractor = ThemeExtractor()
+        previous = self.manifest.entries.get("themes", {}).get("all")
+        model_exists = (extractor.model_dir / "model.json").exists()
+        # Sections only added since the last build: append them instead of refitting
+        if (
+            not self.force and previous is not None and model_exists and previous["code"] == code
+            and all(inputs.get(key) == digest for key, digest in previous["inputs"].items())
+        ):
+            extractor.update([
+                (book, section, text) for book, section, text in sections
+                if f"{book}/{section}" not in previous["inputs"]
+            ])
+        else:
+            extractor.fit(sections)
+        extractor.extract_book_themes()
+        extractor.save_themes()
+        outputs = [extractor.output_dir / "mau_mau_themes.json"] + sorted(extractor.model_dir.iterdir())
+        self.manifest.record("themes", "all", inputs, code, outputs)
+        self.manifest.save()
+
+    def run_qa(self):
+        from data.qa_generation import QAGenerator
+
+        code = code_version("qa")
+        generator = None
+        cache = SectionCache("qa", code)
+        for book, sections in iter_book_sections():
+            inputs = {key: bytes_hash(text.encode("utf-8")) for key, text in sections}
+            if self._fresh("qa", book, inputs, code):
+                print(f"qa: {book} up to date")
+                continue
+
+            texts = [text for _, text in sections if text.strip()]
+            missing = [text for text in texts if cache.get(text, book) is None]
+            errors = {}
+            if missing:
+                generator = generator or QAGenerator()
+                # Failed batches are not cached, so only they are regenerated on the next run
+                for text, pairs, error in generator.generate_qa_batches(missing, book, self.batch_size):
+                    if error is None:
+                        cache.put(text, book, pairs)
+                    else:
+                        errors[bytes_hash(text.encode("utf-8"))] = error
+
+            qa_data = []
+            for text in texts:
+                qa_data.extend(cache.get(text, book) or [])
+
+            output_file = Path("data/qa_pairs/automated") / f"{book}_qa.json"
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(qa_data, f, indent=2)
+            if errors:
+                print(f"qa: {len(errors)} sections of {book} failed and will be retried")
+            self.manifest.record("qa", book, inputs, code, [output_file], errors)
+            self.manifest.save()
+
+    def run(self, stages=STAGES):
+        for stage in STAGES:
+            if stage in stages:
+                getattr(self, f"run_{stage}")()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally rebuild the preprocessing outputs")
+    # Checked by hand: argparse tests an empty positional list against choices and rejects it
+    parser.add_argument("stages", nargs="*", help=f"stages to run (default: all of {', '.join(STAGES)})")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and rebuild everything")
+    parser.add_argument("--n-process", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args(argv)
+    unknown = [stage for stage in args.stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"invalid stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    args.stages = args.stages or list(STAGES)
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    Pipeline(force=args.force, n_process=args.n_process, batch_size=args.batch_size).run(args.stages)
@@ -1,16 +1,39 @@
 import os
+import hashlib
 import pdfplumber
 import pytesseract
-from pdf2image import convert_from_path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pdf2image import convert_from_path, pdfinfo_from_path
 from tqdm import tqdm
 import re
-from text_cleaner import KimathiTextCleaner
+from data.preprocesssing.text_cleaner import KimathiTextCleaner
+from data.preprocesssing.segmenter import TokenSegmenter
 from pathlib import Path
+from segment_shards import write_shard
+
+OCR_CONFIG = r'--oem 3 --psm 6 -l eng+swa'
+
+def preprocess_page_image(image):
+    """Grayscale and threshold a rasterized page before OCR"""
+    image = image.convert('L')
+    return image.point(lambda x: 0 if x < 140 else 255)
+
+def ocr_page_range(pdf_path, first_page, last_page, dpi=300, ocr_config=OCR_CONFIG):
+    """Rasterize and OCR only pages first_page..last_page; runs inside a worker process"""
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page)
+    return [
+        (page, pytesseract.image_to_string(preprocess_page_image(image), config=ocr_config))
+        for page, image in enumerate(images, first_page)
+    ]
 
 class PDFProcessor:
-    def __init__(self, input_dir="data/raw_text", output_dir="data/extracted_text"):
+    def __init__(self, input_dir="data/raw_text", output_dir="data/extracted_text",
+                 ocr_workers=1, pages_per_task=4, ocr_cache_dir="data/.ocr_cache"):
         self.input_dir = input_dir
         self.output_dir = output_dir
+        self.ocr_workers = ocr_workers
+        self.pages_per_task = pages_per_task
+        self.ocr_cache_dir = ocr_cache_dir
         os.makedirs(self.output_dir, exist_ok=True)
         
     def extract_text_from_text_based_pdf(self, pdf_path):
@@ -23,22 +46,68 @@ class PDFProcessor:
                     text += page_text + "\n\n"
         return text.strip()
     
-    def extract_text_from_scanned_pdf(self, pdf_path):
-        """Extract text from scanned PDFs using OCR"""
-        text = ""
-        images = convert_from_path(pdf_path, dpi=300)
+    def _page_cache_dir(self, pdf_path, dpi):
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        pdf_hash = digest.hexdigest()[:16]
+        config_hash = hashlib.sha256(OCR_CONFIG.encode('utf-8')).hexdigest()[:8]
+        cache_dir = Path(self.ocr_cache_dir) / pdf_hash / f"dpi{dpi}_{config_hash}"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        return cache_dir
 
-        custom_config = r'--oem 3 --psm 6 -l eng+swa'
+    def extract_text_from_scanned_pdf(self, pdf_path, dpi=300):
+        """Extract text from scanned PDFs using OCR, caching each page's text on disk.
 
-        
-        for i, image in enumerate(tqdm(images, desc=f"OCR Processing {os.path.basename(pdf_path)}")):
-            # preprocess image
-            image = image.convert('L') # grayscale
-            image = image.point(lambda x: 0 if x < 140 else 255)    # thresholding
-            page_text = pytesseract.image_to_string(image, config=custom_config)
-            text += page_text + "\n\n"
-        
-        return text.strip()
+        Only pages missing from the cache are rasterized, a range of at most
+        pages_per_task at a time, so peak memory depends on
+        ocr_workers * pages_per_task rather than on the length of the book.
+        With ocr_workers > 1 the ranges are OCRed in a process pool.
+        """
+        num_pages = pdfinfo_from_path(pdf_path)["Pages"]
+        cache_dir = self._page_cache_dir(pdf_path, dpi)
+
+        def page_path(page):
+            return cache_dir / f"page_{page:04d}.txt"
+
+        missing = [page for page in range(1, num_pages + 1) if not page_path(page).exists()]
+        ranges = []
+        for page in missing:
+            if ranges and page == ranges[-1][1] + 1 and page - ranges[-1][0] < self.pages_per_task:
+                ranges[-1][1] = page
+            else:
+                ranges.append([page, page])
+
+        with tqdm(total=len(missing), desc=f"OCR Processing {os.path.basename(pdf_path)}") as progress:
+            if self.ocr_workers > 1:
+                with ProcessPoolExecutor(max_workers=self.ocr_workers) as pool:
+                    futures = [pool.submit(ocr_page_range, pdf_path, first, last, dpi) for first, last in ranges]
+                    self._write_pages(
+                        (future.result() for future in as_completed(futures)), page_path, progress
+                    )
+            else:
+                self._write_pages(
+                    (ocr_page_range(pdf_path, first, last, dpi) for first, last in ranges), page_path, progress
+                )
+
+        pages = []
+        for page in range(1, num_pages + 1):
+            with open(page_path(page), 'r', encoding='utf-8') as f:
+                pages.append(f.read())
+        return "\n\n".join(pages).strip()
+
+    @staticmethod
+    def _write_pages(results, page_path, progress):
+        for result in results:
+            for page, page_text in result:
+                # Write beside the page and rename, so an interrupted write never looks cached
+                path = page_path(page)
+                tmp_path = path.with_name(path.name + ".tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(page_text)
+                os.replace(tmp_path, path)
+                progress.update(1)
     
     def clean_extracted_text(self, text):
         """Basic cleaning of extracted text"""
@@ -99,7 +168,7 @@ class PDFProcessor:
         return results
 
 if __name__ == "__main__":
-    processor = PDFProcessor()
+    processor = PDFProcessor(ocr_workers=os.cpu_count() or 1)
     results = processor.process_all_pdfs()
     
     print("\nProcessing Summary:")
@@ -115,34 +184,42 @@ if __name__ == "__main__":
 
 
 class TextPreprocessor:
-    def __init__(self):
+    def __init__(self, segmenter=None, write_section_files=None):
+        """segmenter: a TokenSegmenter; when set, each book is written as one packed shard"""
         self.cleaner = KimathiTextCleaner()
+        self.segmenter = segmenter
+        self.write_section_files = segmenter is None if write_section_files is None else write_section_files
         self.output_dir = Path("data/cleaned_text")
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
     def segment_text(self, text, max_chars=2000):
         """Split text into logical chunks"""
         segments = []
-        current_segment = ""
+        # Build each segment from a list of parts to avoid quadratic string concatenation
+        current_parts, current_length = [], 0
+
+        def flush():
+            segment = "".join(current_parts).strip()
+            if segment:
+                segments.append(segment)
         
         # First split by major sections
         for section in re.split(r'\n{2,}', text):
-            if len(current_segment) + len(section) <= max_chars:
-                current_segment += "\n\n" + section
+            if current_length + len(section) <= max_chars:
+                current_parts.append("\n\n" + section)
+                current_length += len(section) + 2
             else:
                 # Split by sentences if section is too long
                 sentences = re.split(r'(?<=[.!?])\s+', section)
                 for sentence in sentences:
-                    if len(current_segment) + len(sentence) <= max_chars:
-                        current_segment += " " + sentence
+                    if current_length + len(sentence) <= max_chars:
+                        current_parts.append(" " + sentence)
+                        current_length += len(sentence) + 1
                     else:
-                        if current_segment.strip():
-                            segments.append(current_segment.strip())
-                        current_segment = sentence
-        
-        if current_segment.strip():
-            segments.append(current_segment.strip())
+                        flush()
+                        current_parts, current_length = [sentence], len(sentence)
         
+        flush()
         return segments
 
     def process_book(self, input_path, book_name):
@@ -159,19 +236,34 @@ class TextPreprocessor:
             f.write(cleaned_text)
         
         # Segment and save sections
-        segments = self.segment_text(cleaned_text)
-        book_dir = self.output_dir / f"{book_name}_cleaned"
-        book_dir.mkdir(exist_ok=True)
-        
-        for i, segment in enumerate(segments, 1):
-            segment_path = book_dir / f"section_{i:03d}.txt"
-            with open(segment_path, 'w', encoding='utf-8') as f:
-                f.write(segment)
+        if self.segmenter is not None:
+            packed = self.segmenter.segment(cleaned_text)
+            write_shard(
+                packed,
+                self.output_dir / f"{book_name}_cleaned.shard",
+                metadata={
+                    "tokenizer": self.segmenter.tokenizer_path,
+                    "max_tokens": self.segmenter.max_tokens,
+                    "overlap_tokens": self.segmenter.overlap_tokens
+                }
+            )
+            segments = [text for text, _ in packed]
+        else:
+            segments = self.segment_text(cleaned_text)
+
+        if self.write_section_files:
+            book_dir = self.output_dir / f"{book_name}_cleaned"
+            book_dir.mkdir(exist_ok=True)
+            
+            for i, segment in enumerate(segments, 1):
+                segment_path = book_dir / f"section_{i:03d}.txt"
+                with open(segment_path, 'w', encoding='utf-8') as f:
+                    f.write(segment)
         
         return len(segments)
 
 if __name__ == "__main__":
-    preprocessor = TextPreprocessor()
+    preprocessor = TextPreprocessor(segmenter=TokenSegmenter())
     
     # Process both books
     books = {
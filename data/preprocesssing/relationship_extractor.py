@@ -1,43 +1,67 @@
-import spacy
-import networkx as nx
 import json
+from collections import Counter
 from pathlib import Path
-
-nlp = spacy.load("en_core_web_lg")
+from kb_store import CompiledStoreWriter, RELATIONSHIP_COLUMNS, RELATIONSHIP_INT_COLUMNS
+from graph_store import build_graph_store, load_json_entities
+from data.preprocesssing.spacy_models import load_nlp
 
 class RelationshipExtractor:
+    # parser supplies the dependency arcs, ner the entity spans the endpoints are widened to
+    required_components = ("tok2vec", "ner", "parser")
+
     def __init__(self):
         self.output_dir = Path("data/knowledge_base/relationships")
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.graph = nx.Graph()
+        # (source, target, relation, context) -> times seen; repeats are counted, not overwritten
+        self.edge_counts = Counter()
+
+    def add_edge(self, source, target, relation, context, count=1):
+        self.edge_counts[(source, target, relation, context)] += count
 
     def extract_relationships(self, text, doc_label="source"):
-        doc = nlp(text)
-        
+        self.extract_from_doc(load_nlp()(text), doc_label)
+
+    def extract_from_doc(self, doc, doc_label="source"):
+        # Tokens inside a named entity stand for the whole entity
+        entity_of = {token.i: ent for ent in doc.ents for token in ent}
         for sent in doc.sents:
             for token in sent:
                 if token.dep_ in ("nsubj", "dobj", "pobj"):
-                    subject = token.head.text
-                    obj = token.text
-                    relation = token.dep_
-                    
-                    self.graph.add_edge(subject, obj, relation=relation, source=doc_label)
+                    head = entity_of.get(token.head.i, token.head)
+                    dependent = entity_of.get(token.i, token)
+                    if head == dependent:
+                        continue
+                    self.add_edge(head.text, dependent.text, token.dep_, doc_label)
 
-    def save_relationships(self):
-        output_file = self.output_dir / "kimathi_network.json"
-        relationships = [
+    def _edge_records(self):
+        return [
             {
-                "source": u,
-                "target": v,
-                "relation": data["relation"],
-                "context": data["source"]
+                "source": source,
+                "target": target,
+                "relation": relation,
+                "context": context,
+                "count": count
             }
-            for u, v, data in self.graph.edges(data=True)
+            for (source, target, relation, context), count in self.edge_counts.items()
         ]
+
+    def save_relationships(self):
+        output_file = self.output_dir / "kimathi_network.json"
+        relationships = self._edge_records()
         
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(relationships, f, indent=2)
 
+    def save_compiled(self, output_dir="data/knowledge_base/compiled/relationships"):
+        """Write edges in the compact binary KB format"""
+        writer = CompiledStoreWriter()
+        writer.add_table("edges", self._edge_records(), RELATIONSHIP_COLUMNS, RELATIONSHIP_INT_COLUMNS)
+        writer.save(output_dir)
+
+    def save_graph(self, entities_by_type, output_dir="data/knowledge_base/compiled/graph"):
+        """Write the CSR graph store, with nodes resolved against the extracted entities"""
+        return build_graph_store(self._edge_records(), entities_by_type, output_dir)
+
 if __name__ == "__main__":
     extractor = RelationshipExtractor()
     
@@ -53,4 +77,6 @@ if __name__ == "__main__":
                 extractor.extract_relationships(text, label)
     
     extractor.save_relationships()
+    extractor.save_compiled()
+    extractor.save_graph(load_json_entities())
     print("Relationship extraction complete. Check /knowledge_base/relationships/")
\ No newline at end of file
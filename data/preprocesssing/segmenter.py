@@ -0,0 +1,86 @@
+import re
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+class TokenSegmenter:
+    """Packs sentences into segments measured in model tokens rather than characters.
+
+    Sentences are tokenized in one batched call, packed greedily up to
+    max_tokens, and each new segment starts with the trailing sentences of
+    the previous one worth up to overlap_tokens.
+    """
+
+    def __init__(self, tokenizer_path="model/flan-kimathi-model-v7", max_tokens=256, overlap_tokens=32):
+        from transformers import AutoTokenizer
+
+        self.tokenizer_path = tokenizer_path
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def _sentences(self, text):
+        sentences = []
+        for paragraph in re.split(r'\n{2,}', text):
+            sentences.extend(s for s in SENTENCE_BOUNDARY.split(paragraph) if s.strip())
+        return sentences
+
+    def _split_long(self, sentence, num_tokens):
+        """Cut a sentence longer than max_tokens into (piece, token count) runs that fit.
+
+        Words tokenize unevenly, so each run of words is measured and split
+        again while over budget; a single word still too long is cut on its
+        token ids.
+        """
+        words = sentence.split()
+        if len(words) == 1:
+            ids = self.tokenizer(sentence, add_special_tokens=False)["input_ids"]
+            chunks = [ids[i:i + self.max_tokens] for i in range(0, len(ids), self.max_tokens)]
+            return [(self.tokenizer.decode(chunk), len(chunk)) for chunk in chunks]
+        pieces = max(-(-num_tokens // self.max_tokens), 2)
+        step = -(-len(words) // pieces)
+        runs = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        units = []
+        for run, length in zip(runs, self._measure(runs)):
+            units.extend([(run, length)] if length <= self.max_tokens else self._split_long(run, length))
+        return units
+
+    def _measure(self, sentences):
+        encoded = self.tokenizer(sentences, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def segment(self, text):
+        """Return a list of (segment text, token count) pairs"""
+        sentences = self._sentences(text)
+        if not sentences:
+            return []
+        lengths = self._measure(sentences)
+
+        units = []
+        for sentence, length in zip(sentences, lengths):
+            if length <= self.max_tokens:
+                units.append((sentence, length))
+            else:
+                units.extend(self._split_long(sentence, length))
+
+        segments = []
+        current, current_tokens = [], 0
+        for sentence, length in units:
+            if current and current_tokens + length > self.max_tokens:
+                segments.append((" ".join(s for s, _ in current), current_tokens))
+                # Carry the tail of the finished segment over as context
+                carried, carried_tokens = [], 0
+                for prev, prev_length in reversed(current):
+                    if carried_tokens + prev_length > self.overlap_tokens:
+                        break
+                    carried.insert(0, (prev, prev_length))
+                    carried_tokens += prev_length
+                if carried_tokens + length > self.max_tokens:
+                    carried, carried_tokens = [], 0
+                current, current_tokens = carried, carried_tokens
+            current.append((sentence, length))
+            current_tokens += length
+
+        if current:
+            segments.append((" ".join(s for s, _ in current), current_tokens))
+        return segments
@@ -0,0 +1,9 @@
+from functools import lru_cache
+
+import spacy
+
+
+@lru_cache(maxsize=None)
+def load_nlp(model="en_core_web_lg"):
+    """Load a spaCy model once per process, on first use instead of at import"""
+    return spacy.load(model)
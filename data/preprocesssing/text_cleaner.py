@@ -1,11 +1,11 @@
-import re
 import json
 from pathlib import Path
-import unicodedata
+from data.preprocesssing.cleaning_engine import CleaningEngine
 
 class KimathiTextCleaner:
     def __init__(self):
         self.custom_patterns = self._load_custom_patterns()
+        self.engine = CleaningEngine.from_patterns(self.custom_patterns)
     
     def _load_custom_patterns(self):
         """Load domain-specific cleaning rules"""
@@ -26,38 +26,14 @@ class KimathiTextCleaner:
             ]
         }
 
-    def normalize_text(self, text):
-        """Standardize text encoding and spacing"""
-        text = unicodedata.normalize('NFKC', text)  # Normalize unicode
-        text = re.sub(r'\s+', ' ', text)  # Standardize whitespace
-        return text.strip()
-
-    def fix_ocr_errors(self, text):
-        """Correct common OCR mistakes"""
-        for pattern, replacement in self.custom_patterns.get("ocr_artifacts", []):
-            text = re.sub(pattern, replacement, text)
-        return text
-
-    def protect_special_terms(self, text):
-        """Ensure domain-specific terms are preserved"""
-        for term in self.custom_patterns.get("preserve_terms", []):
-            text = text.replace(term, f"@@{term}@@")
-        return text
+    def clean_text(self, text):
+        """Full cleaning pipeline, compiled into a single rule pass by CleaningEngine"""
+        return self.engine.clean(text)
 
-    def restore_special_terms(self, text):
-        """Restore protected terms after processing"""
-        return text.replace('@@', '')
+    def clean_file(self, input_path, output_path):
+        """Clean a file in chunks without holding the whole book in memory"""
+        self.engine.clean_file(input_path, output_path)
 
-    def clean_text(self, text):
-        """Full cleaning pipeline"""
-        text = self.normalize_text(text)
-        text = self.protect_special_terms(text)
-        text = self.fix_ocr_errors(text)
-        
-        # Standard cleaning operations
-        text = re.sub(r'\s+', ' ', text)  # Collapse whitespace
-        text = re.sub(r'\[.*?\]', '', text)  # Remove footnotes
-        text = re.sub(r'page \d+', '', text, flags=re.IGNORECASE)  # Remove page numbers
-        
-        text = self.restore_special_terms(text)
-        return text
\ No newline at end of file
+    def cleaning_report(self):
+        """Per-rule hit counts and per-pass timings for everything cleaned so far"""
+        return self.engine.report()
\ No newline at end of file
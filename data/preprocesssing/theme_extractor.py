@@ -1,22 +1,43 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
 import json
 from pathlib import Path
+from theme_model import ThemeModel, add_sections, build_theme_model, iter_sections
 
 class ThemeExtractor:
-    def __init__(self):
+    """Book themes from one TF-IDF model fitted over every cleaned section (theme_model.py)"""
+
+    def __init__(self, model_dir="data/index/themes"):
         self.output_dir = Path("data/knowledge_base/themes")
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.model_dir = Path(model_dir)
+        self.model = None
         self.themes = []
 
-    def extract_themes(self, text, doc_label="source"):
-        # Use TF-IDF to find important terms
-        tfidf = TfidfVectorizer(max_features=50, stop_words='english')
-        tfidf_matrix = tfidf.fit_transform([text])
-        feature_names = tfidf.get_feature_names_out()
-        
+    def fit(self, sections, n_features=None):
+        """Fit the corpus model on (book, section, text) rows; n_features switches to hashing"""
+        build_theme_model(sections, self.model_dir, n_features)
+        self.model = ThemeModel(self.model_dir)
+
+    def update(self, sections):
+        """Add new sections to the saved model without refitting"""
+        add_sections(sections, self.model_dir)
+        self.model = ThemeModel(self.model_dir)
+
+    def extract_book_themes(self, top_k=50):
+        for book in self.model.books():
+            self.themes.append({
+                "source": book[:-len("_cleaned")] if book.endswith("_cleaned") else book,
+                "key_terms": [term for term, _ in self.model.book_top_terms(book, top_k)]
+            })
+
+    def extract_themes(self, text, doc_label="source", top_k=50):
+        # Weigh a new text's terms by the corpus IDF
+        if self.model is None:
+            self.model = ThemeModel(self.model_dir)
+        features, weights = self.model.vectorize(text)
+        order = weights.argsort()[::-1][:top_k]
         self.themes.append({
             "source": doc_label,
-            "key_terms": feature_names.tolist()
+            "key_terms": [self.model.names[int(features[i])] for i in order]
         })
 
     def save_themes(self):
@@ -26,17 +47,7 @@ class ThemeExtractor:
 
 if __name__ == "__main__":
     extractor = ThemeExtractor()
-    
-    cleaned_files = [
-        ("dedan_kimathi_on_trial", "data/cleaned_text/dedan_kimathi_on_trial_cleaned.txt"),
-        ("the_trial_of_dedan_kimathi", "data/cleaned_text/the_trial_of_dedan_kimathi_cleaned.txt")
-    ]
-    
-    for label, filepath in cleaned_files:
-        if Path(filepath).exists():
-            with open(filepath, 'r', encoding='utf-8') as f:
-                text = f.read()
-                extractor.extract_themes(text, label)
-    
+    extractor.fit(iter_sections())
+    extractor.extract_book_themes()
     extractor.save_themes()
-    print("Theme extraction complete. Check /knowledge_base/themes/")
\ No newline at end of file
+    print("Theme extraction complete. Check /knowledge_base/themes/")
@@ -1,37 +1,62 @@
-import re
 import json
-from datetime import datetime
 from pathlib import Path
+from kb_store import CompiledStoreWriter, TIMELINE_COLUMNS
+from timeline_index import build_timeline_index, find_dates
 
 class TimelineExtractor:
+    # Regex only; runs on the raw text of whatever doc it is handed
+    required_components = ()
+
     def __init__(self):
         self.output_dir = Path("data/knowledge_base/timelines")
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.events = []
+        self._seen = set()
+
+    @staticmethod
+    def _context(text, start, end, width=50):
+        """Up to width chars either side of the match, cut back to whole words"""
+        left, right = max(start - width, 0), min(end + width, len(text))
+        if left > 0 and not text[left - 1].isspace():
+            left = text.find(" ", left, start) + 1 or left
+        if right < len(text) and not text[right].isspace():
+            cut = text.rfind(" ", end, right)
+            right = cut if cut != -1 else right
+        return " ".join(text[left:right].split())
 
     def extract_events(self, text, doc_label="source"):
-        # Regex to find dates and events
-        date_patterns = [
-            r"(\d{1,2}(?:st|nd|rd|th)? \w+ \d{4})",  # "21 October 1956"
-            r"(?:January|February|March|April|May|June|July|August|September|October|November|December) \d{4}",  # "October 1956"
-        ]
-        
-        for pattern in date_patterns:
-            for match in re.finditer(pattern, text):
-                date_str = match.group()
-                context = text[match.start()-50 : match.end()+50]  # Nearby text
-                
-                self.events.append({
-                    "date": date_str,
-                    "event": context.strip(),
-                    "source": doc_label
-                })
+        # One compiled pattern for every date form, so no span is matched twice
+        for start, end, date_str, _, _, label in find_dates(text):
+            context = self._context(text, start, end)
+            # Overlapping segments repeat the same sentence; keep one copy
+            key = (label, doc_label, context)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            self.events.append({
+                "date": date_str,
+                "event": context,
+                "source": doc_label
+            })
+
+    def extract_from_doc(self, doc, doc_label="source"):
+        self.extract_events(doc.text, doc_label)
 
     def save_timeline(self):
         output_file = self.output_dir / "kimathi_timeline.json"
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(self.events, f, indent=2)
 
+    def save_compiled(self, output_dir="data/knowledge_base/compiled/timelines"):
+        """Write events in the compact binary KB format"""
+        writer = CompiledStoreWriter()
+        writer.add_table("events", self.events, TIMELINE_COLUMNS)
+        writer.save(output_dir)
+
+    def save_index(self, output_dir="data/knowledge_base/compiled/timeline_index"):
+        """Write the date-sorted timeline index used for range and "when" lookups"""
+        return build_timeline_index(self.events, output_dir)
+
 if __name__ == "__main__":
     extractor = TimelineExtractor()
     
@@ -47,4 +72,6 @@ if __name__ == "__main__":
                 extractor.extract_events(text, label)
     
     extractor.save_timeline()
+    extractor.save_compiled()
+    extractor.save_index()
     print("Timeline extraction complete. Check /knowledge_base/timelines/")
\ No newline at end of file
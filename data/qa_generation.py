@@ -1,6 +1,11 @@
+import argparse
+import hashlib
 import json
+import multiprocessing
+import re
 from pathlib import Path
 from tqdm import tqdm
+from segment_shards import iter_book_segments
 from transformers import pipeline, AutoTokenizer, TFAutoModelForSeq2SeqLM
 
 class QAGenerator:
@@ -18,9 +23,8 @@ class QAGenerator:
         self.output_dir = Path("data/qa_pairs/automated")
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
-    def generate_qa_from_text(self, text_chunk, source_label):
-        """Generate one QA pair per call with more reliable prompt"""
-        prompt = f"""
+    def _build_prompt(self, text_chunk):
+        return f"""
         Create one question and answer pair based on this text.
         ALWAYS use exactly this format:
         Question: [question here]
@@ -28,6 +32,10 @@ class QAGenerator:
         
         Text: {text_chunk[:500]}  # Smaller chunk for flan-t5-small
         """
+
+    def generate_qa_from_text(self, text_chunk, source_label):
+        """Generate one QA pair per call with more reliable prompt"""
+        prompt = self._build_prompt(text_chunk)
         
         try:
             result = self.qa_model(
@@ -63,31 +71,164 @@ class QAGenerator:
 
     def process_all_segments(self):
         """Process files with error handling and progress tracking"""
-        for book_dir in Path("data/cleaned_text").glob("*_cleaned"):
-            if not book_dir.is_dir():
-                continue
-                
+        for book, segments in group_segments_by_book().items():
             qa_data = []
-            print(f"\nProcessing {book_dir.name}...")
-            seg_files = list(book_dir.glob("*.txt"))
+            print(f"\nProcessing {book}...")
             
-            for seg_file in tqdm(seg_files, desc="Generating QAs"):
+            for key, text in tqdm(segments, desc="Generating QAs"):
                 try:
-                    with open(seg_file, "r", encoding="utf-8") as f:
-                        text = f.read()
-                        if text.strip():  # Skip empty files
-                            qa_data.extend(self.generate_qa_from_text(text, book_dir.name))
+                    if text.strip():  # Skip empty segments
+                        qa_data.extend(self.generate_qa_from_text(text, book))
                 except Exception as e:
-                    print(f"Error processing {seg_file.name}: {str(e)[:100]}...")
+                    print(f"Error processing {key}: {str(e)[:100]}...")
                     continue
             
             # Save progress after each book
             if qa_data:  # Only save if we got data
-                output_file = self.output_dir / f"{book_dir.name}_qa.json"
+                output_file = self.output_dir / f"{book}_qa.json"
                 with open(output_file, "w", encoding="utf-8") as f:
                     json.dump(qa_data, f, indent=2)
                 print(f"Saved {len(qa_data)} QA pairs to {output_file}")
 
+    def generate_qa_batch(self, text_chunks, source_label):
+        """Generate QA pairs for several segments with one padded generate() call"""
+        prompts = [self._build_prompt(chunk) for chunk in text_chunks]
+        inputs = self.tokenizer(prompts, return_tensors="tf", padding=True, truncation=True)
+        outputs = self.model.generate(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            max_length=200,
+            do_sample=True,
+            temperature=0.7,
+            top_k=50
+        )
+        responses = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+        return [self._parse_qa_response(response, source_label) for response in responses]
+
+    def generate_qa_batches(self, texts, source_label, batch_size=16):
+        """Yield (text, pairs, error) for each text; a failed generate() call only loses its own batch"""
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            try:
+                results = self.generate_qa_batch(batch, source_label)
+            except Exception as e:
+                print(f"Error generating batch: {str(e)[:100]}...")
+                for text in batch:
+                    yield text, None, str(e)
+                continue
+            for text, pairs in zip(batch, results):
+                yield text, pairs, None
+
+    def process_segments_batched(self, book, segments, checkpoint_path, batch_size=16):
+        """Generate QAs for (key, text) segments, appending each result to a JSONL checkpoint.
+
+        Checkpoint records are keyed by a hash of the segment text, so a
+        re-segmented book only regenerates segments whose text changed.
+        Segments already answered in any checkpoint for the book are
+        skipped; failed batches are recorded with their error and retried on
+        the next run. The rest are sorted by prompt length so each batch pads
+        little.
+        """
+        done = {record["hash"] for record in load_checkpoints(self.output_dir, book) if "pairs" in record}
+        todo = {}
+        for key, text in segments:
+            if text.strip() and segment_hash(text) not in done:
+                todo.setdefault(segment_hash(text), (key, text))
+        if not todo:
+            return 0
+
+        todo = list(todo.values())
+        lengths = [len(ids) for ids in self.tokenizer([self._build_prompt(t) for _, t in todo])["input_ids"]]
+        todo = [segment for _, segment in sorted(zip(lengths, todo), key=lambda pair: pair[0])]
+        keys = {text: key for key, text in todo}
+
+        with open(checkpoint_path, "a", encoding="utf-8") as f:
+            results = self.generate_qa_batches([text for _, text in todo], book, batch_size)
+            for text, pairs, error in tqdm(results, total=len(todo), desc=f"Generating QAs ({book})"):
+                record = {"segment": keys[text], "hash": segment_hash(text)}
+                record.update({"pairs": pairs} if error is None else {"error": error})
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+        return len(todo)
+
+    def process_all_segments_batched(self, batch_size=16, worker_id=0, num_workers=1):
+        """Batched, resumable version of process_all_segments for one worker's share"""
+        for book, segments in group_segments_by_book().items():
+            mine = [segment for i, segment in enumerate(segments) if i % num_workers == worker_id]
+            checkpoint_path = self.output_dir / f"{book}_qa.part{worker_id}.jsonl"
+            self.process_segments_batched(book, mine, checkpoint_path, batch_size)
+
+
+def group_segments_by_book():
+    books = {}
+    for book, key, text in iter_book_segments():
+        books.setdefault(book, []).append((key, text))
+    return books
+
+
+def segment_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_checkpoints(output_dir, book):
+    """All records from a book's checkpoint parts; a torn last line from a crash is ignored"""
+    records = []
+    for part in sorted(Path(output_dir).glob(f"{book}_qa.part*.jsonl")):
+        with open(part, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return records
+
+
+def _dedup_key(pair):
+    return re.sub(r"[^a-z0-9 ]", "", pair["question"].lower()).strip()
+
+
+def merge_checkpoints(output_dir="data/qa_pairs/automated"):
+    """Combine checkpoint parts into <book>_qa.json in segment order, dropping duplicate questions"""
+    for book, segments in group_segments_by_book().items():
+        by_hash = {
+            record["hash"]: record["pairs"] for record in load_checkpoints(output_dir, book)
+            if "hash" in record and "pairs" in record
+        }
+        qa_data, seen = [], set()
+        for _, text in segments:
+            for pair in by_hash.get(segment_hash(text), []):
+                dedup_key = _dedup_key(pair)
+                if dedup_key and dedup_key not in seen:
+                    seen.add(dedup_key)
+                    qa_data.append(pair)
+        if qa_data:
+            output_file = Path(output_dir) / f"{book}_qa.json"
+            with open(output_file, "w", encoding="utf-8") as f:
+                json.dump(qa_data, f, indent=2)
+            print(f"Saved {len(qa_data)} QA pairs to {output_file}")
+
+
+def _run_worker(worker_id, num_workers, batch_size):
+    QAGenerator().process_all_segments_batched(batch_size, worker_id, num_workers)
+
+
 if __name__ == "__main__":
-    generator = QAGenerator()
-    generator.process_all_segments()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate automated QA pairs from the cleaned segments")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="processes, each with its own model copy")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # spawn, not fork: TensorFlow does not survive being forked
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=_run_worker, args=(i, args.workers, args.batch_size))
+            for i in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    else:
+        _run_worker(0, 1, args.batch_size)
+    merge_checkpoints()
\ No newline at end of file
@@ -0,0 +1,178 @@
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+
+from kb_store import KnowledgeBase
+
+_TOKEN = re.compile(r"\w+")
+
+# spaCy labels worth verifying against; numeric labels are mostly page/figure noise
+ENTITY_TYPES = (
+    "person", "org", "gpe", "loc", "norp", "fac", "event", "law", "date",
+    "work_of_art", "language",
+)
+
+
+def phrase_tokens(text):
+    return tuple(_TOKEN.findall(text.lower().replace("’", "'")))
+
+
+# Whole normalized answers that abstain; matched exactly, so "the unknown soldier" is still checked
+ABSTENTIONS = frozenset(
+    phrase_tokens(phrase) for phrase in (
+        "don't know", "i don't know", "do not know", "i do not know", "unknown", "it is unknown",
+        "not sure", "i'm not sure", "i am not sure",
+    )
+)
+
+
+class FactVerifier:
+    """Checks answers against the extracted knowledge base in one pass over their tokens.
+
+    Every entity surface form and timeline date is interned as a token tuple.
+    Each phrase keeps the set of KB contexts (entity sentences, timeline
+    events) it occurs in, and related phrase pairs come from the
+    relationship graph. Phrases found in more than max_context_share of all
+    contexts ("Kimathi", "Mau Mau", "Kenya") are hubs: they co-occur with
+    almost everything, so they are never used as evidence. An answer is
+    supported when each of its non-hub phrases shares a context or a
+    relationship edge with a non-hub phrase of the question.
+    """
+
+    def __init__(self, kb_dir="data/knowledge_base", entity_types=ENTITY_TYPES, max_phrase_len=6,
+                 compiled_dir="data/knowledge_base/compiled", max_context_share=0.05):
+        self.max_phrase_len = max_phrase_len
+        self.phrase_ids = {}
+        self.phrase_contexts = []
+        self.first_tokens = set()
+        self.edges = set()
+        self.num_contexts = 0
+        if compiled_dir and KnowledgeBase.exists(compiled_dir):
+            self._load_compiled(KnowledgeBase(compiled_dir), entity_types)
+        else:
+            self._load(Path(kb_dir), entity_types)
+        self.phrase_contexts = [frozenset(c) for c in self.phrase_contexts]
+        self.hubs = frozenset(
+            phrase_id for phrase_id, contexts in enumerate(self.phrase_contexts)
+            if len(contexts) > max_context_share * self.num_contexts
+        )
+
+    def _intern(self, text):
+        tokens = phrase_tokens(text)
+        if not tokens or len(tokens) > self.max_phrase_len or len("".join(tokens)) < 3:
+            return None
+        phrase_id = self.phrase_ids.get(tokens)
+        if phrase_id is None:
+            phrase_id = len(self.phrase_contexts)
+            self.phrase_ids[tokens] = phrase_id
+            self.phrase_contexts.append(set())
+            self.first_tokens.add(tokens[0])
+        return phrase_id
+
+    def _index(self, mentions, contexts, edges):
+        for text in mentions:
+            self._intern(text)
+
+        # A context supports every known phrase in it, not just the mention spaCy tagged
+        contexts = list(contexts)
+        self.num_contexts = len(contexts)
+        for context_id, context in enumerate(contexts):
+            for phrase_id in self.find_phrases(context):
+                self.phrase_contexts[phrase_id].add(context_id)
+
+        for source_text, target_text in edges:
+            # Only link endpoints that are already known entities
+            source = self.phrase_ids.get(phrase_tokens(source_text))
+            target = self.phrase_ids.get(phrase_tokens(target_text))
+            if source is not None and target is not None and source != target:
+                self.edges.add((min(source, target), max(source, target)))
+
+    def _load(self, kb_dir, entity_types):
+        mentions, contexts, edges = [], {}, []
+        for entity_type in entity_types:
+            path = kb_dir / "entities" / f"{entity_type}.json"
+            if path.exists():
+                with open(path, "r", encoding="utf-8") as f:
+                    for entry in json.load(f):
+                        mentions.append(entry["text"])
+                        contexts.setdefault(entry["context"])
+
+        timeline = kb_dir / "timelines" / "kimathi_timeline.json"
+        if timeline.exists():
+            with open(timeline, "r", encoding="utf-8") as f:
+                for entry in json.load(f):
+                    mentions.append(entry["date"])
+                    contexts.setdefault(entry["event"])
+
+        network = kb_dir / "relationships" / "kimathi_network.json"
+        if network.exists():
+            with open(network, "r", encoding="utf-8") as f:
+                edges = [(entry["source"], entry["target"]) for entry in json.load(f)]
+
+        self._index(mentions, contexts, edges)
+
+    def _load_compiled(self, kb, entity_types):
+        """Same as _load, but decodes each interned string once instead of once per row"""
+        mentions, contexts, edges = [], {}, []
+        tables = [kb.entities(t) for t in entity_types if kb.entities(t) is not None]
+        for table in tables:
+            store = table.store
+            mentions.extend(store.string(i) for i in np.unique(table.ids("text")))
+            # Keyed by text like _load, so a sentence stored in two stores is still one context
+            for i in np.unique(table.ids("context")):
+                contexts.setdefault(store.string(i))
+
+        timeline = kb.timeline()
+        if timeline is not None:
+            store = timeline.store
+            mentions.extend(store.string(i) for i in np.unique(timeline.ids("date")))
+            for i in np.unique(timeline.ids("event")):
+                contexts.setdefault(store.string(i))
+
+        relationships = kb.relationships()
+        if relationships is not None:
+            edges = zip(relationships.values("source"), relationships.values("target"))
+
+        self._index(mentions, contexts, edges)
+
+    def find_phrases(self, text):
+        """Ids of every KB phrase occurring in text, in one left-to-right pass"""
+        tokens = phrase_tokens(text)
+        found = set()
+        for i, token in enumerate(tokens):
+            if token not in self.first_tokens:
+                continue
+            for n in range(1, min(self.max_phrase_len, len(tokens) - i) + 1):
+                phrase_id = self.phrase_ids.get(tokens[i:i + n])
+                if phrase_id is not None:
+                    found.add(phrase_id)
+        return found
+
+    def linked(self, a, b):
+        """True if two phrases share a relationship edge or a KB context"""
+        return (min(a, b), max(a, b)) in self.edges or not self.phrase_contexts[a].isdisjoint(self.phrase_contexts[b])
+
+    def supports(self, question_phrases, answer_phrases):
+        return all(any(self.linked(a, q) for q in question_phrases) for a in answer_phrases)
+
+    def verify(self, question, answer):
+        """True if the KB links the answer to the question, False if it does not, None without evidence.
+
+        None means the KB has nothing to say: the question only mentions
+        hubs (or nothing known), or the answer names nothing new beyond hubs.
+        """
+        if phrase_tokens(answer) in ABSTENTIONS:
+            return True
+
+        question_phrases = self.find_phrases(question)
+        # Repeating the question's own entities back is not evidence
+        answer_phrases = self.find_phrases(answer) - question_phrases - self.hubs
+        question_phrases -= self.hubs
+        if not question_phrases or not answer_phrases:
+            return None
+        return self.supports(question_phrases, answer_phrases)
+
+    def __len__(self):
+        return len(self.phrase_ids)
@@ -0,0 +1,140 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import tensorflow as tf
+
+
+def generation_kwargs(generation_params):
+    """Keyword arguments for model.generate() built from config["generation_params"]"""
+    return {
+        "max_new_tokens": generation_params["max_new_tokens"],
+        "num_beams": generation_params["num_beams"],
+        "no_repeat_ngram_size": generation_params["no_repeat_ngram_size"],
+        "do_sample": generation_params["do_sample"],
+        "early_stopping": generation_params["early_stopping"],
+    }
+
+
+class GenerationEngine:
+    """XLA-compiled generate() over a fixed set of input shapes.
+
+    XLA compiles one program per input shape, so prompts are padded up to the
+    nearest length bucket (and batches up to the nearest batch bucket) instead
+    of always to max_input_length. Each bucket is compiled once by warmup().
+    """
+
+    def __init__(self, model, tokenizer, config):
+        self.model = model
+        self._configure(tokenizer, config)
+        self._generate = tf.function(self._generate_fn, jit_compile=True)
+
+    def _configure(self, tokenizer, config):
+        self.tokenizer = tokenizer
+        self.max_input_length = config["max_input_length"]
+        self.length_buckets = sorted(
+            {b for b in config.get("xla_length_buckets", [16, 32, 64]) if b < self.max_input_length}
+            | {self.max_input_length}
+        )
+        self.batch_buckets = sorted(config.get("xla_batch_buckets", [1]))
+        self.generate_kwargs = generation_kwargs(config["generation_params"])
+        if self.generate_kwargs.pop("no_repeat_ngram_size", 0):
+            # TFNoRepeatNGramLogitsProcessor only runs eagerly
+            print("GenerationEngine: no_repeat_ngram_size is not XLA compatible, ignoring it")
+
+    @classmethod
+    def from_saved(cls, export_dir, tokenizer, config):
+        """Load an engine written by export(), without constructing the Keras model"""
+        engine = cls.__new__(cls)
+        engine.model = None
+        engine._configure(tokenizer, config)
+        engine._saved = tf.saved_model.load(str(export_dir))
+        engine._generate = engine._saved.generate
+        return engine
+
+    def _generate_fn(self, input_ids, attention_mask):
+        outputs = self.model.generate(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            return_dict_in_generate=True,
+            output_scores=True,
+            **self.generate_kwargs
+        )
+        beam_indices = getattr(outputs, "beam_indices", None)
+        # Beam search scores are already log-softmaxed; greedy scores are raw logits
+        transition_scores = self.model.compute_transition_scores(
+            outputs.sequences,
+            outputs.scores,
+            beam_indices=beam_indices,
+            normalize_logits=beam_indices is None
+        )
+        return {"sequences": outputs.sequences, "transition_scores": transition_scores}
+
+    def length_bucket(self, length):
+        for bucket in self.length_buckets:
+            if length <= bucket:
+                return bucket
+        return self.length_buckets[-1]
+
+    def batch_bucket(self, size):
+        for bucket in self.batch_buckets:
+            if size <= bucket:
+                return bucket
+        return self.batch_buckets[-1]
+
+    def encode(self, prompts):
+        """Tokenize prompts and pad them to a (batch bucket, length bucket) shape.
+
+        Returns input_ids, attention_mask and each prompt's token count after truncation.
+        """
+        encoded = self.tokenizer(
+            prompts,
+            truncation=True,
+            max_length=self.max_input_length
+        )
+        ids = encoded["input_ids"]
+        length = self.length_bucket(max(len(row) for row in ids))
+        batch = self.batch_bucket(len(ids))
+
+        input_ids = np.full((batch, length), self.tokenizer.pad_token_id, dtype=np.int32)
+        attention_mask = np.zeros((batch, length), dtype=np.int32)
+        for i, row in enumerate(ids):
+            input_ids[i, :len(row)] = row
+            attention_mask[i, :len(row)] = 1
+        # Filler rows still need one attended token to keep attention well defined
+        attention_mask[len(ids):, 0] = 1
+        return input_ids, attention_mask, [len(row) for row in ids]
+
+    def generate(self, prompts):
+        """Run the compiled generate() and return an object shaped like generate()'s output"""
+        if len(prompts) > self.batch_buckets[-1]:
+            raise ValueError(
+                f"batch of {len(prompts)} exceeds the largest batch bucket {self.batch_buckets[-1]}"
+            )
+        input_ids, attention_mask, input_lengths = self.encode(prompts)
+        outputs = self._generate(tf.constant(input_ids), tf.constant(attention_mask))
+
+        # Drop the filler rows
+        n = len(prompts)
+        return SimpleNamespace(
+            sequences=outputs["sequences"][:n],
+            transition_scores=outputs["transition_scores"][:n],
+            input_lengths=input_lengths,
+        )
+
+    def warmup(self):
+        """Compile every (batch, length) bucket up front so no request pays for tracing"""
+        for batch in self.batch_buckets:
+            for length in self.length_buckets:
+                start = time.time()
+                input_ids = tf.fill((batch, length), self.tokenizer.pad_token_id)
+                attention_mask = tf.ones((batch, length), dtype=tf.int32)
+                self._generate(input_ids, attention_mask)
+                print(f"Compiled generate for batch={batch}, length={length} in {time.time() - start:.1f}s")
+
+    def export(self, export_dir):
+        """Save every bucket compiled so far, with the weights, as a SavedModel for from_saved()"""
+        module = tf.Module()
+        module.generate = self._generate
+        module.weights = list(self.model.weights)
+        tf.saved_model.save(module, str(export_dir))
@@ -0,0 +1,281 @@
+import json
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+_LEADING_ARTICLE = re.compile(r"^(?:the|a|an)\s+", re.IGNORECASE)
+TERM = "term"
+# Entity types worth naming in an answer; dates, numbers, works of art etc. are not "connected" to anyone
+ANSWER_TYPES = {"person", "org", "gpe", "norp", "loc", "fac", "event"}
+# A real name contains none of these; the extractor's spans often do ("the fate of", "jomo kenyatta et les")
+NAME_STOPWORDS = {
+    "the", "a", "an", "of", "in", "on", "at", "to", "by", "for", "from", "with", "and", "or", "et", "les", "la", "le"
+}
+
+
+def normalize_name(text):
+    text = _NON_WORD.sub(" ", text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def plausible_name(name):
+    """False for extraction fragments: stopwords, digits, or no word longer than an initial"""
+    words = name.split()
+    return (
+        bool(words)
+        and all(word.isalpha() and word not in NAME_STOPWORDS for word in words)
+        and any(len(word) > 2 for word in words)
+    )
+
+
+def mentions_name(text, name):
+    """Whether text contains the normalized name as whole words ("kimathi" but not "kimathis")"""
+    return re.search(rf"\b{re.escape(name)}\b", normalize_name(text)) is not None
+
+
+class EntityResolver:
+    """Maps surface strings to canonical node ids such as "person:dedan kimathi".
+
+    A string is given the entity type it was most often tagged with by the
+    entity extractor. A lone surname resolves to the most frequently
+    mentioned multi-word person ending in it, so "Kimathi"
+    and "Dedan Kimathi" become one node. Anything else is a "term:" node.
+    """
+
+    def __init__(self, entities_by_type):
+        type_counts = defaultdict(Counter)
+        for entity_type, records in entities_by_type.items():
+            for record in records:
+                name = normalize_name(record["text"])
+                if name:
+                    type_counts[name][entity_type.lower()] += 1
+
+        self.mentions = {name: sum(counts.values()) for name, counts in type_counts.items()}
+        self.types = {name: counts.most_common(1)[0][0] for name, counts in type_counts.items()}
+
+        surname_owner = {}
+        for name, entity_type in self.types.items():
+            words = name.split()
+            if entity_type != "person" or len(words) < 2:
+                continue
+            best = surname_owner.get(words[-1])
+            if best is None or self.mentions[name] > self.mentions[best]:
+                surname_owner[words[-1]] = name
+        # A surname also tagged as something else (e.g. an ORG) is still an alias if it was ever a PERSON
+        self.aliases = {
+            surname: name for surname, name in surname_owner.items()
+            if surname not in type_counts or "person" in type_counts[surname]
+        }
+
+    def resolve(self, text):
+        name = normalize_name(text)
+        if not name:
+            return None
+        name = self.aliases.get(name, name)
+        return f"{self.types.get(name, TERM)}:{name}"
+
+
+def build_graph_store(edges, entities_by_type, output_dir="data/knowledge_base/compiled/graph"):
+    """Canonicalize relationship edges and save them as CSR adjacency arrays.
+
+    Two views are written, each with both directions of every edge:
+    per-relation multi-edges (edge_*.npy, with counts) and one row per
+    neighbour with the counts summed (adj_*.npy), sorted by count so the
+    strongest neighbours of a node are a prefix of its row.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    resolver = EntityResolver(entities_by_type)
+
+    multi = Counter()
+    for edge in edges:
+        u, v = resolver.resolve(edge["source"]), resolver.resolve(edge["target"])
+        if u is None or v is None or u == v:
+            continue
+        multi[(u, v, edge["relation"])] += edge.get("count", 1)
+
+    node_names = sorted({u for u, _, _ in multi} | {v for _, v, _ in multi})
+    node_index = {name: i for i, name in enumerate(node_names)}
+    relations = sorted({relation for _, _, relation in multi})
+    relation_index = {relation: i for i, relation in enumerate(relations)}
+
+    edge_rows = defaultdict(list)
+    neighbour_counts = defaultdict(Counter)
+    for (u, v, relation), count in multi.items():
+        a, b, r = node_index[u], node_index[v], relation_index[relation]
+        edge_rows[a].append((b, r, count))
+        edge_rows[b].append((a, r, count))
+        neighbour_counts[a][b] += count
+        neighbour_counts[b][a] += count
+
+    def csr(rows, width):
+        indptr = np.zeros(len(node_names) + 1, dtype=np.int64)
+        columns = [[] for _ in range(width)]
+        for node in range(len(node_names)):
+            for entry in rows(node):
+                for column, value in zip(columns, entry):
+                    column.append(value)
+            indptr[node + 1] = len(columns[0])
+        return indptr, columns
+
+    edge_indptr, (edge_nodes, edge_relations, edge_counts) = csr(
+        lambda node: sorted(edge_rows[node]), 3
+    )
+    adj_indptr, (adj_nodes, adj_counts) = csr(
+        lambda node: sorted(neighbour_counts[node].items(), key=lambda item: (-item[1], item[0])), 2
+    )
+
+    np.save(output_dir / "edge_indptr.npy", edge_indptr)
+    np.save(output_dir / "edge_nodes.npy", np.array(edge_nodes, dtype=np.int32))
+    np.save(output_dir / "edge_relations.npy", np.array(edge_relations, dtype=np.int16))
+    np.save(output_dir / "edge_counts.npy", np.array(edge_counts, dtype=np.int32))
+    np.save(output_dir / "adj_indptr.npy", adj_indptr)
+    np.save(output_dir / "adj_nodes.npy", np.array(adj_nodes, dtype=np.int32))
+    np.save(output_dir / "adj_counts.npy", np.array(adj_counts, dtype=np.int32))
+    with open(output_dir / "graph.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "nodes": node_names,
+            "relations": relations,
+            "aliases": resolver.aliases,
+            "mentions": {name: resolver.mentions.get(name.split(":", 1)[1], 0) for name in node_names},
+        }, f)
+    return len(node_names), len(multi)
+
+
+class RelationshipGraph:
+    """Reader for a directory written by build_graph_store().
+
+    Only nodes of an ANSWER_TYPES type with a plausible name mentioned at
+    least min_mentions times count as entities; the rest stay in the graph
+    as paths but are never returned by the entities_only queries.
+    """
+
+    def __init__(self, graph_dir="data/knowledge_base/compiled/graph", min_mentions=2):
+        graph_dir = Path(graph_dir)
+        with open(graph_dir / "graph.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.nodes = meta["nodes"]
+        self.relations = meta["relations"]
+        self.aliases = meta["aliases"]
+        self.mentions = meta["mentions"]
+        self.node_types = np.array([node.split(":", 1)[0] for node in self.nodes])
+        self.is_entity = np.array([
+            node_type in ANSWER_TYPES and plausible_name(node.split(":", 1)[1])
+            and self.mentions.get(node, 0) >= min_mentions
+            for node, node_type in zip(self.nodes, self.node_types)
+        ], dtype=bool)
+        self._by_name = {}
+        for i, node in enumerate(self.nodes):
+            name = node.split(":", 1)[1]
+            # An entity wins over a term with the same name
+            if name not in self._by_name or self.is_entity[i]:
+                self._by_name[name] = i
+
+        self.edge_indptr = np.load(graph_dir / "edge_indptr.npy")
+        self.edge_nodes = np.load(graph_dir / "edge_nodes.npy")
+        self.edge_relations = np.load(graph_dir / "edge_relations.npy")
+        self.edge_counts = np.load(graph_dir / "edge_counts.npy")
+        self.adj_indptr = np.load(graph_dir / "adj_indptr.npy")
+        self.adj_nodes = np.load(graph_dir / "adj_nodes.npy")
+        self.adj_counts = np.load(graph_dir / "adj_counts.npy")
+
+    def node(self, text):
+        """Node index for a name or alias, or None"""
+        name = normalize_name(text)
+        return self._by_name.get(self.aliases.get(name, name))
+
+    def name(self, node):
+        return self.nodes[node].split(":", 1)[1]
+
+    def top_related(self, text, top_k=5, entities_only=True):
+        """Up to top_k (node id, edge count) pairs, strongest first"""
+        node = self.node(text)
+        if node is None:
+            return []
+        start, end = self.adj_indptr[node], self.adj_indptr[node + 1]
+        neighbours, counts = self.adj_nodes[start:end], self.adj_counts[start:end]
+        if entities_only:
+            keep = self.is_entity[neighbours]
+            neighbours, counts = neighbours[keep], counts[keep]
+        return [(self.nodes[n], int(c)) for n, c in zip(neighbours[:top_k], counts[:top_k])]
+
+    def neighbours(self, text, hops=1, entities_only=False):
+        """{node id: distance} for every node within `hops` edges of text"""
+        node = self.node(text)
+        if node is None:
+            return {}
+        distance = np.full(len(self.nodes), -1, dtype=np.int32)
+        distance[node] = 0
+        frontier = np.array([node])
+        for hop in range(1, hops + 1):
+            # Gather every frontier row at once: positions start..end-1 of each row, concatenated
+            starts, ends = self.adj_indptr[frontier], self.adj_indptr[frontier + 1]
+            lengths = ends - starts
+            positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            reached = np.unique(self.adj_nodes[positions])
+            frontier = reached[distance[reached] < 0]
+            if not len(frontier):
+                break
+            distance[frontier] = hop
+        found = np.flatnonzero(distance > 0)
+        if entities_only:
+            found = found[self.is_entity[found]]
+        return {self.nodes[n]: int(distance[n]) for n in found}
+
+    def relations_between(self, a, b):
+        """[(relation, count)] of the multi-edges joining two names"""
+        u, v = self.node(a), self.node(b)
+        if u is None or v is None:
+            return []
+        start, end = self.edge_indptr[u], self.edge_indptr[u + 1]
+        hits = np.flatnonzero(self.edge_nodes[start:end] == v) + start
+        return [(self.relations[self.edge_relations[i]], int(self.edge_counts[i])) for i in hits]
+
+    def connected(self, a, b, max_hops=2):
+        target = self.node(b)
+        return target is not None and self.nodes[target] in self.neighbours(a, hops=max_hops)
+
+
+CONNECTION_QUESTION = re.compile(
+    r"^\s*(?:who|what)\s+(?:is|was|are|were)\s+(?:most\s+|closely\s+)*"
+    r"(?:connected|related|linked|associated)\s+(?:to|with)\s+(.+?)\s*\??\s*$",
+    re.IGNORECASE
+)
+
+
+def connection_subject(question):
+    """The X of a "who/what is connected to X?" question, without a leading article, or None"""
+    match = CONNECTION_QUESTION.match(question)
+    return _LEADING_ARTICLE.sub("", match.group(1)) if match else None
+
+
+def answer_connection_question(graph, question, top_k=5):
+    """Answer "who/what is connected to X?" from the graph, or None if it cannot"""
+    subject = connection_subject(question)
+    if subject is None:
+        return None
+    related = graph.top_related(subject, top_k=top_k)
+    if not related:
+        return None
+    names = [node.split(":", 1)[1].title() for node, _ in related]
+    listed = names[0] if len(names) == 1 else ", ".join(names[:-1]) + " and " + names[-1]
+    return f"In the trial sources, {subject} is most often connected with {listed}."
+
+
+def load_json_entities(kb_dir="data/knowledge_base"):
+    entities = {}
+    for path in sorted((Path(kb_dir) / "entities").glob("*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            entities[path.stem] = json.load(f)
+    return entities
+
+
+if __name__ == "__main__":
+    with open("data/knowledge_base/relationships/kimathi_network.json", "r", encoding="utf-8") as f:
+        edges = json.load(f)
+    num_nodes, num_edges = build_graph_store(edges, load_json_entities())
+    print(f"Graph store: {num_nodes} nodes, {num_edges} distinct edges in data/knowledge_base/compiled/graph/")
@@ -0,0 +1,343 @@
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+
+import metrics
+from answer_cache import AnswerCache
+from batching import MicroBatcher
+from curated_qa import CuratedAnswers, build_curated_index, index_is_current
+from fact_verifier import ABSTENTIONS, FactVerifier, phrase_tokens
+from graph_store import (
+    RelationshipGraph, answer_connection_question, build_graph_store, connection_subject, load_json_entities,
+    mentions_name
+)
+from model_runtime import ModelRuntime
+from retrieval import SectionRetriever, build_prompt
+from timeline_index import TimelineIndex, answer_timeline_question, build_timeline_index, verify_when_answer
+
+
+def make_prompt(question, tokenizer, config, retriever=None):
+    if retriever is None:
+        return f"Question: {question}\nAnswer:"
+    passages = retriever.retrieve(question, top_k=config["retrieval"]["top_k"])
+    return build_prompt(question, passages, tokenizer, config["max_input_length"])
+
+def count_truncated(input_lengths, config, traces=None):
+    """Count inputs generate() truncated, from the token counts of the encoding it ran on.
+
+    A prompt that fills max_input_length was cut to fit (or fit exactly, which is
+    rare enough to count the same). traces, if given, has one request trace per
+    input; each truncated input is noted on its own request's trace.
+    """
+    traces = traces or [None] * len(input_lengths)
+    truncated = 0
+    for length, trace in zip(input_lengths, traces):
+        if length >= config["max_input_length"]:
+            truncated += 1
+            metrics.event("truncated_input", trace)
+    return truncated
+
+def generate_answers(questions, runtime, config, retriever=None, traces=None, prompts=None):
+    """Answer a batch of questions with one generate() call, returning (answer, token log-probs) pairs.
+
+    traces holds the request trace of each question when they come from
+    different requests (the micro-batcher's worker); every one of them is
+    charged the batch's stage times. prompts, if the caller already built
+    them with make_prompt(), are used as they are.
+    """
+    tokenizer = runtime.tokenizer
+    if prompts is None:
+        with metrics.stage("prompt", traces):
+            prompts = [make_prompt(question, tokenizer, config, retriever) for question in questions]
+    with metrics.stage("generate", traces):
+        outputs = runtime.generate(prompts)
+    count_truncated(outputs.input_lengths, config, traces)
+    with metrics.stage("decode", traces):
+        answers = tokenizer.batch_decode(outputs.sequences, skip_special_tokens=True)
+        logprobs = token_logprobs(outputs, runtime, tokenizer)
+    return list(zip(answers, logprobs))
+
+def chat_with_model(question, runtime, config, return_scores=False, retriever=None):
+    answer, logprobs = generate_answers([question], runtime, config, retriever=retriever)[0]
+    if not return_scores:
+        return answer
+    return answer, logprobs
+
+def token_logprobs(outputs, runtime, tokenizer):
+    """Per-token log-probs of each returned sequence, read from the generate() output"""
+    transition_scores = getattr(outputs, "transition_scores", None)
+    if transition_scores is None:
+        beam_indices = getattr(outputs, "beam_indices", None)
+        # Beam search scores are already log-softmaxed; greedy scores are raw logits
+        transition_scores = runtime.model.compute_transition_scores(
+            outputs.sequences,
+            outputs.scores,
+            beam_indices=beam_indices,
+            normalize_logits=beam_indices is None
+        )
+    transition_scores = np.asarray(transition_scores)
+    # sequences[:, 0] is the decoder start token; scores line up with sequences[:, 1:]
+    generated = np.asarray(outputs.sequences)[:, 1:]
+    return [
+        [float(score) for token, score in zip(tokens, scores) if token != tokenizer.pad_token_id]
+        for tokens, scores in zip(generated, transition_scores)
+    ]
+
+def generate_batch_limit(config, batch_size):
+    """batch_size capped to what runtime.generate() accepts: the XLA engine stops at its largest batch bucket"""
+    if config["use_xla"] and config["backend"] != "tflite":
+        return min(batch_size, max(config.get("xla_batch_buckets", [1])))
+    return batch_size
+
+def sequence_confidence(logprobs):
+    """Geometric-mean token probability of a generated answer"""
+    if not logprobs:
+        return 0.0
+    return math.exp(sum(logprobs) / len(logprobs))
+
+def is_confident(logprobs, threshold=0.5):
+    return sequence_confidence(logprobs) >= threshold
+
+
+class AnswerService:
+    """The question-answering pipeline behind app.py, usable without the UI.
+
+    Loads the knowledge base, indexes, answer cache and micro-batcher that
+    config enables; the model itself loads lazily through ModelRuntime.
+    Questions are answered from the curated, graph and timeline indexes
+    first, then by the model, whose answers are checked for confidence
+    and against the knowledge base.
+    """
+
+    def __init__(self, config, runtime=None):
+        self.config = config
+        self.runtime = runtime or ModelRuntime(config)
+        kb_dir = Path(config["verification"]["knowledge_base_dir"])
+
+        self.fact_verifier = None
+        if config["verification"]["use_knowledge_base"]:
+            self.fact_verifier = FactVerifier(kb_dir, compiled_dir=config["verification"]["compiled_kb_dir"])
+
+        # Build the index once with `python retrieval.py`
+        self.retriever = None
+        if config["retrieval"]["enabled"]:
+            self.retriever = SectionRetriever(config["retrieval"]["index_dir"])
+
+        # Near-verbatim matches of a curated question are answered without the model
+        self.curated_answers = None
+        if config["curated"]["enabled"]:
+            if not index_is_current(config["curated"]["csv"], config["curated"]["index_dir"]):
+                build_curated_index(config["curated"]["csv"], config["curated"]["index_dir"])
+            self.curated_answers = CuratedAnswers(
+                config["curated"]["index_dir"], threshold=config["curated"]["threshold"]
+            )
+
+        # "Who/what is connected to X?" is answered from the relationship graph
+        self.relationship_graph = None
+        if config["graph"]["enabled"]:
+            graph_dir = Path(config["graph"]["graph_dir"])
+            network = kb_dir / "relationships" / "kimathi_network.json"
+            if not (graph_dir / "graph.json").exists() and network.exists():
+                with open(network, "r", encoding="utf-8") as f:
+                    build_graph_store(json.load(f), load_json_entities(kb_dir), graph_dir)
+            if (graph_dir / "graph.json").exists():
+                self.relationship_graph = RelationshipGraph(graph_dir, config["graph"]["min_mentions"])
+
+        # Dated events, for "what happened around <date>?" and checking "when" answers
+        self.timeline_index = None
+        if config["timeline"]["enabled"]:
+            index_dir = Path(config["timeline"]["index_dir"])
+            timeline_json = kb_dir / "timelines" / "kimathi_timeline.json"
+            if not (index_dir / "timeline.json").exists() and timeline_json.exists():
+                with open(timeline_json, "r", encoding="utf-8") as f:
+                    build_timeline_index(json.load(f), index_dir)
+            if (index_dir / "timeline.json").exists():
+                self.timeline_index = TimelineIndex(index_dir)
+
+        self.batcher = None
+        if config["batching"]["enabled"]:
+            self.batcher = MicroBatcher(
+                self._answer_traced_batch,
+                max_batch_size=generate_batch_limit(config, config["batching"]["max_batch_size"]),
+                max_wait_ms=config["batching"]["max_wait_ms"]
+            )
+            metrics.REGISTRY.gauge(
+                "kimathi_mean_batch_size", "Mean questions per generate() batch",
+                lambda: self.batcher.mean_batch_size
+            )
+
+        if config["adaptive_decoding"]["enabled"]:
+            metrics.REGISTRY.gauge(
+                "kimathi_beam_escalation_ratio", "Share of greedy answers re-decoded with beam search",
+                lambda: self.runtime.escalation_rate
+            )
+
+        # Anything that changes the generated answer belongs in the cache key
+        self.cache_params = {
+            "backend": config["backend"],
+            # The XLA engine drops no_repeat_ngram_size, so its answers differ from eager ones
+            "use_xla": config["use_xla"],
+            "generation": config["generation_params"],
+            "adaptive_decoding": config["adaptive_decoding"],
+            "retrieval": config["retrieval"] if self.retriever is not None else None
+        }
+        # Streamed answers are greedy, so they must not share cache entries with beam search
+        self.stream_cache_params = dict(self.cache_params, decoding="streaming-greedy")
+
+        self.answer_cache = None
+        if config["cache"]["enabled"]:
+            self.answer_cache = AnswerCache(
+                max_size=config["cache"]["max_size"],
+                ttl_seconds=config["cache"]["ttl_seconds"]
+            )
+            metrics.REGISTRY.gauge(
+                "kimathi_answer_cache_entries", "Answers held in the cache", lambda: len(self.answer_cache)
+            )
+
+    def prewarm(self, questions):
+        """Answer questions into the cache ahead of traffic; returns how many were generated"""
+        return self.answer_cache.warm(
+            questions,
+            self.answer_batch,
+            self.cache_params,
+            batch_size=generate_batch_limit(self.config, self.config["batching"]["max_batch_size"])
+        )
+
+    def make_prompt(self, question):
+        return make_prompt(question, self.runtime.tokenizer, self.config, self.retriever)
+
+    def answer_batch(self, questions, traces=None, prompts=None):
+        return generate_answers(
+            questions, self.runtime, self.config, retriever=self.retriever, traces=traces, prompts=prompts
+        )
+
+    def _answer_traced_batch(self, items):
+        """Batcher worker: items are (question, request trace) pairs submitted by answer_question"""
+        questions, traces = zip(*items)
+        return self.answer_batch(list(questions), list(traces))
+
+    def answer_question(self, question):
+        """(answer, token log-probs) from the cache, the batcher or a generate() call of its own"""
+        if self.answer_cache is not None:
+            with metrics.stage("cache_lookup"):
+                cached = self.answer_cache.get(question, self.cache_params)
+            if cached is not None:
+                metrics.event("cache_hit")
+                return cached
+            metrics.event("cache_miss")
+        if self.batcher is not None:
+            # Includes the wait for the batch to fill; per-stage times are recorded by the worker
+            with metrics.stage("batched_generate"):
+                # The worker runs on its own thread, so it is handed the caller's trace
+                result = self.batcher((question, metrics.current_trace()))
+        else:
+            result = chat_with_model(
+                question, self.runtime, self.config, return_scores=True, retriever=self.retriever
+            )
+        if self.answer_cache is not None:
+            self.answer_cache.put(question, self.cache_params, result)
+        return result
+
+    def verify_answer(self, question, answer):
+        """True if a check supports the answer, False if one contradicts it, None without KB evidence"""
+        answer_lower = answer.lower()
+        # Hand-checked facts come first: the knowledge-base checks below are only heuristics
+        facts = {
+            "zodiac sign": ["don't know", "unknown"],
+            "sentenced kimathi": ["o'connor", "kennedy"],
+            "final verdict": ["death", "hanging"],
+            "carrying a revolver": ["firearm", "weapon", "revolver", "gun"],
+            "communist": ["don't know", "unknown"]
+        }
+        for keyword, valid_answers in facts.items():
+            if keyword in question.lower():
+                return any(a in answer_lower for a in valid_answers)
+        if self.timeline_index is not None:
+            dated = verify_when_answer(self.timeline_index, question, answer)
+            if dated is not None:
+                return dated
+        graph = self.relationship_graph
+        subject = connection_subject(question) if graph is not None else None
+        if subject is not None and graph.node(subject) is not None:
+            related = graph.neighbours(subject, hops=1, entities_only=True)
+            return any(mentions_name(answer, node.split(":", 1)[1]) for node in related)
+        if self.fact_verifier is not None:
+            supported = self.fact_verifier.verify(question, answer)
+            if supported is not None:
+                return supported
+        # Abstaining makes no claim; anything else is left unannotated rather than guessed at
+        return True if phrase_tokens(answer) in ABSTENTIONS else None
+
+    def assess(self, question, response, logprobs, trace=None):
+        """(confident, verified) for a model answer, counted as events when either fails.
+
+        verified is None when the knowledge base has no evidence either way.
+        """
+        with metrics.stage("confidence", trace):
+            confident = is_confident(logprobs)
+        with metrics.stage("verify", trace):
+            verified = self.verify_answer(question, response)
+        if not confident:
+            metrics.event("unconfident", trace)
+        if verified is False:
+            metrics.event("unverified", trace)
+        return confident, verified
+
+    def format_response(self, question, response, logprobs, trace=None):
+        confident, verified = self.assess(question, response, logprobs, trace)
+        if verified is False or not confident:
+            return (
+                f"🤔 I'm not completely sure about this one, but here's my best shot:\n\n"
+                f"{response}\n\n"
+                f"Verification: {verified}, Confidence: {confident}"
+            )
+        return f" {response}"
+
+    def curated_lookup(self, question, trace=None):
+        if self.curated_answers is None:
+            return None
+        with metrics.stage("curated_lookup", trace):
+            curated = self.curated_answers.lookup(question)
+        if curated is not None:
+            metrics.event("curated_hit", trace)
+        return curated
+
+    def graph_lookup(self, question, trace=None):
+        if self.relationship_graph is None:
+            return None
+        with metrics.stage("graph_lookup", trace):
+            answer = answer_connection_question(self.relationship_graph, question, self.config["graph"]["top_k"])
+        if answer is not None:
+            metrics.event("graph_hit", trace)
+        return answer
+
+    def timeline_lookup(self, question, trace=None):
+        if self.timeline_index is None:
+            return None
+        if not self.config["timeline"]["answer_when"] and question.strip().lower().startswith("when"):
+            return None
+        with metrics.stage("timeline_lookup", trace):
+            answer = answer_timeline_question(self.timeline_index, question)
+        if answer is not None:
+            metrics.event("timeline_hit", trace)
+        return answer
+
+    def lookup(self, question, trace=None):
+        """(source, answer) from the first index that can answer without the model, or None"""
+        for source, find in (
+            ("curated", self.curated_lookup), ("graph", self.graph_lookup), ("timeline", self.timeline_lookup)
+        ):
+            answer = find(question, trace)
+            if answer is not None:
+                return source, answer
+        return None
+
+    def respond(self, question):
+        """The text app.py shows for a question"""
+        found = self.lookup(question)
+        if found is not None:
+            return f" {found[1]}"
+        response, logprobs = self.answer_question(question)
+        return self.format_response(question, response, logprobs)
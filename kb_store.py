@@ -0,0 +1,214 @@
+import json
+import mmap
+from pathlib import Path
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+class CompiledStoreWriter:
+    """Builds one compiled KB store: a shared string table plus int32 column arrays.
+
+    Every string (entity text, source label, context sentence, ...) is stored
+    once in strings.bin; tables only hold ids into it, so a sentence that is
+    the context of fifty mentions costs fifty ints instead of fifty copies.
+    Integer columns (edge counts) hold their values directly.
+    """
+
+    def __init__(self):
+        self.string_ids = {}
+        self.strings = []
+        self.tables = {}
+        self.int_columns = {}
+
+    def intern(self, text):
+        string_id = self.string_ids.get(text)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.string_ids[text] = string_id
+            self.strings.append(text)
+        return string_id
+
+    def add_table(self, name, rows, columns, int_columns=None):
+        """Add a table from an iterable of dicts, keeping only the given string columns.
+
+        int_columns maps integer columns to the value used for rows without them.
+        """
+        int_columns = int_columns or {}
+        data = {column: [] for column in (*columns, *int_columns)}
+        for row in rows:
+            for column in columns:
+                data[column].append(self.intern(row[column]))
+            for column, default in int_columns.items():
+                data[column].append(row.get(column, default))
+        self.tables[name] = {
+            column: np.array(ids, dtype=np.int32) for column, ids in data.items()
+        }
+        self.int_columns[name] = list(int_columns)
+
+    def save(self, output_dir):
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        offsets = [0]
+        with open(output_dir / "strings.bin", "wb") as f:
+            for text in self.strings:
+                data = text.encode("utf-8")
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+        np.save(output_dir / "string_offsets.npy", np.array(offsets, dtype=np.int64))
+
+        manifest = {"version": FORMAT_VERSION, "strings": len(self.strings), "tables": {}}
+        for name, columns in self.tables.items():
+            for column, ids in columns.items():
+                np.save(output_dir / f"{name}.{column}.npy", ids)
+            manifest["tables"][name] = {
+                "columns": list(columns),
+                "rows": len(next(iter(columns.values()))) if columns else 0,
+                "int_columns": self.int_columns[name],
+            }
+        with open(output_dir / "manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+
+class CompiledTable:
+    def __init__(self, store, name, columns, rows, int_columns=()):
+        self.store = store
+        self.name = name
+        self.columns = columns
+        self.rows = rows
+        self.int_columns = frozenset(int_columns)
+        self._arrays = {}
+
+    def ids(self, column):
+        """String ids (or values, for integer columns) of a column, memory-mapped on first access"""
+        if column not in self._arrays:
+            path = self.store.path / f"{self.name}.{column}.npy"
+            self._arrays[column] = np.load(path, mmap_mode="r")
+        return self._arrays[column]
+
+    def values(self, column):
+        if column in self.int_columns:
+            return [int(value) for value in self.ids(column)]
+        return [self.store.string(i) for i in self.ids(column)]
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        columns = {column: self.ids(column) for column in self.columns}
+        for i in range(self.rows):
+            yield {
+                column: int(ids[i]) if column in self.int_columns else self.store.string(ids[i])
+                for column, ids in columns.items()
+            }
+
+
+class CompiledStore:
+    """Reader for a directory written by CompiledStoreWriter.save()"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "manifest.json", "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest["version"] != FORMAT_VERSION:
+            raise ValueError(f"{self.path} has KB format {self.manifest['version']}, expected {FORMAT_VERSION}")
+        self.offsets = np.load(self.path / "string_offsets.npy", mmap_mode="r")
+        self._blob_file = open(self.path / "strings.bin", "rb")
+        # mmap refuses empty files
+        self._blob = (
+            mmap.mmap(self._blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.offsets[-1] else b""
+        )
+        self._tables = {}
+
+    def string(self, string_id):
+        start, end = self.offsets[string_id], self.offsets[string_id + 1]
+        return self._blob[start:end].decode("utf-8")
+
+    @property
+    def table_names(self):
+        return list(self.manifest["tables"])
+
+    def table(self, name):
+        if name not in self._tables:
+            info = self.manifest["tables"][name]
+            self._tables[name] = CompiledTable(
+                self, name, info["columns"], info["rows"], info.get("int_columns", ())
+            )
+        return self._tables[name]
+
+
+class KnowledgeBase:
+    """Lazily opens the compiled entity, timeline and relationship stores under one root"""
+
+    STORES = ("entities", "timelines", "relationships")
+
+    def __init__(self, root="data/knowledge_base/compiled"):
+        self.root = Path(root)
+        self._stores = {}
+
+    @classmethod
+    def exists(cls, root="data/knowledge_base/compiled"):
+        return any((Path(root) / store / "manifest.json").exists() for store in cls.STORES)
+
+    def store(self, name):
+        if name not in self._stores:
+            path = self.root / name
+            self._stores[name] = CompiledStore(path) if (path / "manifest.json").exists() else None
+        return self._stores[name]
+
+    def entity_types(self):
+        store = self.store("entities")
+        return store.table_names if store else []
+
+    def entities(self, entity_type):
+        store = self.store("entities")
+        if store is None or entity_type not in store.manifest["tables"]:
+            return None
+        return store.table(entity_type)
+
+    def timeline(self):
+        store = self.store("timelines")
+        return store.table("events") if store else None
+
+    def relationships(self):
+        store = self.store("relationships")
+        return store.table("edges") if store else None
+
+
+ENTITY_COLUMNS = ("text", "source", "context")
+TIMELINE_COLUMNS = ("date", "event", "source")
+RELATIONSHIP_COLUMNS = ("source", "target", "relation", "context")
+RELATIONSHIP_INT_COLUMNS = {"count": 1}
+
+
+def convert_json_kb(kb_dir="data/knowledge_base", output_dir="data/knowledge_base/compiled"):
+    """Compile the JSON knowledge base written by the extractors into the binary format"""
+    kb_dir, output_dir = Path(kb_dir), Path(output_dir)
+
+    writer = CompiledStoreWriter()
+    for path in sorted((kb_dir / "entities").glob("*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            writer.add_table(path.stem, json.load(f), ENTITY_COLUMNS)
+    writer.save(output_dir / "entities")
+
+    timeline = kb_dir / "timelines" / "kimathi_timeline.json"
+    if timeline.exists():
+        writer = CompiledStoreWriter()
+        with open(timeline, "r", encoding="utf-8") as f:
+            writer.add_table("events", json.load(f), TIMELINE_COLUMNS)
+        writer.save(output_dir / "timelines")
+
+    network = kb_dir / "relationships" / "kimathi_network.json"
+    if network.exists():
+        writer = CompiledStoreWriter()
+        with open(network, "r", encoding="utf-8") as f:
+            writer.add_table("edges", json.load(f), RELATIONSHIP_COLUMNS, RELATIONSHIP_INT_COLUMNS)
+        writer.save(output_dir / "relationships")
+
+
+if __name__ == "__main__":
+    convert_json_kb()
+    print("Compiled knowledge base written to data/knowledge_base/compiled/")
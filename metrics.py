@@ -0,0 +1,209 @@
+import bisect
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+request_log = logging.getLogger("kimathi.requests")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_text(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is a bisect and a few adds under a lock"""
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(
+                        f"{self.name}_bucket{_label_text(self.labelnames, key, [('le', le)])} {cumulative}"
+                    )
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {count}")
+        return lines
+
+
+class Gauge:
+    """A value read from a callback at scrape time, e.g. the answer cache size"""
+
+    def __init__(self, name, help, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.read()}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, read):
+        return self._add(Gauge(name, help, read))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+REQUESTS = REGISTRY.counter("kimathi_requests_total", "Questions answered, by serving path", ["path"])
+REQUEST_SECONDS = REGISTRY.histogram("kimathi_request_seconds", "End-to-end answer latency", ["path"])
+STAGE_SECONDS = REGISTRY.histogram("kimathi_stage_seconds", "Time spent in each answering stage", ["stage"])
+EVENTS = REGISTRY.counter(
+    "kimathi_events_total",
+    "Per-request outcomes: curated_hit, cache_hit, cache_miss, unverified, unconfident, truncated_input, "
+    "greedy_accepted, beam_escalation",
+    ["event"]
+)
+
+_current_trace = contextvars.ContextVar("kimathi_request_trace", default=None)
+
+
+class RequestTrace:
+    """Stage timings and outcome fields of one request, logged as one JSON line by finish()"""
+
+    def __init__(self, path):
+        self.path = path
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.fields = {}
+
+    def event(self, name, **fields):
+        EVENTS.inc(event=name)
+        self.fields[name] = True
+        self.fields.update(fields)
+
+    def finish(self):
+        seconds = time.perf_counter() - self.start
+        REQUESTS.inc(path=self.path)
+        REQUEST_SECONDS.observe(seconds, path=self.path)
+        if request_log.isEnabledFor(logging.INFO):
+            request_log.info(json.dumps({
+                "path": self.path,
+                "total_ms": round(seconds * 1000, 3),
+                "stages_ms": {name: round(s * 1000, 3) for name, s in self.stages.items()},
+                **self.fields,
+            }))
+
+
+def current_trace():
+    """The trace of the request being handled on this thread, or None"""
+    return _current_trace.get()
+
+
+def _traces(trace):
+    """trace as a list: the given trace, the traces of a batch's requests, or the current request's"""
+    if trace is None:
+        trace = _current_trace.get()
+    if trace is None:
+        return []
+    return [t for t in trace if t is not None] if isinstance(trace, (list, tuple)) else [trace]
+
+
+@contextmanager
+def stage(name, trace=None):
+    """Time a block into kimathi_stage_seconds and the current request's trace.
+
+    trace may also be a list, e.g. the traces of every request in a batch,
+    each of which is charged the whole block.
+    """
+    traces = _traces(trace)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=name)
+        for t in traces:
+            t.stages[name] = t.stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def request(path):
+    """Trace a request handled within one call on one thread (not across generator yields)"""
+    trace = RequestTrace(path)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.finish()
+
+
+def event(name, trace=None, **fields):
+    """Count an outcome, and note it on the current request's trace if there is one"""
+    traces = _traces(trace)
+    if traces:
+        for t in traces:
+            t.event(name, **fields)
+    else:
+        EVENTS.inc(event=name)
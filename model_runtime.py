@@ -0,0 +1,270 @@
+import argparse
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+import metrics
+from adaptive_decoding import answer_tokens, escalation_reason, greedy_params, merge_outputs
+
+
+class ModelRuntime:
+    """Loads the tokenizer, model and generation engine from local files, on first use.
+
+    Nothing touches TensorFlow until a property is read or warmup() runs, so
+    the UI can bind straight away and warm up in a background thread while
+    `ready` reports progress. With use_xla, a generate() graph saved by
+    export_generate() is loaded instead of building the Keras model; the model
+    itself is then only constructed if the streaming decoder needs it. The
+    "tflite" backend replaces both with the quantized TFLiteDecoder.
+
+    With config["adaptive_decoding"] on, generate() decodes greedily and
+    re-runs beam search only for the answers adaptive_decoding flags.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.model_dir = config["model_dir"]
+        self.ready = threading.Event()
+        self.error = None
+        self.timings = {}
+        self._lock = threading.RLock()
+        self._tokenizer = None
+        self._model = None
+        self._engine = None
+        self._streamer = None
+        self._greedy_engine = None
+        self.decode_counts = {"greedy": 0, "beam": 0}
+        self._counts_lock = threading.Lock()
+
+    def _timed(self, name, load):
+        start = time.perf_counter()
+        value = load()
+        self.timings[name] = time.perf_counter() - start
+        print(f"ModelRuntime: {name} loaded in {self.timings[name]:.1f}s")
+        return value
+
+    @property
+    def tokenizer(self):
+        with self._lock:
+            if self._tokenizer is None:
+                from transformers import AutoTokenizer
+
+                self._tokenizer = self._timed(
+                    "tokenizer", lambda: AutoTokenizer.from_pretrained(self.model_dir, local_files_only=True)
+                )
+            return self._tokenizer
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                from transformers import TFAutoModelForSeq2SeqLM
+
+                self._model = self._timed(
+                    "model", lambda: TFAutoModelForSeq2SeqLM.from_pretrained(self.model_dir, local_files_only=True)
+                )
+            return self._model
+
+    def _load_engine(self, name, saved_dir, config):
+        """A GenerationEngine from its exported graph if there is one, else compiled from the model"""
+        from generation_engine import GenerationEngine
+
+        if saved_dir.exists():
+            engine = self._timed(name, lambda: GenerationEngine.from_saved(saved_dir, self.tokenizer, config))
+        else:
+            engine = GenerationEngine(self.model, self.tokenizer, config)
+        self._timed(f"{name} warmup", engine.warmup)
+        return engine
+
+    @property
+    def engine(self):
+        """The XLA GenerationEngine, or None when config["use_xla"] is off"""
+        if not self.config["use_xla"] or self.config["backend"] == "tflite":
+            return None
+        with self._lock:
+            if self._engine is None:
+                self._engine = self._load_engine("engine", Path(self.config["prebuilt_generate_dir"]), self.config)
+            return self._engine
+
+    @property
+    def greedy_engine(self):
+        """An XLA GenerationEngine compiled with num_beams=1, for adaptive decoding.
+
+        Loaded from the greedy graph export_generate() saves next to the beam
+        one, so adaptive decoding does not construct the Keras model either.
+        """
+        if self.engine is None:
+            return None
+        with self._lock:
+            if self._greedy_engine is None:
+                self._greedy_engine = self._load_engine(
+                    "greedy engine", greedy_generate_dir(self.config), greedy_config(self.config)
+                )
+            return self._greedy_engine
+
+    @property
+    def streamer(self):
+        with self._lock:
+            if self._streamer is None and self.config["backend"] == "tflite":
+                from quantized_backend import TFLiteDecoder
+
+                self._streamer = self._timed(
+                    "tflite", lambda: TFLiteDecoder(self.config["tflite_dir"], self.tokenizer, self.config)
+                )
+            elif self._streamer is None:
+                from streaming import StreamingDecoder
+
+                self._streamer = StreamingDecoder(self.model, self.tokenizer, self.config)
+            return self._streamer
+
+    def generate(self, prompts):
+        """Run generate() on the prompts, with transition_scores computed for every row.
+
+        The result also has input_lengths: each prompt's token count after
+        truncation to max_input_length, from the encoding generate() ran on.
+        """
+        if self.config["backend"] == "tflite":
+            return self.streamer.generate(prompts)
+        policy = self.config.get("adaptive_decoding", {})
+        if not policy.get("enabled"):
+            return self._generate(prompts, greedy=False)
+
+        with metrics.stage("greedy_generate"):
+            outputs = self._generate(prompts, greedy=True)
+        tokenizer = self.tokenizer
+        rows = zip(np.asarray(outputs.sequences), np.asarray(outputs.transition_scores))
+        escalate = []
+        for i, (sequence, scores) in enumerate(rows):
+            tokens, logprobs = answer_tokens(sequence, scores, tokenizer.pad_token_id)
+            reason = escalation_reason(
+                tokens, logprobs, tokenizer.eos_token_id, self.config["generation_params"]["max_new_tokens"], policy
+            )
+            if reason is not None:
+                escalate.append(i)
+                metrics.event("beam_escalation", escalation_reason=reason)
+            else:
+                metrics.event("greedy_accepted")
+        with self._counts_lock:
+            self.decode_counts["greedy"] += len(prompts) - len(escalate)
+            self.decode_counts["beam"] += len(escalate)
+        if not escalate:
+            return outputs
+
+        with metrics.stage("beam_generate"):
+            beam = self._generate([prompts[i] for i in escalate], greedy=False)
+        return merge_outputs(outputs, beam, escalate, tokenizer.pad_token_id)
+
+    @property
+    def escalation_rate(self):
+        """Share of adaptively decoded answers that needed beam search"""
+        with self._counts_lock:
+            total = self.decode_counts["greedy"] + self.decode_counts["beam"]
+            return self.decode_counts["beam"] / total if total else 0.0
+
+    def _generate(self, prompts, greedy):
+        engine = self.greedy_engine if greedy else self.engine
+        if engine is not None:
+            return engine.generate(prompts)
+
+        from generation_engine import generation_kwargs
+
+        params = self.config["generation_params"]
+        with metrics.stage("tokenize"):
+            inputs = self.tokenizer(
+                prompts,
+                return_tensors="tf",
+                truncation=True,
+                max_length=self.config["max_input_length"],
+                padding="longest"
+            )
+        outputs = self.model.generate(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            return_dict_in_generate=True,
+            output_scores=True,
+            **generation_kwargs(greedy_params(params) if greedy else params)
+        )
+        beam_indices = getattr(outputs, "beam_indices", None)
+        # Beam search scores are already log-softmaxed; greedy scores are raw logits
+        transition_scores = self.model.compute_transition_scores(
+            outputs.sequences,
+            outputs.scores,
+            beam_indices=beam_indices,
+            normalize_logits=beam_indices is None
+        )
+        return SimpleNamespace(
+            sequences=outputs.sequences,
+            transition_scores=transition_scores,
+            input_lengths=[int(n) for n in np.asarray(inputs["attention_mask"]).sum(axis=1)],
+        )
+
+    def warmup(self):
+        """Load everything the configured serving path needs, then set `ready`"""
+        try:
+            self.tokenizer
+            if self.config["use_xla"]:
+                self.engine
+                if self.config.get("adaptive_decoding", {}).get("enabled"):
+                    self.greedy_engine
+            if self.config["streaming"]["enabled"] or self.config["backend"] == "tflite":
+                self.streamer
+            elif not self.config["use_xla"]:
+                self.model
+        except Exception as e:
+            self.error = e
+            print(f"ModelRuntime: warm-up failed: {e}")
+            raise
+        self.ready.set()
+
+    def start_warmup(self):
+        thread = threading.Thread(target=self.warmup, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        return {
+            "ready": self.ready.is_set(),
+            "error": None if self.error is None else str(self.error),
+            "timings": dict(self.timings),
+            "decode_counts": dict(self.decode_counts),
+            "escalation_rate": self.escalation_rate,
+        }
+
+    def export_generate(self):
+        """Compile every bucket of the beam and greedy graphs and save them under config["prebuilt_generate_dir"]"""
+        from generation_engine import GenerationEngine
+
+        for config, export_dir in (
+            (self.config, self.config["prebuilt_generate_dir"]),
+            (greedy_config(self.config), greedy_generate_dir(self.config)),
+        ):
+            engine = GenerationEngine(self.model, self.tokenizer, config)
+            engine.warmup()
+            engine.export(export_dir)
+        return self.config["prebuilt_generate_dir"]
+
+
+def greedy_config(config):
+    """config with num_beams=1 generation params, as adaptive decoding's first pass uses"""
+    return dict(config, generation_params=greedy_params(config["generation_params"]))
+
+
+def greedy_generate_dir(config):
+    """Where export_generate() saves the greedy graph: a "greedy" directory inside the beam graph's"""
+    return Path(config["prebuilt_generate_dir"]) / "greedy"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-build the XLA generate() graph used by app.py")
+    parser.add_argument("--model-dir", default="model/flan-kimathi-model-v7")
+    parser.add_argument("--output-dir", default="model/compiled_generate")
+    args = parser.parse_args()
+
+    # Buckets and generation params must match app.py's config
+    from app_config import config
+
+    config = dict(config, model_dir=args.model_dir, prebuilt_generate_dir=args.output_dir)
+    print(f"Saved compiled generate() to {ModelRuntime(config).export_generate()}")
@@ -0,0 +1,359 @@
+import argparse
+import csv
+import hashlib
+import json
+import math
+import re
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+QA_CSV = "data/qa_pairs/manual/kimathi_qa_text2text.csv"
+LABEL_PAD = -100  # ignored by the Hugging Face seq2seq loss
+CACHE_VERSION = 2  # bump when dataset.json or the shard layout changes
+
+
+def load_qa_rows(path):
+    """(input text, target text) rows of a text2text CSV (input_text/target_text) or a Question/Answer CSV"""
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if "input_text" in row:
+                source, target = row["input_text"].strip(), row["target_text"].strip()
+            else:
+                source, target = f"question: {row['Question'].strip()}", row["Answer"].strip()
+            if source and target:
+                rows.append((source, target))
+    return rows
+
+
+def count_csv_rows(path):
+    """Data rows of a CSV, as pandas.read_csv() would load them (blank lines skipped)"""
+    with open(path, "r", encoding="utf-8") as f:
+        return sum(1 for _ in csv.DictReader(f))
+
+
+def notebook_max_lengths(tokenizer, rows):
+    """(max input length, max target length) computed like training_bot.ipynb: longest tokenize(), no EOS"""
+    return (
+        max(len(tokenizer.tokenize(source)) for source, _ in rows),
+        max(len(tokenizer.tokenize(target)) for _, target in rows),
+    )
+
+
+def train_test_split_indices(n, test_size=0.2, random_state=42):
+    """(train, test) positions in the order sklearn's train_test_split(range(n), ...) returns them.
+
+    sklearn's ShuffleSplit takes ceil(test_size * n) test rows from the front of
+    one RandomState(random_state) permutation and the rest as train rows.
+    """
+    n_test = math.ceil(test_size * n)
+    permutation = np.random.RandomState(random_state).permutation(n)
+    return permutation[n_test:], permutation[:n_test]
+
+
+def tokenizer_fingerprint(tokenizer):
+    """Hash of everything about a tokenizer that changes its ids"""
+    digest = hashlib.sha256()
+    digest.update(type(tokenizer).__name__.encode("utf-8"))
+    digest.update(json.dumps(sorted(tokenizer.get_vocab().items())).encode("utf-8"))
+    digest.update(json.dumps(tokenizer.all_special_tokens).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _csv_hash(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(str(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _write_shard(shard_dir, rows, tokenizer, max_input_length, max_target_length):
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    inputs = tokenizer([source for source, _ in rows], truncation=True, max_length=max_input_length)["input_ids"]
+    labels = tokenizer([target for _, target in rows], truncation=True, max_length=max_target_length)["input_ids"]
+    for name, sequences in (("input", inputs), ("label", labels)):
+        offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(ids) for ids in sequences])
+        flat = np.fromiter((token for ids in sequences for token in ids), dtype=np.int32, count=int(offsets[-1]))
+        np.save(shard_dir / f"{name}_ids.npy", flat)
+        np.save(shard_dir / f"{name}_offsets.npy", offsets)
+    with open(shard_dir / "texts.json", "w", encoding="utf-8") as f:
+        json.dump(rows, f)
+
+
+def build_token_cache(tokenizer, csv_paths=(QA_CSV,), cache_root="data/.token_cache",
+                      max_input_length=64, max_target_length=128, shard_size=4096):
+    """Tokenize the QA CSVs once into memory-mapped shards, and return the cache directory.
+
+    The directory is keyed by the tokenizer fingerprint, the CSV contents and
+    the length limits, so a cache is reused until one of them changes. Each
+    shard holds flat input/label token arrays with offsets (the same CSR
+    layout as the other indexes here), unpadded: padding is left to the
+    batches.
+    """
+    key = hashlib.sha256(json.dumps([
+        CACHE_VERSION, tokenizer_fingerprint(tokenizer), _csv_hash(csv_paths),
+        max_input_length, max_target_length, shard_size
+    ]).encode("utf-8")).hexdigest()[:16]
+    cache_dir = Path(cache_root) / key
+    if (cache_dir / "dataset.json").exists():
+        return cache_dir
+
+    rows = [row for path in csv_paths for row in load_qa_rows(path)]
+    num_shards = max(1, -(-len(rows) // shard_size))
+    for shard in range(num_shards):
+        _write_shard(
+            cache_dir / f"shard_{shard:03d}", rows[shard * shard_size:(shard + 1) * shard_size],
+            tokenizer, max_input_length, max_target_length
+        )
+    # Written last, so an interrupted build is redone rather than read
+    with open(cache_dir / "dataset.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "csv_paths": [str(path) for path in csv_paths],
+            "csv_rows": sum(count_csv_rows(path) for path in csv_paths),
+            "examples": len(rows),
+            "shards": num_shards,
+            "max_input_length": max_input_length,
+            "max_target_length": max_target_length,
+            "pad_token_id": tokenizer.pad_token_id,
+        }, f, indent=2)
+    return cache_dir
+
+
+class TokenizedQA:
+    """Memory-mapped reader for a directory written by build_token_cache()"""
+
+    def __init__(self, cache_dir):
+        cache_dir = Path(cache_dir)
+        with open(cache_dir / "dataset.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.pad_token_id = self.meta["pad_token_id"]
+        self.shards = []
+        for shard in range(self.meta["shards"]):
+            shard_dir = cache_dir / f"shard_{shard:03d}"
+            self.shards.append({
+                name: np.load(shard_dir / f"{name}.npy", mmap_mode="r")
+                for name in ("input_ids", "input_offsets", "label_ids", "label_offsets")
+            })
+        sizes = [len(shard["input_offsets"]) - 1 for shard in self.shards]
+        self._starts = np.concatenate([[0], np.cumsum(sizes)])
+        self.input_lengths = np.concatenate([np.diff(shard["input_offsets"]) for shard in self.shards])
+        self.label_lengths = np.concatenate([np.diff(shard["label_offsets"]) for shard in self.shards])
+        self._cache_dir = cache_dir
+        self._texts = None
+
+    def __len__(self):
+        return int(self._starts[-1])
+
+    def _locate(self, i):
+        shard = int(np.searchsorted(self._starts, i, side="right")) - 1
+        return self.shards[shard], i - self._starts[shard]
+
+    def example(self, i):
+        """(input ids, label ids) of example i as int32 arrays"""
+        shard, row = self._locate(i)
+        inputs = shard["input_ids"][shard["input_offsets"][row]:shard["input_offsets"][row + 1]]
+        labels = shard["label_ids"][shard["label_offsets"][row]:shard["label_offsets"][row + 1]]
+        return np.asarray(inputs), np.asarray(labels)
+
+    def texts(self, i):
+        """(input text, target text) of example i"""
+        if self._texts is None:
+            self._texts = []
+            for shard in range(self.meta["shards"]):
+                with open(self._cache_dir / f"shard_{shard:03d}" / "texts.json", "r", encoding="utf-8") as f:
+                    self._texts.extend(tuple(row) for row in json.load(f))
+        return self._texts[i]
+
+    def split(self, test_size=0.2, random_state=42):
+        """(train indices, validation indices) of the training notebook's held-out split.
+
+        training_bot.ipynb splits its DataFrame with train_test_split(df,
+        test_size=0.2, random_state=42); example i here is row i of that frame
+        only if the cache holds one CSV with no row dropped, so anything else
+        is refused rather than quietly evaluated on training rows.
+        """
+        if len(self.meta["csv_paths"]) != 1 or self.meta.get("csv_rows") != len(self):
+            raise ValueError(
+                f"{self._cache_dir} does not hold exactly the rows of one CSV, so its examples "
+                "cannot be matched to the notebook's train/validation split"
+            )
+        return train_test_split_indices(len(self), test_size, random_state)
+
+    def padded_batch(self, indices):
+        """input_ids, attention_mask and labels of the examples, padded to the longest in the batch"""
+        examples = [self.example(i) for i in indices]
+        input_width = max(len(inputs) for inputs, _ in examples)
+        label_width = max(len(labels) for _, labels in examples)
+        input_ids = np.full((len(examples), input_width), self.pad_token_id, dtype=np.int32)
+        attention_mask = np.zeros((len(examples), input_width), dtype=np.int32)
+        labels = np.full((len(examples), label_width), LABEL_PAD, dtype=np.int32)
+        for row, (inputs, targets) in enumerate(examples):
+            input_ids[row, :len(inputs)] = inputs
+            attention_mask[row, :len(inputs)] = 1
+            labels[row, :len(targets)] = targets
+        return {"input_ids": input_ids, "attention_mask": attention_mask, "labels": labels}
+
+
+def make_tf_dataset(data, indices, batch_size=8, shuffle=True, bucket_boundaries=(16, 32, 48), seed=42):
+    """A tf.data pipeline over cached token ids: cache, shuffle, length-bucketed padded batches, prefetch.
+
+    Examples whose input lengths fall in the same bucket are batched
+    together, so little of each batch is padding. Elements are feature
+    dicts with labels included, which Keras fit() on a Hugging Face TF
+    model turns into its own loss.
+    """
+    import tensorflow as tf
+
+    indices = np.asarray(indices)
+
+    def examples():
+        for i in indices:
+            inputs, labels = data.example(int(i))
+            yield {"input_ids": inputs, "attention_mask": np.ones_like(inputs), "labels": labels}
+
+    spec = tf.TensorSpec(shape=(None,), dtype=tf.int32)
+    dataset = tf.data.Dataset.from_generator(
+        examples, output_signature={"input_ids": spec, "attention_mask": spec, "labels": spec}
+    ).cache()
+    if shuffle:
+        dataset = dataset.shuffle(len(indices), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.bucket_by_sequence_length(
+        element_length_func=lambda example: tf.shape(example["input_ids"])[0],
+        bucket_boundaries=list(bucket_boundaries),
+        bucket_batch_sizes=[batch_size] * (len(bucket_boundaries) + 1),
+        padding_values={
+            "input_ids": tf.constant(data.pad_token_id, tf.int32),
+            "attention_mask": tf.constant(0, tf.int32),
+            "labels": tf.constant(LABEL_PAD, tf.int32),
+        },
+    )
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+_NON_ALNUM = re.compile(r"[^a-z0-9\s]")
+
+
+def normalize_answer(text):
+    """Lower-case, strip punctuation and collapse whitespace, as the training notebook's metrics do"""
+    return " ".join(_NON_ALNUM.sub("", text.lower()).split())
+
+
+def _ngrams(tokens, n):
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+
+def _f1(overlap, predicted, reference):
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / predicted, overlap / reference
+    return 2 * precision * recall / (precision + recall)
+
+
+def _lcs_length(a, b):
+    previous = [0] * (len(b) + 1)
+    for x in a:
+        current = [0]
+        for j, y in enumerate(b):
+            current.append(previous[j] + 1 if x == y else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+
+def rouge_scores(prediction, reference):
+    """ROUGE-1, ROUGE-2 and ROUGE-L F1 over normalized words"""
+    prediction, reference = normalize_answer(prediction).split(), normalize_answer(reference).split()
+    scores = {}
+    for n in (1, 2):
+        predicted, expected = _ngrams(prediction, n), _ngrams(reference, n)
+        overlap = sum((predicted & expected).values())
+        scores[f"rouge{n}"] = _f1(overlap, sum(predicted.values()), sum(expected.values()))
+    scores["rougeL"] = _f1(_lcs_length(prediction, reference), len(prediction), len(reference))
+    return scores
+
+
+def evaluate_generation(model, tokenizer, data, indices, generation_params, batch_size=32):
+    """Generate answers for the examples in length-sorted batches and score them against their targets.
+
+    Inputs come straight from the token cache, padded per batch, so nothing
+    is re-tokenized. Returns the mean exact-match and ROUGE scores, the
+    throughput and one row per example.
+    """
+    import tensorflow as tf
+
+    from generation_engine import generation_kwargs
+
+    indices = sorted((int(i) for i in indices), key=lambda i: data.input_lengths[i])
+    kwargs = generation_kwargs(generation_params)
+    rows = []
+    start = time.perf_counter()
+    for batch_start in range(0, len(indices), batch_size):
+        batch = indices[batch_start:batch_start + batch_size]
+        padded = data.padded_batch(batch)
+        outputs = model.generate(
+            input_ids=tf.constant(padded["input_ids"]),
+            attention_mask=tf.constant(padded["attention_mask"]),
+            **kwargs
+        )
+        for i, prediction in zip(batch, tokenizer.batch_decode(outputs, skip_special_tokens=True)):
+            source, target = data.texts(i)
+            rows.append({
+                "index": i,
+                "input": source,
+                "target": target,
+                "prediction": prediction,
+                "exact_match": float(normalize_answer(prediction) == normalize_answer(target)),
+                **rouge_scores(prediction, target),
+            })
+    seconds = time.perf_counter() - start
+
+    rows.sort(key=lambda row: row["index"])
+    summary = {
+        name: float(np.mean([row[name] for row in rows])) if rows else 0.0
+        for name in ("exact_match", "rouge1", "rouge2", "rougeL")
+    }
+    summary.update(examples=len(rows), seconds=seconds, examples_per_second=len(rows) / seconds if seconds else 0.0)
+    return {"summary": summary, "rows": rows}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tokenize the QA CSVs once, and evaluate a model on them")
+    parser.add_argument("command", choices=["build", "eval"])
+    parser.add_argument("--model-dir", default="model/flan-kimathi-model-v7")
+    parser.add_argument("--csv", nargs="+", default=[QA_CSV])
+    parser.add_argument("--cache-root", default="data/.token_cache")
+    parser.add_argument("--split", choices=["train", "validation", "all"], default="validation")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--output", help="write the evaluation summary and rows here as JSON")
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+
+    from app_config import config
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_dir, local_files_only=True)
+    # Labels are truncated to the longest target, as the notebook's preprocessing did; inputs as served
+    rows = [row for path in args.csv for row in load_qa_rows(path)]
+    _, max_target_length = notebook_max_lengths(tokenizer, rows)
+    cache_dir = build_token_cache(
+        tokenizer, args.csv, args.cache_root, config["max_input_length"], max_target_length
+    )
+    data = TokenizedQA(cache_dir)
+    print(f"{len(data)} tokenized examples in {cache_dir}")
+
+    if args.command == "eval":
+        from transformers import TFAutoModelForSeq2SeqLM
+
+        model = TFAutoModelForSeq2SeqLM.from_pretrained(args.model_dir, local_files_only=True)
+        train, validation = data.split()
+        indices = {"train": train, "validation": validation, "all": np.arange(len(data))}[args.split]
+        result = evaluate_generation(model, tokenizer, data, indices, config["generation_params"], args.batch_size)
+        print(json.dumps(result["summary"], indent=2))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
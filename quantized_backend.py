@@ -0,0 +1,234 @@
+import argparse
+import json
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+from streaming import StreamingDecoder
+
+SIGNATURES = ("encode", "decode_first", "decode_step")
+
+
+def _stack_cache(past_key_values):
+    """Pack HF's per-layer (self k, self v, cross k, cross v) into two [layers, 2, ...] tensors"""
+    self_kv = tf.stack([tf.stack([layer[0], layer[1]]) for layer in past_key_values])
+    cross_kv = tf.stack([tf.stack([layer[2], layer[3]]) for layer in past_key_values])
+    return self_kv, cross_kv
+
+
+def _unstack_cache(self_kv, cross_kv, num_layers):
+    return tuple(
+        (self_kv[i, 0], self_kv[i, 1], cross_kv[i, 0], cross_kv[i, 1]) for i in range(num_layers)
+    )
+
+
+class _DecoderModule(tf.Module):
+    """The encoder and one cached decoder step as fixed signatures a TFLite converter can take"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        config = model.config
+        self.num_layers = config.num_decoder_layers
+        kv_shape = [self.num_layers, 2, 1, config.num_heads, None, config.d_kv]
+        ids = tf.TensorSpec([1, None], tf.int32)
+        hidden = tf.TensorSpec([1, None, config.d_model], tf.float32)
+
+        self.encode = tf.function(self._encode, input_signature=[ids, ids])
+        self.decode_first = tf.function(
+            self._decode_first,
+            input_signature=[tf.TensorSpec([1, 1], tf.int32), hidden, ids]
+        )
+        self.decode_step = tf.function(
+            self._decode_step,
+            input_signature=[
+                tf.TensorSpec([1, 1], tf.int32), hidden, ids,
+                tf.TensorSpec(kv_shape, tf.float32), tf.TensorSpec(kv_shape, tf.float32),
+            ]
+        )
+
+    def _encode(self, input_ids, attention_mask):
+        outputs = self.model.get_encoder()(input_ids=input_ids, attention_mask=attention_mask)
+        return {"hidden_states": outputs.last_hidden_state}
+
+    def _decode_first(self, decoder_input_ids, hidden_states, attention_mask):
+        outputs = self.model(
+            encoder_outputs=(hidden_states,),
+            attention_mask=attention_mask,
+            decoder_input_ids=decoder_input_ids,
+            use_cache=True
+        )
+        self_kv, cross_kv = _stack_cache(outputs.past_key_values)
+        return {"logits": outputs.logits[:, -1], "self_kv": self_kv, "cross_kv": cross_kv}
+
+    def _decode_step(self, decoder_input_ids, hidden_states, attention_mask, self_kv, cross_kv):
+        outputs = self.model(
+            encoder_outputs=(hidden_states,),
+            attention_mask=attention_mask,
+            decoder_input_ids=decoder_input_ids,
+            past_key_values=_unstack_cache(self_kv, cross_kv, self.num_layers),
+            use_cache=True
+        )
+        self_kv, _ = _stack_cache(outputs.past_key_values)
+        return {"logits": outputs.logits[:, -1], "self_kv": self_kv}
+
+
+def export_tflite(model, output_dir="model/tflite", quantize=True):
+    """Convert the encoder and cached decoder step to one TFLite file with three signatures.
+
+    quantize applies dynamic-range quantization: weights are stored as int8 and
+    matmuls run on int8 with activations quantized on the fly.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    module = _DecoderModule(model)
+    saved_dir = output_dir / "saved_model"
+    tf.saved_model.save(
+        module, str(saved_dir),
+        signatures={name: getattr(module, name).get_concrete_function() for name in SIGNATURES}
+    )
+
+    converter = tf.lite.TFLiteConverter.from_saved_model(str(saved_dir), signature_keys=list(SIGNATURES))
+    if quantize:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_ops = [
+        tf.lite.OpsSet.TFLITE_BUILTINS,
+        tf.lite.OpsSet.SELECT_TF_OPS,
+    ]
+    model_path = output_dir / "flan_kimathi.tflite"
+    with open(model_path, "wb") as f:
+        f.write(converter.convert())
+
+    with open(output_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "decoder_start_token_id": model.config.decoder_start_token_id,
+            "eos_token_id": model.config.eos_token_id,
+            "quantized": quantize,
+        }, f, indent=2)
+    return model_path
+
+
+class TFLiteDecoder(StreamingDecoder):
+    """StreamingDecoder running on the TFLite model written by export_tflite()"""
+
+    def __init__(self, tflite_dir, tokenizer, config, num_threads=None):
+        super().__init__(None, tokenizer, config)
+        tflite_dir = Path(tflite_dir)
+        with open(tflite_dir / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.start_token_id = meta["decoder_start_token_id"]
+        self.eos_token_id = meta["eos_token_id"]
+        self.interpreter = tf.lite.Interpreter(
+            model_path=str(tflite_dir / "flan_kimathi.tflite"),
+            num_threads=num_threads
+        )
+        self.runners = {name: self.interpreter.get_signature_runner(name) for name in SIGNATURES}
+
+    def _start(self, prompt):
+        inputs = self.tokenizer(prompt, return_tensors="np", truncation=True, max_length=self.max_input_length)
+        input_ids = inputs["input_ids"].astype(np.int32)
+        attention_mask = inputs["attention_mask"].astype(np.int32)
+        hidden_states = self.runners["encode"](input_ids=input_ids, attention_mask=attention_mask)["hidden_states"]
+        return {
+            "input_length": input_ids.shape[1],
+            "hidden_states": hidden_states,
+            "attention_mask": attention_mask,
+            "self_kv": None,
+            "cross_kv": None,
+        }
+
+    def _step(self, state, token):
+        inputs = {
+            "decoder_input_ids": np.array([[token]], dtype=np.int32),
+            "hidden_states": state["hidden_states"],
+            "attention_mask": state["attention_mask"],
+        }
+        if state["self_kv"] is None:
+            outputs = self.runners["decode_first"](**inputs)
+            state["cross_kv"] = outputs["cross_kv"]
+        else:
+            outputs = self.runners["decode_step"](**inputs, self_kv=state["self_kv"], cross_kv=state["cross_kv"])
+        state["self_kv"] = outputs["self_kv"]
+        return outputs["logits"][0]
+
+
+def token_f1(prediction, reference):
+    prediction, reference = prediction.lower().split(), reference.lower().split()
+    common = sum((Counter(prediction) & Counter(reference)).values())
+    if not common:
+        return 0.0
+    precision, recall = common / len(prediction), common / len(reference)
+    return 2 * precision * recall / (precision + recall)
+
+
+def fidelity_check(reference, candidate, pairs, prompt=lambda q: f"Question: {q}\nAnswer:"):
+    """Compare two decoders' answers on (question, gold answer) pairs"""
+    rows = []
+    seconds = {"reference": 0.0, "candidate": 0.0}
+    for question, gold in pairs:
+        answers = {}
+        for name, decoder in (("reference", reference), ("candidate", candidate)):
+            start = time.perf_counter()
+            answers[name] = decoder.tokenizer.decode(
+                [token for token, _ in decoder.stream(prompt(question))], skip_special_tokens=True
+            )
+            seconds[name] += time.perf_counter() - start
+        rows.append({
+            "question": question,
+            "reference": answers["reference"],
+            "candidate": answers["candidate"],
+            "agreement_f1": token_f1(answers["candidate"], answers["reference"]),
+            "reference_gold_f1": token_f1(answers["reference"], gold),
+            "candidate_gold_f1": token_f1(answers["candidate"], gold),
+        })
+
+    n = max(len(rows), 1)
+    summary = {
+        "questions": len(rows),
+        "exact_match": sum(r["reference"] == r["candidate"] for r in rows) / n,
+        "agreement_f1": sum(r["agreement_f1"] for r in rows) / n,
+        "reference_gold_f1": sum(r["reference_gold_f1"] for r in rows) / n,
+        "candidate_gold_f1": sum(r["candidate_gold_f1"] for r in rows) / n,
+        "reference_ms_per_question": 1000 * seconds["reference"] / n,
+        "candidate_ms_per_question": 1000 * seconds["candidate"] / n,
+    }
+    return summary, rows
+
+
+if __name__ == "__main__":
+    from transformers import AutoTokenizer, TFAutoModelForSeq2SeqLM
+
+    from app_config import config
+    from curated_qa import load_curated_pairs
+
+    parser = argparse.ArgumentParser(description="Build and check the quantized TFLite backend")
+    parser.add_argument("command", choices=["export", "check"])
+    parser.add_argument("--no-quantize", action="store_true")
+    parser.add_argument("--limit", type=int, default=None, help="check only the first N manual QA pairs")
+    parser.add_argument(
+        "--report", default=None, help="fidelity report path (default: fidelity.json next to the TFLite model)"
+    )
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(config["model_dir"], local_files_only=True)
+    model = TFAutoModelForSeq2SeqLM.from_pretrained(config["model_dir"], local_files_only=True)
+
+    if args.command == "export":
+        path = export_tflite(model, config["tflite_dir"], quantize=not args.no_quantize)
+        print(f"Saved {path} ({path.stat().st_size / 2**20:.1f} MiB)")
+    else:
+        pairs = load_curated_pairs(config["curated"]["csv"])[:args.limit]
+        summary, rows = fidelity_check(
+            StreamingDecoder(model, tokenizer, config),
+            TFLiteDecoder(config["tflite_dir"], tokenizer, config),
+            pairs
+        )
+        # Kept with the (git-ignored) model it describes rather than under data/
+        report = Path(args.report or Path(config["tflite_dir"]) / "fidelity.json")
+        report.parent.mkdir(parents=True, exist_ok=True)
+        with open(report, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "rows": rows}, f, indent=2)
+        print(json.dumps(summary, indent=2))
@@ -0,0 +1,156 @@
+import json
+import math
+import mmap
+import re
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from segment_shards import iter_book_segments
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by did do does for from had has have he her his how i in is it its "
+    "of on or she that the their them they this to was were what when where which who whom why "
+    "will with you".split()
+)
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def iter_sections(cleaned_dir="data/cleaned_text"):
+    """Yield (book, section name, text) for every cleaned segment"""
+    for book, key, text in iter_book_segments(cleaned_dir):
+        text = text.strip()
+        if text:
+            yield book, Path(key).name, text
+
+
+def build_index(output_dir="data/index/sections", cleaned_dir="data/cleaned_text", k1=1.5, b=0.75):
+    """Build a BM25 index over the cleaned sections and save it as flat arrays.
+
+    Postings are stored term-major (CSR: indptr/doc_ids/weights) with the full
+    BM25 weight precomputed, so a query only sums a few posting rows.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    docs, term_counts = [], []
+    for book, section, text in iter_sections(cleaned_dir):
+        docs.append({"book": book, "section": section, "text": text})
+        term_counts.append(Counter(tokenize(text)))
+
+    doc_lengths = np.array([sum(c.values()) for c in term_counts], dtype=np.float32)
+    avg_length = float(doc_lengths.mean()) if len(docs) else 0.0
+
+    postings = {}
+    for doc_id, counts in enumerate(term_counts):
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc_id, tf))
+
+    vocab = {term: i for i, term in enumerate(sorted(postings))}
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    doc_ids, weights = [], []
+    for term, term_id in vocab.items():
+        entries = postings[term]
+        idf = math.log(1 + (len(docs) - len(entries) + 0.5) / (len(entries) + 0.5))
+        for doc_id, tf in entries:
+            norm = k1 * (1 - b + b * doc_lengths[doc_id] / avg_length)
+            doc_ids.append(doc_id)
+            weights.append(idf * tf * (k1 + 1) / (tf + norm))
+        indptr[term_id + 1] = len(doc_ids)
+
+    np.save(output_dir / "indptr.npy", indptr)
+    np.save(output_dir / "doc_ids.npy", np.array(doc_ids, dtype=np.int32))
+    np.save(output_dir / "weights.npy", np.array(weights, dtype=np.float32))
+
+    # Passage texts go into one blob addressed by byte offsets
+    offsets = [0]
+    with open(output_dir / "passages.bin", "wb") as f:
+        for doc in docs:
+            data = doc["text"].encode("utf-8")
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+    np.save(output_dir / "offsets.npy", np.array(offsets, dtype=np.int64))
+
+    with open(output_dir / "vocab.json", "w", encoding="utf-8") as f:
+        json.dump(vocab, f)
+    with open(output_dir / "docs.json", "w", encoding="utf-8") as f:
+        json.dump([{"book": d["book"], "section": d["section"]} for d in docs], f, indent=2)
+    return len(docs), len(vocab)
+
+
+class SectionRetriever:
+    """Memory-mapped reader for an index written by build_index()"""
+
+    def __init__(self, index_dir="data/index/sections"):
+        index_dir = Path(index_dir)
+        self.indptr = np.load(index_dir / "indptr.npy", mmap_mode="r")
+        self.doc_ids = np.load(index_dir / "doc_ids.npy", mmap_mode="r")
+        self.weights = np.load(index_dir / "weights.npy", mmap_mode="r")
+        self.offsets = np.load(index_dir / "offsets.npy", mmap_mode="r")
+        with open(index_dir / "vocab.json", "r", encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        with open(index_dir / "docs.json", "r", encoding="utf-8") as f:
+            self.docs = json.load(f)
+        self._blob_file = open(index_dir / "passages.bin", "rb")
+        self._blob = mmap.mmap(self._blob_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def passage(self, doc_id):
+        start, end = self.offsets[doc_id], self.offsets[doc_id + 1]
+        return self._blob[start:end].decode("utf-8")
+
+    def search(self, query, top_k=3):
+        """Return up to top_k (doc_id, score) pairs ranked by BM25"""
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            # Each doc appears at most once per posting row, so fancy-index += is safe
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(scores[matched], -top_k)[-top_k:]]
+        ranked = matched[np.argsort(-scores[matched])]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in ranked]
+
+    def retrieve(self, query, top_k=3):
+        return [self.passage(doc_id) for doc_id, _ in self.search(query, top_k)]
+
+
+def build_prompt(question, passages, tokenizer, max_length):
+    """Pack retrieved passages in front of the question without exceeding max_length tokens"""
+    suffix = f"\nQuestion: {question}\nAnswer:"
+    # Room left after the question, the "Context:" label and the EOS token
+    budget = max_length - len(tokenizer(suffix)["input_ids"]) - len(tokenizer("Context:")["input_ids"])
+    context = []
+    for passage in passages:
+        if budget <= 0:
+            break
+        ids = tokenizer(passage, add_special_tokens=False)["input_ids"][:budget]
+        context.append(tokenizer.decode(ids, skip_special_tokens=True))
+        budget -= len(ids)
+
+    # Decoding and re-encoding need not round-trip, so check the finished prompt and
+    # trim the context, never the question, which generate() would truncate first
+    fixed = len(tokenizer("Context:" + suffix)["input_ids"])
+    ids = tokenizer(" ".join(context), add_special_tokens=False)["input_ids"]
+    keep = len(ids)
+    while keep > 0:
+        prompt = "Context: " + tokenizer.decode(ids[:keep], skip_special_tokens=True) + suffix
+        length = len(tokenizer(prompt)["input_ids"])
+        if length <= max_length:
+            return prompt
+        # Shrink in proportion to how much the kept ids grew when re-encoded
+        keep = min(keep - 1, keep * (max_length - fixed) // max(length - fixed, 1))
+    return f"Question: {question}\nAnswer:"
+
+if __name__ == "__main__":
+    num_docs, num_terms = build_index()
+    print(f"Indexed {num_docs} sections ({num_terms} terms) into data/index/sections/")
@@ -0,0 +1,67 @@
+import json
+import mmap
+from pathlib import Path
+
+
+def write_shard(segments, shard_path, metadata=None):
+    """Write segments as one UTF-8 blob plus a JSON index of byte offsets"""
+    shard_path = Path(shard_path)
+    index = []
+    offset = 0
+    with open(shard_path, 'wb') as f:
+        for text, num_tokens in segments:
+            data = text.encode('utf-8')
+            f.write(data)
+            index.append([offset, offset + len(data), num_tokens])
+            offset += len(data)
+    with open(f"{shard_path}.json", 'w', encoding='utf-8') as f:
+        json.dump({"metadata": metadata or {}, "segments": index}, f)
+
+
+class SegmentShard:
+    """Memory-mapped reader for a shard written by write_shard()"""
+
+    def __init__(self, shard_path):
+        self.path = Path(shard_path)
+        with open(f"{self.path}.json", 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        self.metadata = index["metadata"]
+        self.index = index["segments"]
+        self._file = open(self.path, 'rb')
+        self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.index else b""
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        start, end, _ = self.index[i]
+        return self._blob[start:end].decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def token_counts(self):
+        return [num_tokens for _, _, num_tokens in self.index]
+
+
+def iter_book_segments(cleaned_dir="data/cleaned_text"):
+    """Yield (book name, segment key, text) for every book, from its shard when one exists.
+
+    Falls back to the per-section section_NNN.txt files for books that were
+    segmented before shards existed.
+    """
+    cleaned_dir = Path(cleaned_dir)
+    books = sorted(
+        {p.name[:-len(".shard")] for p in cleaned_dir.glob("*_cleaned.shard")}
+        | {p.name for p in cleaned_dir.glob("*_cleaned") if p.is_dir()}
+    )
+    for book in books:
+        shard_path = cleaned_dir / f"{book}.shard"
+        if shard_path.exists():
+            for i, text in enumerate(SegmentShard(shard_path), 1):
+                yield book, f"{shard_path.name}#{i:03d}", text
+        else:
+            for section_file in sorted((cleaned_dir / book).glob("section_*.txt")):
+                with open(section_file, 'r', encoding='utf-8') as f:
+                    yield book, str(section_file), f.read()
@@ -0,0 +1,119 @@
+from types import SimpleNamespace
+
+import numpy as np
+import tensorflow as tf
+
+from generation_engine import generation_kwargs
+
+
+def banned_ngram_tokens(tokens, ngram_size):
+    """Tokens that would complete an n-gram already present in tokens"""
+    if ngram_size <= 0 or len(tokens) < ngram_size:
+        return set()
+    prefix = tokens[len(tokens) - ngram_size + 1:]
+    return {
+        tokens[i + ngram_size - 1]
+        for i in range(len(tokens) - ngram_size + 1)
+        if tokens[i:i + ngram_size - 1] == prefix
+    }
+
+
+class StreamingDecoder:
+    """Greedy token-by-token decoding that yields each token as soon as it is chosen.
+
+    The encoder runs once and the decoder reuses its key/value cache, so every
+    step costs a single one-token decoder pass. Beam search cannot stream (the
+    leading hypothesis may change until the last step), so this path is greedy;
+    max_new_tokens and no_repeat_ngram_size still come from the generation params.
+    Subclasses provide other backends by overriding _start() and _step().
+    """
+
+    def __init__(self, model, tokenizer, config):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_input_length = config["max_input_length"]
+        kwargs = generation_kwargs(config["generation_params"])
+        self.max_new_tokens = kwargs["max_new_tokens"]
+        self.no_repeat_ngram_size = kwargs["no_repeat_ngram_size"] or 0
+        if model is not None:
+            self.start_token_id = model.config.decoder_start_token_id
+            self.eos_token_id = model.config.eos_token_id
+
+    def _start(self, prompt):
+        """Encode the prompt and return the decoding state"""
+        inputs = self.tokenizer(
+            prompt,
+            return_tensors="tf",
+            truncation=True,
+            max_length=self.max_input_length
+        )
+        encoder_outputs = self.model.get_encoder()(
+            input_ids=inputs["input_ids"],
+            attention_mask=inputs["attention_mask"]
+        )
+        return {
+            "inputs": inputs,
+            "input_length": int(inputs["input_ids"].shape[1]),
+            "encoder_outputs": encoder_outputs,
+            "past_key_values": None,
+        }
+
+    def _step(self, state, token):
+        """Feed one decoder token and return the next-token logits as a numpy vector"""
+        outputs = self.model(
+            encoder_outputs=state["encoder_outputs"],
+            attention_mask=state["inputs"]["attention_mask"],
+            decoder_input_ids=tf.constant([[token]]),
+            past_key_values=state["past_key_values"],
+            use_cache=True
+        )
+        state["past_key_values"] = outputs.past_key_values
+        return outputs.logits[0, -1].numpy()
+
+    def start(self, prompt):
+        """Encode the prompt; the state's "input_length" is its token count after truncation"""
+        return self._start(prompt)
+
+    def stream(self, prompt, state=None):
+        """Yield (token id, log-prob) pairs for the answer to prompt, stopping at EOS.
+
+        state is what start(prompt) returned, if the caller already encoded the prompt.
+        """
+        state = state or self._start(prompt)
+        tokens = [self.start_token_id]
+        for _ in range(self.max_new_tokens):
+            logits = self._step(state, tokens[-1]).astype(np.float64)
+            for token in banned_ngram_tokens(tokens, self.no_repeat_ngram_size):
+                logits[token] = -np.inf
+
+            logprobs = logits - np.logaddexp.reduce(logits)
+            token = int(np.argmax(logprobs))
+            tokens.append(token)
+            yield token, float(logprobs[token])
+            if token == self.eos_token_id:
+                return
+
+    def stream_text(self, prompt, state=None):
+        """Yield (answer text so far, token log-probs so far) after every token"""
+        ids, logprobs = [], []
+        for token, logprob in self.stream(prompt, state):
+            ids.append(token)
+            logprobs.append(logprob)
+            yield self.tokenizer.decode(ids, skip_special_tokens=True), logprobs
+
+    def generate(self, prompts):
+        """Decode each prompt in full; the result is shaped like generate()'s output"""
+        decoded, input_lengths = [], []
+        for prompt in prompts:
+            state = self._start(prompt)
+            input_lengths.append(state["input_length"])
+            decoded.append(list(self.stream(prompt, state)))
+        length = 1 + max((len(steps) for steps in decoded), default=0)
+        sequences = np.full((len(prompts), length), self.tokenizer.pad_token_id, dtype=np.int64)
+        transition_scores = np.zeros((len(prompts), length - 1), dtype=np.float32)
+        sequences[:, 0] = self.start_token_id
+        for i, steps in enumerate(decoded):
+            for j, (token, logprob) in enumerate(steps):
+                sequences[i, j + 1] = token
+                transition_scores[i, j] = logprob
+        return SimpleNamespace(sequences=sequences, transition_scores=transition_scores, input_lengths=input_lengths)
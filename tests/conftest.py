@@ -0,0 +1,111 @@
+import copy
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def make_config(**overrides):
+    """app_config.config with every index and knowledge-base check off, then overrides applied"""
+    from app_config import config
+
+    test_config = copy.deepcopy(config)
+    test_config["warmup_on_start"] = False
+    for section in ("retrieval", "curated", "graph", "timeline", "batching"):
+        test_config[section]["enabled"] = False
+    test_config["verification"]["use_knowledge_base"] = False
+    for key, value in overrides.items():
+        if isinstance(value, dict):
+            test_config[key].update(value)
+        else:
+            test_config[key] = value
+    return test_config
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    """Modules resolve data/... paths against the working directory"""
+    monkeypatch.chdir(ROOT)
+
+
+class WordTokenizer:
+    """Whitespace tokenizer with the slice of the transformers API the modules under test use"""
+
+    pad_token_id = 0
+    eos_token_id = 1
+
+    def __init__(self):
+        self.vocab = {"<pad>": 0, "</s>": 1}
+        self.all_special_tokens = ["<pad>", "</s>"]
+
+    def get_vocab(self):
+        return dict(self.vocab)
+
+    def tokenize(self, text):
+        return text.split()
+
+    def _encode(self, text, add_special_tokens=True, truncation=False, max_length=None):
+        ids = [self.vocab.setdefault(word, len(self.vocab)) for word in text.split()]
+        if add_special_tokens:
+            ids.append(self.eos_token_id)
+        if truncation and max_length is not None:
+            ids = ids[:max_length]
+        return ids
+
+    def __call__(self, texts, add_special_tokens=True, truncation=False, max_length=None, return_length=False,
+                 **kwargs):
+        batch = not isinstance(texts, str)
+        ids = [self._encode(text, add_special_tokens, truncation, max_length) for text in (texts if batch else [texts])]
+        encoded = {"input_ids": ids if batch else ids[0]}
+        if return_length:
+            encoded["length"] = [len(row) for row in ids] if batch else len(ids[0])
+        return encoded
+
+    def decode(self, ids, skip_special_tokens=False):
+        words = {i: word for word, i in self.vocab.items()}
+        return " ".join(
+            words[int(i)] for i in ids if not (skip_special_tokens and int(i) in (self.pad_token_id, self.eos_token_id))
+        )
+
+    def batch_decode(self, rows, skip_special_tokens=False):
+        return [self.decode(row, skip_special_tokens) for row in rows]
+
+
+class FakeRuntime:
+    """ModelRuntime stand-in whose generate() answers each "Question: ...\nAnswer:" prompt from a dict"""
+
+    engine = None
+    escalation_rate = 0.0
+
+    def __init__(self, answers=None, default="I don't know.", logprob=-0.1, max_input_length=64):
+        self.tokenizer = WordTokenizer()
+        self.max_input_length = max_input_length
+        self.answers = answers or {}
+        self.default = default
+        self.logprob = logprob
+        self.prompts = []
+        self.decode_counts = {"greedy": 0, "beam": 0}
+
+    def generate(self, prompts):
+        from types import SimpleNamespace
+
+        import numpy as np
+
+        self.prompts.extend(prompts)
+        rows = []
+        for prompt in prompts:
+            question = prompt.split("Question:", 1)[-1].split("\nAnswer:", 1)[0].strip()
+            rows.append(self.tokenizer(self.answers.get(question, self.default))["input_ids"])
+        width = 1 + max(len(row) for row in rows)
+        sequences = np.full((len(rows), width), self.tokenizer.pad_token_id, dtype=np.int64)
+        transition_scores = np.zeros((len(rows), width - 1), dtype=np.float32)
+        for i, row in enumerate(rows):
+            sequences[i, 1:len(row) + 1] = row
+            transition_scores[i, :len(row)] = self.logprob
+        input_lengths = self.tokenizer(
+            prompts, truncation=True, max_length=self.max_input_length, return_length=True
+        )["length"]
+        return SimpleNamespace(sequences=sequences, transition_scores=transition_scores, input_lengths=input_lengths)
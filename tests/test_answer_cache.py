@@ -0,0 +1,51 @@
+from answer_cache import AnswerCache, load_csv_questions, normalize_question
+from conftest import ROOT
+
+
+def test_paraphrases_share_a_normalized_key():
+    assert normalize_question("  Who sentenced  KIMATHI?? ") == "who sentenced kimathi"
+
+
+def test_get_put_and_lru_eviction():
+    cache = AnswerCache(max_size=2)
+    params = {"num_beams": 4}
+    cache.put("a?", params, "A")
+    cache.put("b?", params, "B")
+    assert cache.get("A", params) == "A"
+    cache.put("c?", params, "C")
+    assert cache.get("b", params) is None
+    assert cache.get("a", params) == "A"
+    assert len(cache) == 2
+
+
+def test_generation_params_are_part_of_the_key():
+    cache = AnswerCache()
+    cache.put("q", {"num_beams": 4}, "beam")
+    assert cache.get("q", {"num_beams": 1}) is None
+
+
+def test_ttl_expires_entries():
+    cache = AnswerCache(ttl_seconds=0)
+    cache.put("q", {}, "answer")
+    assert cache.get("q", {}) is None
+
+
+def test_warm_answers_only_uncached_questions_once():
+    cache = AnswerCache()
+    cache.put("cached", {}, "old")
+    calls = []
+
+    def answer_batch(batch):
+        calls.append(list(batch))
+        return [question.upper() for question in batch]
+
+    warmed = cache.warm(["cached", "new", "New!", "other"], answer_batch, {}, batch_size=1)
+    assert warmed == 2
+    assert calls == [["new"], ["other"]]
+    assert cache.get("new", {}) == "NEW"
+
+
+def test_load_csv_questions_strips_the_prefix():
+    questions = load_csv_questions(ROOT / "data/qa_pairs/manual/kimathi_qa_text2text.csv")
+    assert len(questions) == 342
+    assert not questions[0].lower().startswith("question:")
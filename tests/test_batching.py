@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from batching import MicroBatcher
+from conftest import make_config
+from inference import AnswerService, generate_batch_limit
+
+
+def test_concurrent_items_share_a_batch_and_keep_order():
+    batches = []
+
+    def process(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=200)
+    results = [None] * 4
+
+    def call(i):
+        results[i] = batcher(i)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+    assert results == [0, 2, 4, 6]
+    assert sum(len(batch) for batch in batches) == 4
+    assert max(len(batch) for batch in batches) <= 4
+
+
+def test_batch_errors_reach_every_caller():
+    def fail(items):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(fail, max_batch_size=2, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        batcher(1)
+    batcher.close()
+
+
+def test_every_accepted_item_is_answered_when_closing_concurrently():
+    batcher = MicroBatcher(lambda items: list(items), max_batch_size=4, max_wait_ms=1)
+    futures, rejected = [], []
+
+    def submit_many():
+        for i in range(200):
+            try:
+                futures.append(batcher.submit(i))
+            except RuntimeError:
+                rejected.append(i)
+
+    thread = threading.Thread(target=submit_many)
+    thread.start()
+    batcher.close()
+    thread.join()
+    assert all(future.result(timeout=1) == i for i, future in enumerate(futures))
+    assert len(futures) + len(rejected) == 200
+
+
+def test_batch_size_is_clamped_to_the_largest_xla_bucket():
+    config = make_config(use_xla=True, xla_batch_buckets=[1, 2, 4], batching={"enabled": True, "max_batch_size": 16})
+    assert generate_batch_limit(config, 16) == 4
+    assert generate_batch_limit(make_config(use_xla=False), 16) == 16
+    service = AnswerService(config)
+    assert service.batcher.max_batch_size == 4
+    service.batcher.close()
@@ -0,0 +1,52 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from benchmark import bench_serving, compare, flatten, latency_summary
+from conftest import FakeRuntime, make_config
+from inference import AnswerService, chat_with_model
+
+
+@pytest.fixture
+def fake_app(monkeypatch):
+    """The parts of app.py bench_serving uses, with the curated lookup on and a fake model"""
+    config = make_config(curated={"enabled": True})
+    service = AnswerService(config, runtime=FakeRuntime(default="A model answer."))
+    app = SimpleNamespace(
+        config=config, service=service, runtime=service.runtime, retriever=None,
+        chat_with_model=chat_with_model, gradio_response=service.respond,
+    )
+    monkeypatch.setitem(sys.modules, "app", app)
+    return app
+
+
+def test_lookups_are_off_unless_asked_for(fake_app):
+    result = bench_serving("gradio", limit=5, warmup=0)
+    assert result["use_lookups"] is False
+    assert fake_app.service.curated_answers is None
+    assert len(fake_app.runtime.prompts) == 5
+
+
+def test_lookups_can_be_left_on(fake_app):
+    result = bench_serving("gradio", limit=5, warmup=0, use_lookups=True)
+    assert result["use_lookups"] is True
+    # Every replayed question is a curated one
+    assert fake_app.runtime.prompts == []
+
+
+def test_gradio_tokens_exclude_the_response_formatting(fake_app):
+    fake_app.runtime.logprob = -5.0  # unconfident, so every answer gets the banner and footer
+    chat = bench_serving("chat", limit=5, warmup=0)
+    gradio = bench_serving("gradio", limit=5, warmup=0)
+    assert gradio["generated_tokens"] == chat["generated_tokens"] > 0
+
+
+def test_latency_summary_and_compare(capsys):
+    summary = latency_summary([0.01, 0.02, 0.03])
+    assert summary["p50_ms"] == pytest.approx(20)
+    assert latency_summary([]) == {}
+    assert flatten({"a": {"b": 1, "c": True}, "d": "x"}) == {"a.b": 1}
+
+    compare({"results": {"latency": {"p50_ms": 30.0}}}, {"results": {"latency": {"p50_ms": 20.0}}})
+    assert "+50.0%" in capsys.readouterr().out
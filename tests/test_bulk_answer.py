@@ -0,0 +1,53 @@
+import json
+
+from bulk_answer import answer_records, answered_keys, bulk_config, merge_parts, read_questions, record_key
+from conftest import FakeRuntime, WordTokenizer, make_config
+from inference import AnswerService
+
+
+def write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+
+
+def test_prompts_are_built_and_encoded_once(tmp_path):
+    encoded = []
+
+    class CountingTokenizer(WordTokenizer):
+        def __call__(self, texts, *args, **kwargs):
+            encoded.extend(text for text in ([texts] if isinstance(texts, str) else texts) if "Question:" in text)
+            return super().__call__(texts, *args, **kwargs)
+
+    runtime = FakeRuntime(answers={"Who tried Kimathi?": "O'Connor"})
+    runtime.tokenizer = CountingTokenizer()
+    service = AnswerService(bulk_config(make_config()), runtime=runtime)
+    records = [
+        {"index": i, "id": i, "question": question}
+        for i, question in enumerate(["Who tried Kimathi in the Supreme Court at Nyeri?", "Who tried Kimathi?"])
+    ]
+    answer_records(service, records, batch_size=1, part_path=tmp_path / "out.part0", model_only=True)
+
+    # Shortest prompt first, and each prompt only in generate()'s own encoding
+    assert runtime.prompts == [
+        f"Question: {records[1]['question']}\nAnswer:", f"Question: {records[0]['question']}\nAnswer:"
+    ]
+    assert sorted(encoded) == sorted(runtime.prompts)
+    answers = {record["index"]: record["answer"] for record in map(json.loads, open(tmp_path / "out.part0"))}
+    assert answers[1] == "O'Connor"
+
+
+def test_resume_skips_only_answers_to_the_same_question(tmp_path):
+    input_path, output_path = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+    write_jsonl(input_path, [{"id": "a", "question": "Who tried Kimathi?"}, {"id": "b", "question": "When?"}])
+    write_jsonl(output_path, [
+        {"index": 0, "id": "a", "question": "Who tried Kimathi?", "answer": "O'Connor"},
+        # Written before the second question was edited
+        {"index": 1, "id": "b", "question": "Where?", "answer": "Nyeri"},
+    ])
+    inputs = read_questions(input_path)
+    done = answered_keys(output_path)
+    assert [record["question"] for record in inputs if record_key(record) not in done] == ["When?"]
+
+    write_jsonl(tmp_path / "answers.jsonl.part0", [{"index": 1, "id": "b", "question": "When?", "answer": "1956"}])
+    assert merge_parts(output_path, inputs) == 2
+    assert [record["answer"] for record in map(json.loads, open(output_path))] == ["O'Connor", "1956"]
+    assert not (tmp_path / "answers.jsonl.part0").exists()
@@ -0,0 +1,30 @@
+import math
+from types import SimpleNamespace
+
+import numpy as np
+
+from inference import is_confident, sequence_confidence, token_logprobs
+
+
+class Tokenizer:
+    pad_token_id = 0
+
+
+def test_token_logprobs_reads_transition_scores_and_drops_padding():
+    outputs = SimpleNamespace(
+        sequences=np.array([[0, 5, 6, 1], [0, 7, 1, 0]]),
+        transition_scores=np.array([[-0.1, -0.2, -0.3], [-0.5, -0.6, 0.0]]),
+    )
+    logprobs = token_logprobs(outputs, runtime=None, tokenizer=Tokenizer())
+    assert np.allclose(logprobs[0], [-0.1, -0.2, -0.3])
+    assert np.allclose(logprobs[1], [-0.5, -0.6])
+
+
+def test_sequence_confidence_is_geometric_mean_probability():
+    assert math.isclose(sequence_confidence([math.log(0.5), math.log(0.5)]), 0.5)
+    assert sequence_confidence([]) == 0.0
+
+
+def test_is_confident_threshold():
+    assert is_confident([math.log(0.9)] * 3)
+    assert not is_confident([math.log(0.2)] * 3)
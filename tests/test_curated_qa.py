@@ -0,0 +1,73 @@
+import pytest
+
+from app_config import config
+from conftest import ROOT, make_config
+from curated_qa import (
+    CuratedAnswers, build_curated_index, calibrate_threshold, index_is_current, load_paraphrases, same_question
+)
+from inference import AnswerService
+
+QA_CSV = "data/qa_pairs/manual/kimathi_qa_text2text.csv"
+PARAPHRASES = "data/qa_pairs/manual/curated_paraphrases.csv"
+
+
+@pytest.fixture(scope="module")
+def answers(tmp_path_factory):
+    index_dir = tmp_path_factory.mktemp("curated")
+    build_curated_index(ROOT / QA_CSV, index_dir)
+    return CuratedAnswers(index_dir, threshold=config["curated"]["threshold"])
+
+
+def test_exact_and_paraphrased_questions_are_answered(answers):
+    assert "O'Connor" in answers.lookup("Who presided over Dedan Kimathi's trial?")
+    assert "O'Connor" in answers.lookup("who presided over kimathis trial")
+
+
+@pytest.mark.parametrize("question, curated", [
+    ("Who commanded Divisions 8 and 9 of the Gikuyu Ireghi Army?", "Who commanded Divisions 6 and 7 of the Gikuyu Ireghi Army?"),
+    ("What warning did Kimathi receive on February 17, 1956?", "What warning did Kimathi receive on February 17, 1954?"),
+    ("Did Kimathi not admit to direct links?", "Did Kimathi admit to direct links?"),
+    ("Didn't Kimathi admit to direct links?", "Did Kimathi admit to direct links?"),
+    ("Who were the assessors selected for Kimathi's appeal?", "Who were the assessors selected for Kimathi's trial?"),
+    ("Who was the third witness?", "Who was the second witness?"),
+])
+def test_changed_numbers_negations_or_subjects_are_different_questions(question, curated):
+    assert not same_question(question, curated)
+
+
+def test_near_misses_are_not_answered(answers):
+    # Each scores 0.8 or more on character n-grams alone
+    for question in (
+        "What warning did Kimathi receive on February 17 1956?",
+        "Did none of the arresting officers hear Kimathi say he wished to surrender?",
+        "Who were the assessors selected for Kimathi's appeal?",
+    ):
+        assert answers.search(question)[1] >= 0.8
+        assert answers.lookup(question) is None
+
+
+def test_configured_threshold_gives_no_wrong_answers_on_held_out_paraphrases(answers):
+    paraphrases = load_paraphrases(PARAPHRASES)
+    threshold, _, _ = calibrate_threshold(answers, paraphrases)
+    assert config["curated"]["threshold"] >= threshold
+    for question, expected in paraphrases:
+        answer = answers.lookup(question)
+        if answer is not None:
+            assert expected is not None
+            assert answers.pairs[answers.match(question)[0]]["question"] == expected
+
+
+def test_index_is_rebuilt_when_the_csv_changes(tmp_path):
+    csv_path = tmp_path / "qa.csv"
+    csv_path.write_text("input_text,target_text\nquestion: Who tried Kimathi?,O'Connor\n", encoding="utf-8")
+    index_dir = tmp_path / "index"
+    assert not index_is_current(csv_path, index_dir)
+    build_curated_index(csv_path, index_dir)
+    assert index_is_current(csv_path, index_dir)
+
+    csv_path.write_text(
+        "input_text,target_text\nquestion: Who tried Kimathi?,Chief Justice O'Connor\n", encoding="utf-8"
+    )
+    assert not index_is_current(csv_path, index_dir)
+    service = AnswerService(make_config(curated={"enabled": True, "csv": str(csv_path), "index_dir": str(index_dir)}))
+    assert service.curated_lookup("Who tried Kimathi?") == "Chief Justice O'Connor"
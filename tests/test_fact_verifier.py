@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from conftest import make_config
+from fact_verifier import FactVerifier
+from inference import AnswerService
+
+CONTEXTS = [
+    ("Kimathi was tried before Justice O'Connor at Nyeri.", ["Kimathi", "O'Connor", "Nyeri"]),
+    ("Kimathi hid in the Aberdare forest with Mathenge.", ["Kimathi", "Aberdare", "Mathenge"]),
+    ("Kimathi was captured by Ndirangu.", ["Kimathi", "Ndirangu"]),
+    ("Kimathi wrote letters.", ["Kimathi"]),
+    ("Churchill spoke in London.", ["Churchill", "London"]),
+]
+
+
+@pytest.fixture
+def verifier(tmp_path):
+    entities = tmp_path / "entities"
+    entities.mkdir()
+    records = [{"text": text, "context": context} for context, texts in CONTEXTS for text in texts]
+    (entities / "person.json").write_text(json.dumps(records), encoding="utf-8")
+    # "Kimathi" is in 4 of 5 contexts: a hub at a 50% share
+    return FactVerifier(tmp_path, compiled_dir=None, max_context_share=0.5)
+
+
+def test_hub_entities_are_detected(verifier):
+    hubs = {" ".join(tokens) for tokens, phrase_id in verifier.phrase_ids.items() if phrase_id in verifier.hubs}
+    assert hubs == {"kimathi"}
+
+
+def test_answer_linked_to_a_question_entity_is_supported(verifier):
+    assert verifier.verify("Who tried Kimathi at Nyeri?", "Justice O'Connor") is True
+
+
+def test_answer_unrelated_to_the_question_entities_is_rejected(verifier):
+    assert verifier.verify("Who tried Kimathi at Nyeri?", "Churchill did, in London.") is False
+
+
+def test_a_hub_alone_is_not_evidence(verifier):
+    # Only "Kimathi" in the question: the KB has nothing to check against
+    assert verifier.verify("Who sentenced Kimathi?", "Winston Churchill sentenced him to death in London.") is None
+    assert verifier.verify("Did Kimathi own a cat?", "Kimathi owned a cat named Mathenge") is None
+
+
+def test_abstaining_is_accepted(verifier):
+    assert verifier.verify("Who tried Kimathi at Nyeri?", "I don't know.") is True
+    assert verifier.verify("Who tried Kimathi at Nyeri?", "Unknown") is True
+
+
+def test_an_answer_mentioning_unknown_is_still_checked(verifier):
+    answer = "Churchill, whose role was unknown until London."
+    assert verifier.verify("Who tried Kimathi at Nyeri?", answer) is False
+
+
+@pytest.fixture
+def service():
+    return AnswerService(make_config(verification={"use_knowledge_base": True}))
+
+
+@pytest.mark.parametrize("question, answer", [
+    ("Who sentenced Kimathi?", "Winston Churchill sentenced him to death in London."),
+    ("Who sentenced Kimathi?", "Jomo Kenyatta sentenced Kimathi in Nairobi in 1999."),
+])
+def test_known_false_positives_are_rejected(service, question, answer):
+    assert service.verify_answer(question, answer) is False
+
+
+def test_short_answer_without_kb_evidence_is_not_verified(service):
+    # Only the hub "Kimathi" in the question: nothing to check, so nothing is claimed either way
+    assert service.verify_answer("Did Kimathi own a cat?", "Kimathi owned a cat named Nairobi") is None
+    confident, verified = service.assess("Did Kimathi own a cat?", "Yes, a cat.", [-0.01, -0.01])
+    assert verified is None
+    assert service.format_response("Did Kimathi own a cat?", "Yes, a cat.", [-0.01, -0.01]) == " Yes, a cat."
+
+
+def test_curated_keyword_checks_run_first(service):
+    assert service.verify_answer("Who sentenced Kimathi?", "Justice O'Connor sentenced him to death.") is True
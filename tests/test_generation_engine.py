@@ -0,0 +1,23 @@
+import pytest
+
+from conftest import make_config
+from inference import AnswerService
+
+
+def test_xla_and_eager_answers_do_not_share_cache_entries():
+    eager = AnswerService(make_config(use_xla=False))
+    xla = AnswerService(make_config(use_xla=True))
+    assert eager.answer_cache.key("q", eager.cache_params) != xla.answer_cache.key("q", xla.cache_params)
+
+
+def test_buckets_round_up_and_cap():
+    pytest.importorskip("tensorflow")
+    from generation_engine import GenerationEngine
+
+    engine = GenerationEngine.__new__(GenerationEngine)
+    engine.length_buckets = [16, 32, 64]
+    engine.batch_buckets = [1, 2, 4, 8]
+    assert engine.length_bucket(10) == 16
+    assert engine.length_bucket(33) == 64
+    assert engine.length_bucket(100) == 64
+    assert engine.batch_bucket(3) == 4
@@ -0,0 +1,62 @@
+import pytest
+
+from app_config import config
+from conftest import make_config
+from graph_store import (
+    RelationshipGraph, answer_connection_question, build_graph_store, connection_subject, mentions_name
+)
+from inference import AnswerService
+
+
+def test_graph_lookup_is_off_by_default():
+    assert config["graph"]["enabled"] is False
+
+
+@pytest.fixture
+def graph_dir(tmp_path):
+    def person(text, times=2):
+        return [{"text": text}] * times
+
+    entities = {
+        "PERSON": person("Dedan Kimathi") + person("Kimathi") + person("Wambararia Kimathi")
+                  + person("Stanley Mathenge") + person("the fate of") + person("Ian Henderson", 1),
+        "ORG": person("Mau Mau"),
+        "DATE": person("1956"),
+    }
+    edges = [
+        {"source": "Kimathi", "target": "Mau Mau", "relation": "nsubj"},
+        {"source": "Kimathi", "target": "Stanley Mathenge", "relation": "conj"},
+        {"source": "Kimathi", "target": "the fate of", "relation": "pobj", "count": 5},
+        {"source": "Kimathi", "target": "Ian Henderson", "relation": "pobj", "count": 5},
+        {"source": "Kimathi", "target": "1956", "relation": "pobj", "count": 5},
+    ]
+    build_graph_store(edges, entities, tmp_path)
+    return tmp_path
+
+
+def test_fragments_dates_and_rare_names_are_not_listed(graph_dir):
+    graph = RelationshipGraph(graph_dir, min_mentions=2)
+    assert [node for node, _ in graph.top_related("Kimathi")] == ["org:mau mau", "person:stanley mathenge"]
+    # They still connect the graph
+    assert "person:the fate of" in graph.neighbours("Kimathi")
+
+
+def test_leading_articles_are_dropped_from_the_subject(graph_dir):
+    assert connection_subject("Who is connected to the Mau Mau?") == "Mau Mau"
+    assert connection_subject("What was associated with an oath?") == "oath"
+    answer = answer_connection_question(RelationshipGraph(graph_dir), "Who was connected with the Mau Mau?")
+    assert answer == "In the trial sources, Mau Mau is most often connected with Dedan Kimathi."
+
+
+def test_names_must_appear_as_whole_words():
+    assert mentions_name("Stanley Mathenge, his deputy.", "stanley mathenge")
+    assert not mentions_name("The Mau Mauists", "mau mau")
+    assert not mentions_name("He was calm", "al")
+
+
+def test_verification_needs_a_whole_neighbour_name(graph_dir):
+    service = AnswerService(make_config(graph={"enabled": True, "graph_dir": str(graph_dir)}))
+    question = "Who was connected to Kimathi?"
+    assert service.verify_answer(question, "Stanley Mathenge and the Mau Mau.")
+    # "mau mau" occurs only inside another word
+    assert not service.verify_answer(question, "The Mau Mauists of the forest.")
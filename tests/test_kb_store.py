@@ -0,0 +1,73 @@
+import json
+
+from fact_verifier import FactVerifier
+from kb_store import CompiledStore, CompiledStoreWriter, KnowledgeBase, convert_json_kb
+
+SHARED = "Kimathi was tried before Justice O'Connor at Nyeri."
+ENTITIES = [
+    {"text": "Kimathi", "source": "a", "context": SHARED},
+    {"text": "O'Connor", "source": "a", "context": SHARED},
+    {"text": "Nyeri", "source": "b", "context": SHARED},
+    {"text": "Mathenge", "source": "b", "context": "Mathenge hid in the Aberdare forest."},
+    {"text": "Churchill", "source": "b", "context": "Churchill spoke in London."},
+]
+# The same sentence as an entity context and a timeline event: one context, not two
+TIMELINE = [{"date": "November 1956", "event": SHARED, "source": "a"}]
+NETWORK = [
+    {"source": "Mathenge", "target": "Kimathi", "relation": "ally", "context": "", "count": 3},
+    {"source": "Churchill", "target": "Kimathi", "relation": "enemy", "context": ""},
+]
+
+
+def write_json_kb(kb_dir):
+    for name, records in (
+        ("entities/person.json", ENTITIES),
+        ("timelines/kimathi_timeline.json", TIMELINE),
+        ("relationships/kimathi_network.json", NETWORK),
+    ):
+        path = kb_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(records), encoding="utf-8")
+
+
+def test_store_round_trip_interns_each_string_once(tmp_path):
+    writer = CompiledStoreWriter()
+    writer.add_table("person", ENTITIES, ("text", "context"))
+    writer.save(tmp_path)
+
+    store = CompiledStore(tmp_path)
+    table = store.table("person")
+    assert len(table) == len(ENTITIES)
+    assert list(table) == [{"text": e["text"], "context": e["context"]} for e in ENTITIES]
+    assert store.manifest["strings"] == len({e["text"] for e in ENTITIES} | {e["context"] for e in ENTITIES})
+
+
+def test_empty_store_can_be_read(tmp_path):
+    writer = CompiledStoreWriter()
+    writer.add_table("person", [], ("text",))
+    writer.save(tmp_path)
+    assert len(CompiledStore(tmp_path).table("person")) == 0
+
+
+def test_compiled_and_json_loaders_index_the_same_kb(tmp_path):
+    write_json_kb(tmp_path)
+    convert_json_kb(tmp_path, tmp_path / "compiled")
+    assert KnowledgeBase.exists(tmp_path / "compiled")
+    # Edge counts survive compilation; edges written without one count once
+    edges = KnowledgeBase(tmp_path / "compiled").relationships()
+    assert list(edges) == [{"count": 1, **edge} for edge in NETWORK]
+    assert edges.values("count") == [3, 1]
+
+    from_json = FactVerifier(tmp_path, compiled_dir=None, max_context_share=0.5)
+    compiled = FactVerifier(tmp_path, compiled_dir=tmp_path / "compiled", max_context_share=0.5)
+
+    assert from_json.num_contexts == compiled.num_contexts == 3
+    assert from_json.phrase_ids == compiled.phrase_ids
+    assert from_json.edges == compiled.edges
+    assert from_json.hubs == compiled.hubs
+    for question, answer in (
+        ("Who tried Kimathi at Nyeri?", "Justice O'Connor"),
+        ("Who tried Kimathi at Nyeri?", "Churchill, in London"),
+        ("Who was Mathenge?", "An ally of Kimathi"),
+    ):
+        assert from_json.verify(question, answer) == compiled.verify(question, answer)
@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+import metrics
+from conftest import FakeRuntime, WordTokenizer, make_config
+from inference import AnswerService, count_truncated
+
+
+def test_stage_and_event_fan_out_to_every_trace_in_a_batch():
+    first, second = metrics.RequestTrace("a"), metrics.RequestTrace("b")
+    with metrics.stage("generate", [first, None, second]):
+        pass
+    metrics.event("truncated_input", [second])
+    assert "generate" in first.stages and "generate" in second.stages
+    assert "truncated_input" not in first.fields
+    assert second.fields["truncated_input"] is True
+
+
+def test_truncation_is_counted_from_the_encoded_lengths():
+    config = make_config(max_input_length=8)
+    traces = [metrics.RequestTrace("a"), metrics.RequestTrace("b")]
+    assert count_truncated([8, 5], config, traces) == 1
+    assert traces[0].fields.get("truncated_input") is True
+    assert "truncated_input" not in traces[1].fields
+
+
+def test_generate_answers_does_not_tokenize_prompts_again():
+    prompts_encoded = []
+
+    class CountingTokenizer(WordTokenizer):
+        def __call__(self, texts, *args, **kwargs):
+            prompts_encoded.extend(text for text in ([texts] if isinstance(texts, str) else texts) if "Question:" in text)
+            return super().__call__(texts, *args, **kwargs)
+
+    runtime = FakeRuntime(max_input_length=4)
+    runtime.tokenizer = CountingTokenizer()
+    service = AnswerService(make_config(max_input_length=4), runtime=runtime)
+    with metrics.request("test") as trace:
+        service.answer_batch(["Who tried Kimathi in 1956?"])
+    assert trace.fields["truncated_input"] is True
+    # Only the encoding generate() runs on (FakeRuntime's own)
+    assert len(prompts_encoded) == 1
+
+
+def test_batched_requests_get_their_own_stage_times_and_events():
+    config = make_config(
+        use_xla=False, max_input_length=8, batching={"enabled": True, "max_batch_size": 2, "max_wait_ms": 200}
+    )
+    service = AnswerService(config, runtime=FakeRuntime(max_input_length=8))
+    traces = {}
+
+    def ask(question):
+        with metrics.request("test") as trace:
+            traces[question] = trace
+            service.answer_question(question)
+
+    questions = ["Who tried him?", "Where was Dedan Kimathi hanged in February 1957?"]
+    threads = [threading.Thread(target=ask, args=(question,)) for question in questions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    service.batcher.close()
+
+    assert service.batcher.batches_run == 1
+    for question in questions:
+        assert {"batched_generate", "prompt", "generate", "decode"} <= set(traces[question].stages)
+    assert "truncated_input" not in traces[questions[0]].fields
+    assert traces[questions[1]].fields["truncated_input"] is True
+
+
+@pytest.fixture
+def client():
+    pytest.importorskip("gradio")
+    from fastapi.testclient import TestClient
+
+    import app
+
+    return TestClient(app.build_app())
+
+
+def test_ready_and_metrics_routes_are_served(client):
+    import app
+
+    app.runtime.ready.clear()
+    assert client.get("/ready").status_code == 503
+    app.runtime.ready.set()
+    assert client.get("/ready").status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "kimathi_stage_seconds" in response.text
@@ -0,0 +1,90 @@
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import ROOT, WordTokenizer, make_config
+from model_runtime import ModelRuntime
+
+
+def test_building_the_service_does_not_import_tensorflow():
+    code = (
+        "import sys\n"
+        "sys.path.insert(0, 'tests')\n"
+        "from conftest import make_config\n"
+        "from inference import AnswerService\n"
+        "AnswerService(make_config())\n"
+        "print(sorted(m for m in ('tensorflow', 'transformers') if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_warmup_sets_ready_once_loaded():
+    runtime = ModelRuntime(make_config())
+    runtime._tokenizer, runtime._model = WordTokenizer(), object()
+    assert runtime.status()["ready"] is False
+    runtime.warmup()
+    assert runtime.status()["ready"] is True
+    assert runtime.status()["error"] is None
+
+
+def test_failed_warmup_is_reported(monkeypatch):
+    def missing(self):
+        raise OSError("no tokenizer files in model/missing")
+
+    monkeypatch.setattr(ModelRuntime, "tokenizer", property(missing))
+    runtime = ModelRuntime(make_config(model_dir="model/missing"))
+    with pytest.raises(OSError):
+        runtime.warmup()
+    status = runtime.status()
+    assert status["ready"] is False
+    assert "model/missing" in status["error"]
+
+
+class FakeEngine:
+    """GenerationEngine stand-in recording where each engine came from"""
+
+    exported = []
+
+    def __init__(self, model, tokenizer, config):
+        self.source, self.config = "model", config
+
+    @classmethod
+    def from_saved(cls, export_dir, tokenizer, config):
+        engine = cls.__new__(cls)
+        engine.source, engine.config = str(export_dir), config
+        return engine
+
+    def warmup(self):
+        pass
+
+    def export(self, export_dir):
+        self.exported.append((str(export_dir), self.config["generation_params"]["num_beams"]))
+
+
+@pytest.fixture
+def fake_engines(monkeypatch):
+    monkeypatch.setitem(sys.modules, "generation_engine", SimpleNamespace(GenerationEngine=FakeEngine))
+    FakeEngine.exported = []
+
+
+def test_greedy_engine_is_loaded_from_its_exported_graph(tmp_path, monkeypatch, fake_engines):
+    (tmp_path / "greedy").mkdir()
+    monkeypatch.setattr(ModelRuntime, "model", property(lambda self: pytest.fail("the Keras model was built")))
+    runtime = ModelRuntime(make_config(use_xla=True, prebuilt_generate_dir=str(tmp_path)))
+    runtime._tokenizer = WordTokenizer()
+    assert runtime.engine.source == str(tmp_path)
+    assert runtime.greedy_engine.source == str(tmp_path / "greedy")
+    assert runtime.greedy_engine.config["generation_params"]["num_beams"] == 1
+
+
+def test_export_saves_the_beam_and_greedy_graphs(tmp_path, fake_engines):
+    config = make_config(use_xla=True, prebuilt_generate_dir=str(tmp_path))
+    runtime = ModelRuntime(config)
+    runtime._tokenizer, runtime._model = WordTokenizer(), object()
+    runtime.export_generate()
+    assert FakeEngine.exported == [
+        (str(tmp_path), config["generation_params"]["num_beams"]), (str(tmp_path / "greedy"), 1)
+    ]
@@ -0,0 +1,52 @@
+import pytest
+
+for module in ("pdfplumber", "pytesseract", "pdf2image", "tqdm"):
+    pytest.importorskip(module)
+
+from data.preprocesssing import preprocessing  # noqa: E402
+
+
+def test_serial_ocr_rasterizes_only_uncached_pages(tmp_path, monkeypatch):
+    pdf = tmp_path / "book.pdf"
+    pdf.write_bytes(b"%PDF-1.4 scanned")
+    rasterized = []
+
+    def fake_ocr_page_range(pdf_path, first_page, last_page, dpi=300, ocr_config=preprocessing.OCR_CONFIG):
+        rasterized.extend(range(first_page, last_page + 1))
+        return [(page, f"page {page}") for page in range(first_page, last_page + 1)]
+
+    monkeypatch.setattr(preprocessing, "pdfinfo_from_path", lambda path: {"Pages": 6})
+    monkeypatch.setattr(preprocessing, "ocr_page_range", fake_ocr_page_range)
+    processor = preprocessing.PDFProcessor(
+        output_dir=tmp_path / "out", ocr_workers=1, pages_per_task=4, ocr_cache_dir=tmp_path / "cache"
+    )
+
+    text = processor.extract_text_from_scanned_pdf(str(pdf))
+    assert text == "\n\n".join(f"page {page}" for page in range(1, 7))
+    assert rasterized == [1, 2, 3, 4, 5, 6]
+
+    cache_dir = processor._page_cache_dir(str(pdf), 300)
+    assert not list(cache_dir.glob("*.tmp"))
+    (cache_dir / "page_0003.txt").unlink()
+    rasterized.clear()
+    assert processor.extract_text_from_scanned_pdf(str(pdf)) == text
+    assert rasterized == [3]
+
+
+def test_interrupted_page_write_is_not_cached(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+
+    def page_path(page):
+        return cache_dir / f"page_{page:04d}.txt"
+
+    class Interrupted(Exception):
+        pass
+
+    def fail_replace(src, dst):
+        raise Interrupted
+
+    monkeypatch.setattr(preprocessing.os, "replace", fail_replace)
+    with pytest.raises(Interrupted):
+        preprocessing.PDFProcessor._write_pages([[(1, "page 1")]], page_path, progress=None)
+    assert not page_path(1).exists()
@@ -0,0 +1,121 @@
+import json
+
+import pytest
+
+
+def write_sections(root, book, sections):
+    book_dir = root / "data" / "cleaned_text" / f"{book}_cleaned"
+    book_dir.mkdir(parents=True, exist_ok=True)
+    for i, text in enumerate(sections, start=1):
+        (book_dir / f"section_{i:03d}.txt").write_text(text, encoding="utf-8")
+
+
+def test_knowledge_base_stage_parses_through_the_extraction_runner(tmp_path, monkeypatch):
+    spacy = pytest.importorskip("spacy")
+    pytest.importorskip("tqdm")
+    from data.preprocesssing import extraction_runner, pipeline
+
+    write_sections(tmp_path, "trial", [
+        "Kimathi was captured on 21 October 1956 near Nyeri.",
+        "He was hanged on 18 February 1957.",
+    ])
+    monkeypatch.chdir(tmp_path)
+    nlp = spacy.blank("en")
+    # Stands in for the parser's sentence boundaries, which the runner keeps enabled
+    nlp.add_pipe("sentencizer", name="parser")
+    monkeypatch.setattr(extraction_runner, "load_nlp", lambda model=None: nlp)
+    parsed = []
+    parse = extraction_runner.ExtractionRunner.parse
+
+    def counting_parse(self, sections):
+        for doc, context in parse(self, sections):
+            parsed.append(context)
+            yield doc, context
+
+    monkeypatch.setattr(extraction_runner.ExtractionRunner, "parse", counting_parse)
+
+    pipeline.Pipeline().run_knowledge_base()
+    assert len(parsed) == 2
+    with open("data/knowledge_base/timelines/kimathi_timeline.json", encoding="utf-8") as f:
+        assert {event["date"] for event in json.load(f)} >= {"21 October 1956", "18 February 1957"}
+
+    # Unchanged sections come from the section cache, not the parser
+    pipeline.Pipeline(force=True).run_knowledge_base()
+    assert len(parsed) == 2
+
+    # Compiled stores are outputs too: losing one makes the stage stale
+    manifest = pipeline.BuildManifest()
+    outputs = manifest.entries["knowledge_base"]["all"]["outputs"]
+    for name in ("entities", "relationships", "timelines", "graph", "timeline_index"):
+        assert any(path.startswith(f"data/knowledge_base/compiled/{name}/") for path in outputs)
+    next((tmp_path / "data/knowledge_base/compiled/graph").iterdir()).unlink()
+    pipeline.Pipeline().run_knowledge_base()
+    assert len(parsed) == 2
+    assert pipeline.Pipeline()._fresh(
+        "knowledge_base", "all", pipeline.Pipeline()._section_inputs(), pipeline.code_version("knowledge_base")
+    )
+
+
+def test_manifest_is_fresh_until_inputs_code_or_outputs_change(tmp_path):
+    from data.preprocesssing.pipeline import BuildManifest, code_version
+
+    output = tmp_path / "book.txt"
+    output.write_text("cleaned", encoding="utf-8")
+    manifest = BuildManifest(tmp_path / "manifest.json")
+    code = code_version("clean")
+    manifest.record("clean", "book", {"book.pdf": "abc"}, code, [output])
+    manifest.save()
+
+    reloaded = BuildManifest(tmp_path / "manifest.json")
+    assert reloaded.is_fresh("clean", "book", {"book.pdf": "abc"}, code)
+    assert not reloaded.is_fresh("clean", "book", {"book.pdf": "def"}, code)
+    assert not reloaded.is_fresh("clean", "book", {"book.pdf": "abc"}, code_version("themes"))
+    assert not reloaded.is_fresh("clean", "other", {"book.pdf": "abc"}, code)
+
+    output.write_text("edited by hand", encoding="utf-8")
+    assert not reloaded.is_fresh("clean", "book", {"book.pdf": "abc"}, code)
+    output.unlink()
+    assert not reloaded.is_fresh("clean", "book", {"book.pdf": "abc"}, code)
+
+
+def test_section_cache_is_keyed_by_text_label_and_code(tmp_path):
+    from data.preprocesssing.pipeline import SectionCache
+
+    cache = SectionCache("knowledge_base", "v1", cache_dir=tmp_path)
+    assert cache.get("Kimathi was captured.", "trial") is None
+    cache.put("Kimathi was captured.", "trial", {"events": [1]})
+    assert cache.get("Kimathi was captured.", "trial") == {"events": [1]}
+    assert cache.get("Kimathi was captured.", "other_book") is None
+    assert cache.get("Kimathi was hanged.", "trial") is None
+    assert SectionCache("knowledge_base", "v2", cache_dir=tmp_path).get("Kimathi was captured.", "trial") is None
+
+
+def test_book_sections_are_grouped_in_order(tmp_path):
+    from data.preprocesssing.pipeline import iter_book_sections
+
+    write_sections(tmp_path, "b_book", ["third"])
+    write_sections(tmp_path, "a_book", ["first", "second"])
+    books = dict(iter_book_sections(tmp_path / "data" / "cleaned_text"))
+    assert list(books) == ["a_book_cleaned", "b_book_cleaned"]
+    assert [text for _, text in books["a_book_cleaned"]] == ["first", "second"]
+
+
+def test_units_with_errors_are_never_fresh(tmp_path):
+    from data.preprocesssing.pipeline import BuildManifest
+
+    output = tmp_path / "book_qa.json"
+    output.write_text("[]", encoding="utf-8")
+    manifest = BuildManifest(tmp_path / "manifest.json")
+    manifest.record("qa", "book", {"a": "1"}, "code", [output], errors={"a": "generate() failed"})
+    assert not manifest.is_fresh("qa", "book", {"a": "1"}, "code")
+    manifest.record("qa", "book", {"a": "1"}, "code", [output])
+    assert manifest.is_fresh("qa", "book", {"a": "1"}, "code")
+
+
+def test_no_stage_arguments_run_every_stage():
+    from data.preprocesssing.pipeline import STAGES, parse_args
+
+    assert parse_args([]).stages == list(STAGES)
+    assert parse_args(["clean", "qa"]).stages == ["clean", "qa"]
+    with pytest.raises(SystemExit):
+        parse_args(["cleam"])
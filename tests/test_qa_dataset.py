@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from conftest import WordTokenizer
+from qa_dataset import TokenizedQA, build_token_cache, load_qa_rows, notebook_max_lengths, train_test_split_indices
+
+
+def write_csv(path, rows):
+    path.write_text(
+        "input_text,target_text\n" + "".join(f"question: {q},{a}\n" for q, a in rows), encoding="utf-8"
+    )
+
+
+def test_split_is_sklearns_train_test_split():
+    train, test = train_test_split_indices(342)
+    assert len(test) == 69  # ceil(0.2 * 342)
+    permutation = np.random.RandomState(42).permutation(342)
+    assert list(test) == list(permutation[:69]) and list(train) == list(permutation[69:])
+
+    model_selection = pytest.importorskip("sklearn.model_selection")
+    expected_train, expected_test = model_selection.train_test_split(
+        np.arange(342), test_size=0.2, random_state=42
+    )
+    assert list(train) == list(expected_train) and list(test) == list(expected_test)
+
+
+def test_labels_are_truncated_to_the_notebooks_max_target_length(tmp_path):
+    csv_path = tmp_path / "qa.csv"
+    write_csv(csv_path, [("Who tried Kimathi?", "Chief Justice O'Connor"), ("Where?", "Nyeri")])
+    tokenizer = WordTokenizer()
+    _, max_target_length = notebook_max_lengths(tokenizer, load_qa_rows(csv_path))
+    assert max_target_length == 3
+    data = TokenizedQA(build_token_cache(tokenizer, [csv_path], tmp_path / "cache", 64, max_target_length))
+    # Three words plus EOS, cut to the notebook's limit as its preprocess_function did
+    assert len(data.example(0)[1]) == 3
+    assert data.meta["max_target_length"] == 3
+    assert len(data.split()[1]) == 1
+
+
+def test_split_is_refused_when_rows_do_not_line_up_with_the_csv(tmp_path):
+    first, second = tmp_path / "a.csv", tmp_path / "b.csv"
+    write_csv(first, [("Who tried Kimathi?", "O'Connor")])
+    write_csv(second, [("Where?", "Nyeri")])
+    data = TokenizedQA(build_token_cache(WordTokenizer(), [first, second], tmp_path / "cache", 64, 8))
+    with pytest.raises(ValueError):
+        data.split()
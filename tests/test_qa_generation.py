@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+pytest.importorskip("tqdm")
+pytest.importorskip("transformers")
+
+from conftest import WordTokenizer  # noqa: E402
+from data import qa_generation  # noqa: E402
+from data.qa_generation import QAGenerator, load_checkpoints, segment_hash  # noqa: E402
+
+
+class FakeGenerator(QAGenerator):
+    """QAGenerator without a model: every text gets one pair, and texts containing "boom" fail their batch"""
+
+    def __init__(self, output_dir):
+        self.tokenizer = WordTokenizer()
+        self.output_dir = output_dir
+        self.generated = []
+
+    def generate_qa_batch(self, text_chunks, source_label):
+        if any("boom" in text for text in text_chunks):
+            raise RuntimeError("generate() failed")
+        self.generated.extend(text_chunks)
+        return [[{"question": f"What about {text}?", "answer": text, "source": source_label}] for text in text_chunks]
+
+
+def test_checkpoints_are_keyed_by_segment_text(tmp_path):
+    generator = FakeGenerator(tmp_path)
+    checkpoint = tmp_path / "book_qa.part0.jsonl"
+    generator.process_segments_batched("book", [("#001", "alpha"), ("#002", "beta")], checkpoint, batch_size=1)
+
+    # Re-segmenting shifts the keys; only the new text is generated
+    generator.generated.clear()
+    generator.process_segments_batched(
+        "book", [("#001", "intro"), ("#002", "alpha"), ("#003", "beta")], checkpoint, batch_size=1
+    )
+    assert generator.generated == ["intro"]
+    assert {record["hash"] for record in load_checkpoints(tmp_path, "book")} == {
+        segment_hash(text) for text in ("alpha", "beta", "intro")
+    }
+
+
+def test_failed_batches_are_recorded_and_retried(tmp_path):
+    generator = FakeGenerator(tmp_path)
+    checkpoint = tmp_path / "book_qa.part0.jsonl"
+    generator.process_segments_batched("book", [("#001", "alpha"), ("#002", "boom")], checkpoint, batch_size=1)
+
+    records = load_checkpoints(tmp_path, "book")
+    assert [record.get("error") for record in records] == [None, "generate() failed"]
+    assert records[1]["hash"] == segment_hash("boom")
+
+    generator.generated.clear()
+    assert generator.process_segments_batched("book", [("#001", "alpha"), ("#002", "boom")], checkpoint) == 1
+    assert generator.generated == []
+
+
+def test_merge_reads_pairs_by_segment_text(tmp_path, monkeypatch):
+    generator = FakeGenerator(tmp_path)
+    generator.process_segments_batched(
+        "book", [("#001", "alpha"), ("#002", "boom")], tmp_path / "book_qa.part0.jsonl", batch_size=1
+    )
+    monkeypatch.setattr(qa_generation, "group_segments_by_book", lambda: {"book": [("#009", "alpha"), ("#010", "boom")]})
+    qa_generation.merge_checkpoints(tmp_path)
+    with open(tmp_path / "book_qa.json", encoding="utf-8") as f:
+        assert [pair["answer"] for pair in json.load(f)] == ["alpha"]
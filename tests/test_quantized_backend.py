@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("tensorflow")
+
+from conftest import WordTokenizer  # noqa: E402
+from quantized_backend import fidelity_check, token_f1  # noqa: E402
+
+
+class CannedDecoder:
+    """Streams a fixed answer per prompt"""
+
+    def __init__(self, answers):
+        self.tokenizer = WordTokenizer()
+        self.answers = answers
+
+    def stream(self, prompt):
+        for token in self.tokenizer(self.answers[prompt], add_special_tokens=False)["input_ids"]:
+            yield token, 0.0
+
+
+def test_token_f1():
+    assert token_f1("He was hanged", "he was hanged") == 1.0
+    assert token_f1("", "he was hanged") == 0.0
+    assert token_f1("he was tried", "he was hanged") == pytest.approx(2 / 3)
+
+
+def test_fidelity_check_compares_both_decoders_with_the_gold_answers():
+    pairs = [("Who tried Kimathi?", "O'Connor tried him"), ("When?", "1956")]
+    prompts = {"Who tried Kimathi?": "q1", "When?": "q2"}
+    reference = CannedDecoder({"q1": "O'Connor tried him", "q2": "1956"})
+    candidate = CannedDecoder({"q1": "O'Connor tried him", "q2": "1957"})
+    summary, rows = fidelity_check(reference, candidate, pairs, prompt=prompts.get)
+    assert summary["questions"] == 2
+    assert summary["exact_match"] == 0.5
+    assert summary["reference_gold_f1"] == 1.0
+    assert summary["candidate_gold_f1"] == 0.5
+    assert [row["candidate"] for row in rows] == ["O'Connor tried him", "1957"]
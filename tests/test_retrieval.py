@@ -0,0 +1,54 @@
+from conftest import WordTokenizer
+from retrieval import SectionRetriever, build_index, build_prompt, tokenize
+
+
+def write_sections(root, sections):
+    book = root / "book_cleaned"
+    book.mkdir(parents=True)
+    for i, text in enumerate(sections, 1):
+        (book / f"section_{i:03d}.txt").write_text(text, encoding="utf-8")
+    return root
+
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("Who was the judge at the trial?") == ["judge", "trial"]
+
+
+def test_bm25_ranks_the_matching_section_first(tmp_path):
+    cleaned = write_sections(tmp_path / "cleaned", [
+        "Kimathi was captured in the forest by Ndirangu.",
+        "The judge O'Connor sentenced Kimathi to death at Nyeri.",
+        "Rain fell over the Aberdares for many weeks.",
+    ])
+    num_docs, _ = build_index(tmp_path / "index", cleaned)
+    assert num_docs == 3
+    retriever = SectionRetriever(tmp_path / "index")
+    ranked = retriever.search("who sentenced Kimathi to death", top_k=2)
+    assert ranked[0][0] == 1
+    assert "O'Connor" in retriever.passage(ranked[0][0])
+    assert retriever.search("zebra") == []
+
+
+def test_build_prompt_fits_the_token_budget():
+    tokenizer = WordTokenizer()
+    passages = ["one two three four five six seven eight nine ten"] * 3
+    prompt = build_prompt("Who?", passages, tokenizer, max_length=12)
+    assert prompt.startswith("Context: ")
+    assert len(tokenizer(prompt)["input_ids"]) <= 12
+    assert build_prompt("Who?", [], tokenizer, 12) == "Question: Who?\nAnswer:"
+
+
+class SplittingTokenizer(WordTokenizer):
+    """Decodes each token to two words, so re-encoding a decoded passage doubles its length"""
+
+    def decode(self, ids, skip_special_tokens=False):
+        return " ".join(f"{word} {word}" for word in super().decode(ids, skip_special_tokens).split())
+
+
+def test_build_prompt_keeps_the_question_when_re_encoding_grows():
+    tokenizer = SplittingTokenizer()
+    passages = ["one two three four five six seven eight nine ten"] * 3
+    prompt = build_prompt("Who?", passages, tokenizer, max_length=12)
+    assert prompt.startswith("Context: ")
+    assert prompt.endswith("\nQuestion: Who?\nAnswer:")
+    assert len(tokenizer(prompt)["input_ids"]) <= 12
@@ -0,0 +1,78 @@
+from conftest import WordTokenizer
+from data.preprocesssing.segmenter import TokenSegmenter
+from segment_shards import SegmentShard, iter_book_segments, write_shard
+
+
+def make_segmenter(max_tokens, overlap_tokens):
+    # TokenSegmenter() loads the model tokenizer; a word tokenizer keeps counts readable
+    segmenter = TokenSegmenter.__new__(TokenSegmenter)
+    segmenter.tokenizer = WordTokenizer()
+    segmenter.max_tokens = max_tokens
+    segmenter.overlap_tokens = overlap_tokens
+    return segmenter
+
+
+def test_shard_round_trip(tmp_path):
+    segments = [("Kimathi spoke.", 2), ("", 0), ("Ũhuru na mashamba!", 3)]
+    write_shard(segments, tmp_path / "book_cleaned.shard", metadata={"max_tokens": 256})
+
+    shard = SegmentShard(tmp_path / "book_cleaned.shard")
+    assert len(shard) == 3
+    assert list(shard) == [text for text, _ in segments]
+    assert shard[2] == "Ũhuru na mashamba!"
+    assert shard.token_counts() == [2, 0, 3]
+    assert shard.metadata == {"max_tokens": 256}
+
+
+def test_empty_shard(tmp_path):
+    write_shard([], tmp_path / "empty_cleaned.shard")
+    assert list(SegmentShard(tmp_path / "empty_cleaned.shard")) == []
+
+
+def test_books_are_read_from_shards_or_section_files(tmp_path):
+    write_shard([("one", 1), ("two", 1)], tmp_path / "a_cleaned.shard")
+    (tmp_path / "b_cleaned").mkdir()
+    (tmp_path / "b_cleaned" / "section_001.txt").write_text("three", encoding="utf-8")
+    # A shard wins over leftover section files of the same book
+    (tmp_path / "a_cleaned").mkdir()
+    (tmp_path / "a_cleaned" / "section_001.txt").write_text("stale", encoding="utf-8")
+
+    rows = list(iter_book_segments(tmp_path))
+    assert [(book, text) for book, _, text in rows] == [
+        ("a_cleaned", "one"), ("a_cleaned", "two"), ("b_cleaned", "three")
+    ]
+    assert rows[0][1] == "a_cleaned.shard#001"
+
+
+def test_segments_respect_the_token_budget_and_overlap():
+    segmenter = make_segmenter(max_tokens=6, overlap_tokens=2)
+    segments = segmenter.segment("One two three. Four five. Six seven. Eight nine ten.")
+    assert segments == [
+        ("One two three. Four five.", 5),
+        ("Four five. Six seven.", 4),
+        ("Six seven. Eight nine ten.", 5),
+    ]
+    assert all(tokens <= 6 for _, tokens in segments)
+
+
+def test_sentences_longer_than_the_budget_are_split():
+    segmenter = make_segmenter(max_tokens=4, overlap_tokens=0)
+    segments = segmenter.segment(" ".join(f"w{i}" for i in range(10)) + ".")
+    assert all(tokens <= 4 for _, tokens in segments)
+    assert " ".join(text for text, _ in segments).split() == [f"w{i}" for i in range(9)] + ["w9."]
+
+
+class HyphenTokenizer(WordTokenizer):
+    """Splits on hyphens too, so a hyphenated word costs several tokens"""
+
+    def _encode(self, text, *args, **kwargs):
+        return super()._encode(text.replace("-", " - "), *args, **kwargs)
+
+
+def test_unevenly_tokenized_words_are_split_to_the_budget():
+    segmenter = make_segmenter(max_tokens=4, overlap_tokens=0)
+    segmenter.tokenizer = HyphenTokenizer()
+    segments = segmenter.segment("Mau Mau fighters of the Kenya-Land-and-Freedom-Army.")
+    assert all(tokens <= 4 for _, tokens in segments)
+    assert [tokens for _, tokens in segments] == segmenter._measure([text for text, _ in segments])
+    assert "".join(text for text, _ in segments).replace(" ", "") == "MauMaufightersoftheKenya-Land-and-Freedom-Army."
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from app_config import config
+from conftest import WordTokenizer, make_config
+from inference import AnswerService
+
+
+def test_streaming_is_off_by_default():
+    assert config["streaming"]["enabled"] is False
+
+
+def test_streamed_answers_have_their_own_cache_entries():
+    service = AnswerService(make_config())
+    assert service.stream_cache_params != service.cache_params
+
+
+def scripted_decoder(script, no_repeat_ngram_size=0, max_new_tokens=10):
+    """A StreamingDecoder whose decoder returns the logits of script, one row per step"""
+    from streaming import StreamingDecoder
+
+    class Decoder(StreamingDecoder):
+        def _start(self, prompt):
+            return {"step": 0}
+
+        def _step(self, state, token):
+            logits = np.asarray(script[min(state["step"], len(script) - 1)], dtype=np.float32)
+            state["step"] += 1
+            return logits
+
+    params = dict(config["generation_params"], max_new_tokens=max_new_tokens, no_repeat_ngram_size=no_repeat_ngram_size)
+    decoder = Decoder(None, WordTokenizer(), dict(config, generation_params=params))
+    decoder.start_token_id, decoder.eos_token_id = 0, 1
+    return decoder
+
+
+def test_greedy_stream_stops_at_eos():
+    pytest.importorskip("tensorflow")
+    decoder = scripted_decoder([[0, 0, 5, 1], [0, 0, 1, 5], [0, 9, 0, 0]])
+    steps = list(decoder.stream("prompt"))
+    assert [token for token, _ in steps] == [2, 3, 1]
+    assert all(logprob <= 0 for _, logprob in steps)
+
+
+def test_no_repeat_ngram_is_enforced():
+    pytest.importorskip("tensorflow")
+    from streaming import banned_ngram_tokens
+
+    assert banned_ngram_tokens([0, 2, 3, 2], 2) == {3}
+    # Token 2 always scores highest, but the bigram (2, 2) may only occur once
+    decoder = scripted_decoder([[0, 0, 5, 4]], no_repeat_ngram_size=2, max_new_tokens=4)
+    assert [token for token, _ in decoder.stream("prompt")] == [2, 2, 3, 2]
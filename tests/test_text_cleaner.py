@@ -0,0 +1,41 @@
+import pytest
+
+from data.preprocesssing.cleaning_engine import CleaningEngine
+from data.preprocesssing.text_cleaner import KimathiTextCleaner
+
+
+@pytest.fixture
+def cleaner():
+    return KimathiTextCleaner()
+
+
+@pytest.mark.parametrize("text", [
+    "He was born in 1982- editor of the paper.",
+    "On the 5th day of the trial.",
+    "A well- known witness.",
+])
+def test_numbers_and_hyphens_are_left_alone(cleaner, text):
+    assert cleaner.clean_text(text) == text
+
+
+def test_rules_and_whitespace(cleaner):
+    assert cleaner.clean_text("The  •·oices of\n\nthe  forest") == "The oices of the forest"
+    assert cleaner.clean_text("join_ed words") == "joined words"
+    # Removed after whitespace is collapsed, so their surrounding spaces stay
+    assert cleaner.clean_text("forest [12] was Page 4 dense") == "forest  was  dense"
+
+
+def test_preserved_terms_are_not_rewritten():
+    engine = CleaningEngine.from_patterns({
+        "ocr_artifacts": [["([a-z])_([a-z])", "\\1\\2"]],
+        "preserve_terms": ["Mau_mau"],
+    })
+    assert engine.clean("Mau_mau and mau_mau") == "Mau_mau and maumau"
+    assert engine.report()["hits"]["preserve_terms"] == 1
+
+
+def test_streaming_matches_whole_text_cleaning(cleaner):
+    text = "  Kimathi   [note] spoke on page 12 of  the_record.\n\n" * 50
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+    engine = CleaningEngine.from_patterns(cleaner.custom_patterns, overlap=16)
+    assert "".join(engine.clean_stream(chunks)) == cleaner.clean_text(text)
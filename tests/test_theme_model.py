@@ -0,0 +1,35 @@
+import json
+
+import numpy as np
+import pytest
+
+from theme_model import ThemeModel, add_sections, build_theme_model
+
+SECTIONS = [
+    ("trial", "001", "The assessors heard the trial evidence. Trial witnesses spoke."),
+    ("trial", "002", "The revolver was produced as evidence."),
+    ("trial", "003", "Assessors retired."),
+    ("forest", "001", "The forest fighters held an oath ceremony in the forest."),
+]
+
+
+def test_book_terms_are_the_mean_of_its_section_vectors(tmp_path):
+    build_theme_model(SECTIONS, tmp_path)
+    model = ThemeModel(tmp_path)
+    weights = dict(model.book_top_terms("trial", top_k=100))
+    for term in ("evidence", "assessors", "revolver"):
+        expected = np.mean([dict(model.top_terms(doc, 100)).get(term, 0.0) for doc in range(3)])
+        assert weights[term] == pytest.approx(expected)
+    assert model.book_top_terms("missing") == []
+
+
+def test_hashing_vocab_names_each_bucket_once(tmp_path):
+    build_theme_model(SECTIONS, tmp_path, n_features=4)
+    add_sections([("appeal", "001", "Appeal dismissed by the privy council judges.")], tmp_path)
+    with open(tmp_path / "vocab.json", "r", encoding="utf-8") as f:
+        vocab = json.load(f)
+    assert len(vocab) <= 4
+    assert len(set(vocab.values())) == len(vocab)
+    model = ThemeModel(tmp_path)
+    assert len(model) == 5
+    assert model.sections_for("appeal")[0][0] == 4
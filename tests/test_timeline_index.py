@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import make_config
+from inference import AnswerService
+from timeline_index import (
+    TimelineIndex, answer_timeline_question, build_timeline_index, strong_match, verify_when_answer, when_parts
+)
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    events = [
+        {"date": "June 1956", "source": "a",
+         "event": "in June 1956, Henderson's forces captured Kimathi's brother Wambararia"},
+        {"date": "21 October 1956", "source": "a", "event": "Dedan Kimathi after his capture, 21 October 1956."},
+        {"date": "21 October 1956", "source": "b", "event": "Kimathi was captured at dawn on 21 October 1956."},
+        {"date": "18 February 1957", "source": "a", "event": "Kimathi was executed by hanging on 18 February 1957."},
+    ]
+    index_dir = tmp_path_factory.mktemp("timeline")
+    build_timeline_index(events, index_dir)
+    return TimelineIndex(index_dir)
+
+
+def test_when_questions_are_split_into_subject_and_predicate():
+    assert when_parts("When was Dedan Kimathi captured?") == ("Dedan Kimathi", ["captured"])
+    assert when_parts("When did the British capture Kimathi?") == ("British", ["capture", "kimathi"])
+    assert when_parts("When was the trial?") is None
+
+
+def test_a_possessive_subject_is_someone_else():
+    assert not strong_match("Henderson's forces captured Kimathi's brother", "Kimathi", ["captured"])
+    assert strong_match("forces captured Kimathi in the forest", "Kimathi", ["captured"])
+
+
+def test_timeline_answers_use_strong_matches_only(index):
+    assert answer_timeline_question(index, "When was Kimathi captured?") == (
+        "According to the sources, this was on 21 October 1956."
+    )
+    assert answer_timeline_question(index, "When was Wambararia captured?") == (
+        "According to the sources, this was in June 1956."
+    )
+    assert answer_timeline_question(index, "When was Henderson captured?") is None
+
+
+def test_only_a_contradicting_date_is_unverified(index):
+    question = "When was Kimathi captured?"
+    assert verify_when_answer(index, question, "In October 1956.") is True
+    assert verify_when_answer(index, question, "In June 1956.") is False
+    # Abstaining and unmatched questions are left to the other checks
+    assert verify_when_answer(index, question, "I don't know.") is None
+    assert verify_when_answer(index, "When was Kimathi sentenced?", "In 1956.") is None
+
+
+def test_kimathi_capture_answers_are_not_marked_unverified(tmp_path):
+    # The shipped timeline's only "captured" event near Kimathi is about his brother in June 1956
+    service = AnswerService(make_config(timeline={"enabled": True, "index_dir": str(tmp_path)}))
+    question = "When was Kimathi captured?"
+    assert service.verify_answer(question, "October 1956") is not False
+    assert service.verify_answer(question, "I don't know.")
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import re
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from retrieval import STOPWORDS, iter_sections
+
+_WORD = re.compile(r"[a-z][a-z'-]*[a-z]")
+THEME_STOPWORDS = STOPWORDS | frozenset(
+    "about after again against all also am any because been before being below between both can "
+    "could down during each few further here hers herself him himself into itself just me more most "
+    "my myself no nor not now off once only other our ours ourselves out over own same should so "
+    "some such than then there these those through too under until up upon us very we while whose "
+    "would your yours yourself said say says one two three mr mrs page shall may might must "
+    "made make many much never see still well went yes".split()
+)
+
+
+def theme_tokens(text):
+    """Lower-cased words of 3+ letters, minus stopwords, numbers and contractions"""
+    return [
+        t for t in _WORD.findall(text.lower())
+        if len(t) > 2 and "'" not in t and t not in THEME_STOPWORDS
+    ]
+
+
+def hashed_feature(term, n_features):
+    """Stable bucket of a term (blake2b, so ids agree across processes and runs)"""
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % n_features
+
+
+def _load_arrays(model_dir):
+    model_dir = Path(model_dir)
+    with open(model_dir / "model.json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(model_dir / "vocab.json", "r", encoding="utf-8") as f:
+        vocab = json.load(f)
+    with open(model_dir / "docs.json", "r", encoding="utf-8") as f:
+        docs = json.load(f)
+    arrays = {
+        name: np.load(model_dir / f"{name}.npy")
+        for name in ("doc_indptr", "doc_terms", "doc_counts", "df")
+    }
+    return meta, vocab, docs, arrays
+
+
+def add_sections(sections, model_dir="data/index/themes"):
+    """Append (book, section, text) rows to a saved model without refitting.
+
+    Only raw term counts and document frequencies are stored, and IDF is
+    applied when the model is loaded, so new rows never touch old ones. A
+    vocabulary model gives unseen terms new ids; a hashing model
+    (n_features buckets) has a fixed width, and its vocab.json only names
+    buckets for display, one term per bucket, so it stops growing too.
+    """
+    model_dir = Path(model_dir)
+    meta, vocab, docs, arrays = _load_arrays(model_dir)
+    n_features = meta["n_features"]
+    named = set(vocab.values()) if n_features else None
+    indptr = [int(arrays["doc_indptr"][-1])]
+    terms, counts, added = [], [], 0
+    for book, section, text in sections:
+        row = Counter()
+        for token in theme_tokens(text):
+            if n_features:
+                feature = hashed_feature(token, n_features)
+                if feature not in named:
+                    named.add(feature)
+                    vocab[token] = feature
+            else:
+                feature = vocab.setdefault(token, len(vocab))
+            row[feature] += 1
+        features = sorted(row)
+        terms.extend(features)
+        counts.extend(row[feature] for feature in features)
+        indptr.append(indptr[-1] + len(features))
+        docs.append({"book": book, "section": section, "hash": hashlib.sha256(text.encode("utf-8")).hexdigest()})
+        added += 1
+
+    width = n_features or len(vocab)
+    df = np.zeros(width, dtype=np.int32)
+    df[:len(arrays["df"])] = arrays["df"]
+    np.add.at(df, np.array(terms, dtype=np.int64), 1)
+
+    np.save(model_dir / "doc_indptr.npy", np.concatenate([arrays["doc_indptr"], np.array(indptr[1:], dtype=np.int64)]))
+    np.save(model_dir / "doc_terms.npy", np.concatenate([arrays["doc_terms"], np.array(terms, dtype=np.int32)]))
+    np.save(model_dir / "doc_counts.npy", np.concatenate([arrays["doc_counts"], np.array(counts, dtype=np.int32)]))
+    np.save(model_dir / "df.npy", df)
+    with open(model_dir / "vocab.json", "w", encoding="utf-8") as f:
+        json.dump(vocab, f)
+    with open(model_dir / "docs.json", "w", encoding="utf-8") as f:
+        json.dump(docs, f, indent=2)
+    return added
+
+
+def build_theme_model(sections, model_dir="data/index/themes", n_features=None):
+    """Fit a TF-IDF model over every (book, section, text) and save it as CSR arrays.
+
+    Rows are sections (doc_indptr/doc_terms/doc_counts, raw counts); df.npy
+    holds each term's document frequency. With n_features set, terms are
+    hashed into that many buckets instead of given vocabulary ids, so
+    add_sections() can stream in new text with a fixed matrix width.
+    """
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    np.save(model_dir / "doc_indptr.npy", np.zeros(1, dtype=np.int64))
+    np.save(model_dir / "doc_terms.npy", np.zeros(0, dtype=np.int32))
+    np.save(model_dir / "doc_counts.npy", np.zeros(0, dtype=np.int32))
+    np.save(model_dir / "df.npy", np.zeros(n_features or 0, dtype=np.int32))
+    with open(model_dir / "model.json", "w", encoding="utf-8") as f:
+        json.dump({"n_features": n_features}, f)
+    with open(model_dir / "vocab.json", "w", encoding="utf-8") as f:
+        json.dump({}, f)
+    with open(model_dir / "docs.json", "w", encoding="utf-8") as f:
+        json.dump([], f)
+    return add_sections(sections, model_dir)
+
+
+class ThemeModel:
+    """Reader for a directory written by build_theme_model().
+
+    Section vectors are sublinear TF times smoothed IDF, L2-normalized,
+    computed once on load. The term-major (posting list) view used by
+    sections_for() is built on first use.
+    """
+
+    def __init__(self, model_dir="data/index/themes"):
+        meta, self.vocab, self.docs, arrays = _load_arrays(model_dir)
+        self.n_features = meta["n_features"]
+        self.indptr = arrays["doc_indptr"]
+        self.terms = arrays["doc_terms"]
+        self.df = arrays["df"]
+        self.idf = (np.log((1 + len(self.docs)) / (1 + self.df)) + 1).astype(np.float32)
+
+        weights = (1 + np.log(arrays["doc_counts"].astype(np.float32))) * self.idf[self.terms]
+        rows = np.repeat(np.arange(len(self.docs)), np.diff(self.indptr))
+        norms = np.sqrt(np.bincount(rows, weights * weights, minlength=len(self.docs)))
+        self.weights = (weights / np.maximum(norms[rows], 1e-12)).astype(np.float32)
+        self.doc_rows = rows
+
+        # For display; in a hashing model the first term seen names a shared bucket
+        self.names = {}
+        for term, feature in self.vocab.items():
+            self.names.setdefault(feature, term)
+        self._term_indptr = None
+        self._books = None
+
+    def __len__(self):
+        return len(self.docs)
+
+    def feature(self, term):
+        """Column of a term, or None if it was never seen"""
+        if self.n_features:
+            feature = hashed_feature(term, self.n_features)
+            return feature if self.df[feature] else None
+        return self.vocab.get(term)
+
+    def _top(self, features, weights, top_k):
+        if len(features) > top_k:
+            keep = np.argpartition(weights, -top_k)[-top_k:]
+            features, weights = features[keep], weights[keep]
+        order = np.argsort(-weights, kind="stable")
+        return [(self.names[int(features[i])], float(weights[i])) for i in order]
+
+    def top_terms(self, doc_id, top_k=10):
+        """[(term, weight)] of one section, highest TF-IDF first"""
+        start, end = self.indptr[doc_id], self.indptr[doc_id + 1]
+        return self._top(self.terms[start:end], self.weights[start:end], top_k)
+
+    def book_top_terms(self, book, top_k=50):
+        """[(term, weight)] of a book: the mean of its section vectors"""
+        if self._books is None:
+            self._books = np.array([doc["book"] for doc in self.docs])
+        sections = self._books == book
+        in_book = sections[self.doc_rows]
+        if not in_book.any():
+            return []
+        summed = np.bincount(self.terms[in_book], self.weights[in_book], minlength=len(self.df))
+        features = np.flatnonzero(summed)
+        return self._top(features, summed[features] / sections.sum(), top_k)
+
+    def books(self):
+        return sorted({doc["book"] for doc in self.docs})
+
+    def _build_postings(self):
+        order = np.argsort(self.terms, kind="stable")
+        self._term_indptr = np.concatenate([[0], np.cumsum(np.bincount(self.terms, minlength=len(self.df)))])
+        self._term_docs = self.doc_rows[order].astype(np.int32)
+        self._term_weights = self.weights[order]
+
+    def sections_for(self, term, top_k=10):
+        """[(doc_id, weight)] of the sections a term weighs most in"""
+        feature = self.feature(term.lower())
+        if feature is None:
+            return []
+        if self._term_indptr is None:
+            self._build_postings()
+        start, end = self._term_indptr[feature], self._term_indptr[feature + 1]
+        docs, weights = self._term_docs[start:end], self._term_weights[start:end]
+        if len(docs) > top_k:
+            keep = np.argpartition(weights, -top_k)[-top_k:]
+            docs, weights = docs[keep], weights[keep]
+        order = np.argsort(-weights, kind="stable")
+        return [(int(docs[i]), float(weights[i])) for i in order]
+
+    def vectorize(self, text):
+        """(features, weights) of text under the corpus IDF, L2-normalized; unseen terms are dropped"""
+        counts = Counter()
+        for token in theme_tokens(text):
+            feature = self.feature(token)
+            if feature is not None:
+                counts[feature] += 1
+        features = np.array(sorted(counts), dtype=np.int64)
+        tf = np.array([counts[f] for f in features], dtype=np.float32)
+        weights = (1 + np.log(tf)) * self.idf[features] if len(features) else tf
+        norm = np.linalg.norm(weights)
+        return features, weights / norm if norm else weights
+
+    def similar(self, text, top_k=5):
+        """[(doc_id, cosine)] of the sections closest to text"""
+        features, weights = self.vectorize(text)
+        if not len(features):
+            return []
+        if self._term_indptr is None:
+            self._build_postings()
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for feature, weight in zip(features, weights):
+            start, end = self._term_indptr[feature], self._term_indptr[feature + 1]
+            scores[self._term_docs[start:end]] += weight * self._term_weights[start:end]
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(scores[matched], -top_k)[-top_k:]]
+        ranked = matched[np.argsort(-scores[matched])]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in ranked]
+
+
+if __name__ == "__main__":
+    num_sections = build_theme_model(iter_sections())
+    model = ThemeModel()
+    print(f"Theme model: {num_sections} sections, {len(model.vocab)} terms in data/index/themes/")
+    for book in model.books():
+        print(book, [term for term, _ in model.book_top_terms(book, top_k=15)])
@@ -0,0 +1,276 @@
+import calendar
+import json
+import re
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+from kb_store import CompiledStore, CompiledStoreWriter, TIMELINE_COLUMNS
+from retrieval import tokenize
+
+MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+
+# "21 October 1956", "21st of October, 1956", "October 21, 1956" and "October 1956"
+DATE_PATTERN = re.compile(
+    rf"\b(?:(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<month>{_MONTH})\.?,?"
+    rf"|(?P<month2>{_MONTH})\.?\s+(?:(?P<day2>\d{{1,2}})(?:st|nd|rd|th)?,?\s+)?)"
+    rf"\s*(?P<year>1[89]\d\d|20\d\d)\b",
+    re.IGNORECASE
+)
+YEAR_PATTERN = re.compile(r"\b(1[89]\d\d|20\d\d)\b")
+
+
+def _match_range(match):
+    """(first day ordinal, last day ordinal, ISO-like label) of a DATE_PATTERN match, or None"""
+    month = MONTHS[(match.group("month") or match.group("month2")).lower().rstrip(".")]
+    year = int(match.group("year"))
+    day = match.group("day") or match.group("day2")
+    if day is None:
+        last = calendar.monthrange(year, month)[1]
+        return date(year, month, 1).toordinal(), date(year, month, last).toordinal(), f"{year:04d}-{month:02d}"
+    try:
+        ordinal = date(year, month, int(day)).toordinal()
+    except ValueError:
+        return None
+    return ordinal, ordinal, f"{year:04d}-{month:02d}-{int(day):02d}"
+
+
+def find_dates(text):
+    """Yield (start, end, matched text, first ordinal, last ordinal, label) for each date in text"""
+    for match in DATE_PATTERN.finditer(text):
+        parsed = _match_range(match)
+        if parsed is not None:
+            yield (match.start(), match.end(), match.group(), *parsed)
+
+
+def parse_date_range(text):
+    """(first ordinal, last ordinal) of the first date or bare year in text, or None"""
+    for _, _, _, first, last, _ in find_dates(text):
+        return first, last
+    match = YEAR_PATTERN.search(text)
+    if match:
+        year = int(match.group())
+        return date(year, 1, 1).toordinal(), date(year, 12, 31).toordinal()
+    return None
+
+
+def build_timeline_index(events, output_dir="data/knowledge_base/compiled/timeline_index"):
+    """Parse, deduplicate and sort events by date, and save them with their date ranges.
+
+    Event text goes into a compiled KB store (kb_store); starts.npy and
+    ends.npy hold each event's first and last day as proleptic Gregorian
+    ordinals, sorted by start, so a date range is two binary searches.
+    """
+    rows, seen = [], set()
+    for event in events:
+        parsed = parse_date_range(event["date"])
+        if parsed is None:
+            continue
+        key = (parsed, event["source"], " ".join(event["event"].split()).lower())
+        if key in seen:
+            continue
+        seen.add(key)
+        rows.append((parsed[0], parsed[1], event))
+    rows.sort(key=lambda row: (row[0], row[1]))
+
+    writer = CompiledStoreWriter()
+    writer.add_table("events", [event for _, _, event in rows], TIMELINE_COLUMNS)
+    writer.save(output_dir)
+    starts = np.array([start for start, _, _ in rows], dtype=np.int32)
+    ends = np.array([end for _, end, _ in rows], dtype=np.int32)
+    np.save(Path(output_dir) / "starts.npy", starts)
+    np.save(Path(output_dir) / "ends.npy", ends)
+    with open(Path(output_dir) / "timeline.json", "w", encoding="utf-8") as f:
+        json.dump({"max_span": int((ends - starts).max()) if len(rows) else 0}, f)
+    return len(rows)
+
+
+class TimelineIndex:
+    """Reader for a directory written by build_timeline_index()"""
+
+    def __init__(self, index_dir="data/knowledge_base/compiled/timeline_index"):
+        index_dir = Path(index_dir)
+        self.events = CompiledStore(index_dir).table("events")
+        self.starts = np.load(index_dir / "starts.npy")
+        self.ends = np.load(index_dir / "ends.npy")
+        with open(index_dir / "timeline.json", "r", encoding="utf-8") as f:
+            self.max_span = json.load(f)["max_span"]
+        self._terms = None
+
+    def __len__(self):
+        return len(self.starts)
+
+    def event(self, i):
+        store = self.events.store
+        return {
+            "date": store.string(self.events.ids("date")[i]),
+            "event": store.string(self.events.ids("event")[i]),
+            "source": store.string(self.events.ids("source")[i]),
+            "start": date.fromordinal(int(self.starts[i])),
+            "end": date.fromordinal(int(self.ends[i])),
+        }
+
+    def range_ids(self, first, last):
+        """Indices of events overlapping the ordinal range [first, last], in date order"""
+        lo = np.searchsorted(self.starts, first - self.max_span, side="left")
+        hi = np.searchsorted(self.starts, last, side="right")
+        candidates = np.arange(lo, hi)
+        return candidates[self.ends[lo:hi] >= first]
+
+    def between(self, first, last):
+        """Events overlapping the dates first..last (datetime.date or ordinals)"""
+        first = first.toordinal() if isinstance(first, date) else first
+        last = last.toordinal() if isinstance(last, date) else last
+        return [self.event(i) for i in self.range_ids(first, last)]
+
+    def around(self, text, days=0, limit=10):
+        """Events on or within `days` of the date in text ("21 October 1956", "March 1954", "1956")"""
+        parsed = parse_date_range(text)
+        if parsed is None:
+            return []
+        ids = self.range_ids(parsed[0] - days, parsed[1] + days)
+        # Closest to the middle of the requested range first
+        middle = (parsed[0] + parsed[1]) / 2
+        ids = sorted(ids, key=lambda i: abs((self.starts[i] + self.ends[i]) / 2 - middle))
+        return [self.event(i) for i in ids[:limit]]
+
+    def mentioning(self, terms):
+        """Indices of events whose text contains every term (as produced by retrieval.tokenize)"""
+        if self._terms is None:
+            self._terms = [set(tokenize(text)) for text in self.events.values("event")]
+        terms = set(terms)
+        return [i for i, event_terms in enumerate(self._terms) if terms <= event_terms]
+
+
+WHEN_QUESTION = re.compile(r"^\s*when\s+(?:was|were|did|is|does|do|had)\s+(.+?)\s*\??\s*$", re.IGNORECASE)
+HAPPENED_QUESTION = re.compile(
+    r"^\s*what\s+happened\s+(?:on|in|around|during|near)\s+(.+?)\s*\??\s*$", re.IGNORECASE
+)
+
+
+def date_label(start, end):
+    """Label for a day, month or longer range: 21 October 1956, October 1956 or 1956"""
+    if start == end:
+        return f"{start.day} {start:%B %Y}"
+    if start.month == end.month:
+        return f"{start:%B %Y}"
+    return str(start.year)
+
+
+_SUFFIXES = ("ation", "ing", "ion", "ed", "es", "s", "e")
+
+
+def _stem(term):
+    """Crude suffix stripping, so "captured", "capture" and "hanged", "hanging" compare equal"""
+    for suffix in _SUFFIXES:
+        if term.endswith(suffix) and len(term) - len(suffix) >= 3:
+            return term[:-len(suffix)]
+    return term
+
+
+def when_parts(question):
+    """(subject name, predicate terms) of a "when ..." question, or None.
+
+    The subject is the first run of capitalized words ("Dedan Kimathi"); the
+    predicate is the content words after it ("captured"). Questions without
+    both cannot be checked against event text.
+    """
+    match = WHEN_QUESTION.match(question)
+    if match is None:
+        return None
+    words = match.group(1).split()
+    start = next((i for i, word in enumerate(words) if word[:1].isupper()), None)
+    if start is None:
+        return None
+    end = start
+    while end < len(words) and words[end][:1].isupper():
+        end += 1
+    predicate = tokenize(" ".join(words[end:]))
+    if not predicate:
+        return None
+    return " ".join(words[start:end]), predicate
+
+
+def strong_match(text, subject, predicate, window=4):
+    """Whether text has subject itself (not "Kimathi's brother") with every predicate term within window words"""
+    subject = subject.lower()
+    possessive = re.search(r"['’]s$", subject) is not None
+    name = r"\s+".join(re.escape(word) for word in re.sub(r"['’]s$", "", subject).split())
+    pattern = rf"\b{name}['’]s\b" if possessive else rf"\b{name}\b(?!['’]s\b)"
+    wanted = {_stem(term) for term in predicate}
+    text = text.lower()
+    for mention in re.finditer(pattern, text):
+        nearby = text[:mention.start()].split()[-window:] + text[mention.end():].split()[:window]
+        if wanted <= {_stem(term) for term in tokenize(" ".join(nearby))}:
+            return True
+    return False
+
+
+def when_candidates(index, question):
+    """Dates of events that strongly match a "when ..." question, most frequent (then most precise) first.
+
+    None if the question is not a "when" question the index can check; an
+    empty list if no event names the subject doing (or undergoing) the predicate.
+    """
+    parts = when_parts(question)
+    if parts is None:
+        return None
+    subject, predicate = parts
+    counts, spans = {}, {}
+    # The predicate may be inflected differently in the event, so only the subject narrows the search
+    for i in index.mentioning(tokenize(re.sub(r"['’]s\b", "", subject))):
+        event = index.event(i)
+        if not strong_match(event["event"], subject, predicate):
+            continue
+        label = date_label(event["start"], event["end"])
+        counts[label] = counts.get(label, 0) + 1
+        spans[label] = (event["end"] - event["start"]).days
+    # Ties go to the most precise date
+    return sorted(counts, key=lambda label: (-counts[label], spans[label]))
+
+
+def answer_timeline_question(index, question, limit=3):
+    """Answer "when ...?" or "what happened around <date>?" from the index, or None"""
+    candidates = when_candidates(index, question)
+    if candidates:
+        # Only the best-supported date is given; a rarer one may be a misread snippet
+        preposition = "on" if candidates[0][:1].isdigit() and " " in candidates[0] else "in"
+        return f"According to the sources, this was {preposition} {candidates[0]}."
+
+    match = HAPPENED_QUESTION.match(question)
+    if match is None:
+        return None
+    events = index.around(match.group(1), limit=limit)
+    if not events:
+        return None
+    lines = [f"- {event['date']}: …{event['event']}…" for event in events]
+    return "The sources mention:\n" + "\n".join(lines)
+
+
+def verify_when_answer(index, question, answer):
+    """True/False if a "when" answer's date agrees with events that strongly match the question.
+
+    None, so the caller falls through to its other checks, if the question
+    cannot be checked, no event strongly matches it, or the answer gives no date
+    (e.g. "I don't know").
+    """
+    candidates = when_candidates(index, question)
+    if not candidates:
+        return None
+    answered = parse_date_range(answer)
+    if answered is None:
+        return None
+    for label in candidates:
+        first, last = parse_date_range(label)
+        if answered[0] <= last and answered[1] >= first:
+            return True
+    return False
+
+
+if __name__ == "__main__":
+    with open("data/knowledge_base/timelines/kimathi_timeline.json", "r", encoding="utf-8") as f:
+        num_events = build_timeline_index(json.load(f))
+    print(f"Indexed {num_events} dated events into data/knowledge_base/compiled/timeline_index/")